@@ -0,0 +1,250 @@
+import io
+import logging
+import math
+import subprocess
+import wave
+from typing import Optional, Sequence
+from uuid import uuid4
+
+import numpy as np
+
+from .config import AUDIO_BITRATES
+
+try:
+    import soundfile as sf  # type: ignore
+except ImportError:
+    sf = None
+
+try:
+    import soxr  # type: ignore
+except ImportError:
+    soxr = None
+
+try:
+    from scipy.signal import resample_poly  # type: ignore
+except ImportError:
+    resample_poly = None
+
+logger = logging.getLogger("speech_coach.audio")
+
+
+WHISPER_SAMPLE_RATE = 16000
+
+# Output codecs for coach audio: file extension, MIME type and ffmpeg encoder arguments.
+AUDIO_FORMATS = {
+    "wav": {"ext": "wav", "content_type": "audio/wav", "ffmpeg": None},
+    "opus": {
+        "ext": "ogg",
+        "content_type": "audio/ogg",
+        "ffmpeg": ["-c:a", "libopus", "-application", "voip", "-ar", "48000", "-f", "ogg"],
+    },
+    "mp3": {
+        "ext": "mp3",
+        "content_type": "audio/mpeg",
+        # No Xing/ID3 headers, so per-sentence chunks can be concatenated frame by frame.
+        "ffmpeg": ["-c:a", "libmp3lame", "-write_xing", "0", "-id3v2_version", "0", "-f", "mp3"],
+    },
+}
+_FORMAT_ALIASES = {"ogg": "opus", "mpeg": "mp3"}
+
+
+def pcm16_to_float32(data: bytes) -> np.ndarray:
+    """Convert little-endian 16-bit PCM bytes to float32 samples in [-1, 1]."""
+    return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def resample(audio: np.ndarray, src_rate: int, dst_rate: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """Resample mono float audio. Downsampling is low-pass filtered so content above the new
+    Nyquist frequency does not alias into the speech band (soxr, else scipy's polyphase filter,
+    else a windowed-sinc FIR); upsampling uses linear interpolation."""
+    if src_rate == dst_rate or audio.size == 0:
+        return audio.astype(np.float32, copy=False)
+    audio = audio.astype(np.float32, copy=False)
+    if dst_rate < src_rate:
+        if soxr is not None:
+            return soxr.resample(audio, src_rate, dst_rate).astype(np.float32, copy=False)
+        if resample_poly is not None:
+            divisor = math.gcd(src_rate, dst_rate)
+            return resample_poly(audio, dst_rate // divisor, src_rate // divisor).astype(np.float32)
+        audio = _lowpass(audio, cutoff=0.5 * dst_rate / src_rate)
+    duration = audio.size / src_rate
+    dst_len = int(round(duration * dst_rate))
+    src_t = np.arange(audio.size) / src_rate
+    dst_t = np.arange(dst_len) / dst_rate
+    return np.interp(dst_t, src_t, audio).astype(np.float32)
+
+
+def _lowpass(audio: np.ndarray, cutoff: float, taps: int = 101) -> np.ndarray:
+    """Hamming-windowed sinc low-pass; `cutoff` is a fraction of the sample rate (0-0.5)."""
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    kernel /= kernel.sum()
+    return np.convolve(audio, kernel.astype(np.float32), mode="same")
+
+
+def _pcm_to_float32(frames: bytes, sample_width: int) -> np.ndarray:
+    if sample_width == 1:
+        return (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    if sample_width == 2:
+        return np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    if sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        return ints.astype(np.float32) / 8388608.0
+    if sample_width == 4:
+        return np.frombuffer(frames, dtype="<i4").astype(np.float32) / 2147483648.0
+    raise ValueError(f"Unsupported PCM sample width: {sample_width}")
+
+
+def decode_wav(data: bytes) -> Optional[np.ndarray]:
+    """Decode an integer PCM WAV into 16 kHz mono float32, or None if it is not one."""
+    try:
+        with wave.open(io.BytesIO(data), "rb") as reader:
+            channels = reader.getnchannels()
+            sample_width = reader.getsampwidth()
+            rate = reader.getframerate()
+            frames = reader.readframes(reader.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    if channels < 1 or rate < 1:
+        return None
+    try:
+        audio = _pcm_to_float32(frames, sample_width)
+        if channels > 1:
+            audio = audio.reshape(-1, channels).mean(axis=1)
+    except ValueError:
+        # Truncated data that does not split into whole samples/frames; let ffmpeg try.
+        return None
+    return resample(audio, rate)
+
+
+def decode_audio(data: bytes) -> Optional[np.ndarray]:
+    """Decode audio bytes in-process into 16 kHz mono float32.
+
+    WAV is handled by the stdlib; FLAC/OGG/AIFF and float WAV go through libsndfile when
+    available. Returns None for containers that need ffmpeg (e.g. WebM/MP4).
+    """
+    audio = decode_wav(data)
+    if audio is not None or sf is None:
+        return audio
+    try:
+        samples, rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    except Exception:
+        return None
+    return resample(samples.mean(axis=1), rate)
+
+
+def ffmpeg_decode(data: bytes, sample_rate: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """Decode any ffmpeg-readable container via stdin/stdout pipes (no temp files)."""
+    cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-threads", "0",
+        "-i", "pipe:0",
+        "-f", "s16le",
+        "-ac", "1",
+        "-acodec", "pcm_s16le",
+        "-ar", str(sample_rate),
+        "pipe:1",
+    ]
+    try:
+        out = subprocess.run(cmd, input=data, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode audio: {e.stderr.decode(errors='ignore')}") from e
+    return pcm16_to_float32(out)
+
+
+def new_audio_filename(prefix: str = "coach_tts", ext: str = "wav") -> str:
+    return f"{prefix}_{uuid4().hex}.{ext}"
+
+
+def normalize_audio_format(name: str) -> str:
+    """Canonical output format name; raises ValueError for unsupported formats."""
+    fmt = _FORMAT_ALIASES.get(name.lower(), name.lower())
+    if fmt not in AUDIO_FORMATS:
+        raise ValueError(f"Unsupported audio format '{name}' (expected one of {', '.join(AUDIO_FORMATS)})")
+    return fmt
+
+
+def content_type_for(filename: str) -> str:
+    ext = filename.rsplit(".", 1)[-1].lower()
+    for spec in AUDIO_FORMATS.values():
+        if spec["ext"] == ext:
+            return spec["content_type"]
+    return "application/octet-stream"
+
+
+def encode_audio(wav: bytes, audio_format: str, bitrate: Optional[str] = None) -> bytes:
+    """Transcode a WAV blob to `audio_format` through ffmpeg pipes; WAV is returned as is."""
+    args = AUDIO_FORMATS[audio_format]["ffmpeg"]
+    if args is None:
+        return wav
+    cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-loglevel", "error",
+        "-f", "wav",
+        "-i", "pipe:0",
+        "-ac", "1",
+        "-b:a", bitrate or AUDIO_BITRATES[audio_format],
+        *args,
+        "pipe:1",
+    ]
+    try:
+        return subprocess.run(cmd, input=wav, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to encode {audio_format}: {e.stderr.decode(errors='ignore')}") from e
+
+
+def concat_audio(chunks: Sequence[bytes], audio_format: str) -> bytes:
+    """Join per-sentence chunks of one format into a single recording."""
+    if audio_format == "wav":
+        return concat_wav(chunks)
+    if audio_format == "mp3":
+        return b"".join(chunks)
+    # Chained Ogg streams are poorly supported by players, so decode and encode once more.
+    rate = 48000
+    samples = np.concatenate([ffmpeg_decode(chunk, sample_rate=rate) for chunk in chunks])
+    return encode_audio(encode_wav(samples, rate), audio_format)
+
+
+def encode_wav(samples, sample_rate: int) -> bytes:
+    """Encode float samples as 16-bit PCM mono WAV, peak-normalized like Coqui's save_wav."""
+    wav = np.asarray(samples, dtype=np.float32)
+    wav_norm = wav * (32767 / max(0.01, float(np.max(np.abs(wav))) if wav.size else 0.01))
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        writer.writeframes(wav_norm.astype("<i2").tobytes())
+    return buf.getvalue()
+
+
+def concat_wav(chunks: Sequence[bytes]) -> bytes:
+    """Concatenate PCM WAV blobs that share the same format into a single WAV."""
+    if not chunks:
+        raise ValueError("No WAV chunks to concatenate")
+
+    params = None
+    frames = []
+    for chunk in chunks:
+        with wave.open(io.BytesIO(chunk), "rb") as reader:
+            if params is None:
+                params = reader.getparams()
+            elif (reader.getnchannels(), reader.getsampwidth(), reader.getframerate()) != (
+                params.nchannels,
+                params.sampwidth,
+                params.framerate,
+            ):
+                raise ValueError("WAV chunks have mismatched formats")
+            frames.append(reader.readframes(reader.getnframes()))
+
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as writer:
+        writer.setnchannels(params.nchannels)
+        writer.setsampwidth(params.sampwidth)
+        writer.setframerate(params.framerate)
+        writer.writeframes(b"".join(frames))
+    return buf.getvalue()
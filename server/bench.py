@@ -0,0 +1,306 @@
+"""Per-stage micro-benchmarks: python -m server.bench [--backend fake|real] [--stages ...] [--output run.json]
+
+The fake backend swaps the Whisper, Coqui and Ollama models for the stand-ins in stub_backends,
+with their simulated model time set to zero, so a CPU-only CI run measures only the service code
+around the models (executors, decoding, encoding, routing, SQLite, storage). The real backend loads the
+configured models. Results are written as JSON; `--compare baseline.json` flags cases whose p50 got
+slower than `--threshold` and exits non-zero.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from .audio_utils import WHISPER_SAMPLE_RATE, encode_wav
+from .config import BASE_DIR, OUTPUT_DIR, STORAGE_CONFIG, TTS_MODELS
+from .executors import shutdown_executors
+from .stub_backends import FakeTTS, FakeWhisperModel, stub_ollama_client_factory
+
+logger = logging.getLogger("speech_coach.bench")
+
+STAGES = ["stt", "tts", "llm", "db", "storage"]
+AUDIO_SECONDS = [1, 5, 15, 30]
+TEXT_LENGTHS = [20, 80, 240]
+HISTORY_SIZES = [10, 100, 1000]
+FILE_SIZES_KB = [16, 256, 2048]
+
+_SAMPLE_TEXT = "Thanks for sharing that, let us try the sentence again a little more slowly. "
+
+def summarize(stage: str, case: str, samples_s: List[float], **extra) -> Dict[str, Any]:
+    ms = sorted(s * 1000 for s in samples_s)
+    return {
+        "stage": stage,
+        "case": case,
+        "n": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "p50_ms": round(statistics.median(ms), 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(0.95 * len(ms)))], 3),
+        "min_ms": round(ms[0], 3),
+        "max_ms": round(ms[-1], 3),
+        **extra,
+    }
+
+
+async def time_async(fn: Callable[[], Awaitable[Any]], repeat: int, warmup: int = 1) -> List[float]:
+    for _ in range(warmup):
+        await fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def bench_stt(backend: str, repeat: int) -> List[Dict[str, Any]]:
+    from .stt_service import WhisperService
+
+    service = WhisperService()
+    if backend == "fake":
+        service.model = FakeWhisperModel(rtf=0)
+    else:
+        await service.warmup()
+    results = []
+    rng = np.random.default_rng(0)
+    for seconds in AUDIO_SECONDS:
+        audio = (rng.standard_normal(seconds * WHISPER_SAMPLE_RATE) * 0.05).astype(np.float32)
+        wav = encode_wav(audio, WHISPER_SAMPLE_RATE)
+        samples = await time_async(lambda: service.transcribe_bytes(wav), repeat)
+        results.append(
+            summarize("stt", f"transcribe_{seconds}s", samples, audio_s=seconds, rtf=round(statistics.median(samples) / seconds, 4))
+        )
+    return results
+
+
+async def bench_tts(backend: str, repeat: int) -> List[Dict[str, Any]]:
+    from .tts_service import TTSService
+
+    service = TTSService()
+    results = []
+    for model_info in TTS_MODELS:
+        model_id = model_info.get("model")
+        if backend == "fake":
+            service.models_cache[model_id] = FakeTTS(s_per_char=0)
+        speakers = (model_info.get("available_speaker_ids") or [None])[:2]
+        try:
+            if backend == "real":
+                await service.warmup(model_id)
+        except Exception as exc:
+            logger.warning("Skipping TTS model=%s: %s", model_id, exc)
+            continue
+        for speaker in speakers:
+            for length in TEXT_LENGTHS:
+                text = (_SAMPLE_TEXT * (length // len(_SAMPLE_TEXT) + 1))[:length]
+                samples = await time_async(lambda: service.synthesize_bytes(text, speaker=speaker, model=model_id), repeat)
+                results.append(
+                    summarize("tts", f"{model_id}/{speaker or 'default'}/{length}ch", samples, model=model_id, speaker=speaker, chars=length)
+                )
+    return results
+
+
+async def bench_llm(backend: str, repeat: int) -> List[Dict[str, Any]]:
+    from .config import OLLAMA_KEEP_ALIVE
+    from .ollama_service import OllamaService
+
+    if backend == "fake":
+        service = OllamaService(hosts=["http://stub"], client_factory=stub_ollama_client_factory(tokens_per_s=0))
+        model = service.default_model
+    else:
+        service = OllamaService()
+        model = service.default_model
+        await service.warmup()
+    messages = [{"role": "user", "content": "Say hello in five words."}]
+    server_s: List[float] = []
+
+    async def chat():
+        # Same routing path as OllamaService.chat, keeping the response for Ollama's own timing.
+        response = await service._call(
+            model, lambda client, m: client.chat(model=m, messages=messages, keep_alive=OLLAMA_KEEP_ALIVE)
+        )
+        server_s.append((response.total_duration or 0) / 1e9)
+
+    samples = await time_async(chat, repeat)
+    overhead = [wall - inside for wall, inside in zip(samples, server_s[-len(samples):])]
+    return [
+        summarize("llm", "chat", samples, model=model),
+        summarize("llm", "chat_overhead", overhead, model=model),
+    ]
+
+
+async def bench_db(backend: str, repeat: int) -> List[Dict[str, Any]]:
+    from .db import Database
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(db_path=Path(tmp) / "bench.db")
+        try:
+            for size in HISTORY_SIZES:
+                session_id = f"bench-{size}"
+                db.add_session(session_id, mode="call")
+                inserts = []
+                for i in range(size):
+                    started = time.perf_counter()
+                    await db.add_message_async(session_id, "user" if i % 2 == 0 else "coach", _SAMPLE_TEXT)
+                    inserts.append(time.perf_counter() - started)
+                results.append(
+                    summarize("db", f"insert@{size}", inserts, history=size, rows_per_s=round(size / sum(inserts), 1))
+                )
+                results.append(
+                    summarize("db", f"get_messages@{size}", await time_async(lambda: db.get_messages_async(session_id), repeat), history=size)
+                )
+                results.append(
+                    summarize(
+                        "db",
+                        f"get_messages_page@{size}",
+                        await time_async(lambda: db._run(db.get_messages_page, session_id, 50), repeat),
+                        history=size,
+                    )
+                )
+                results.append(
+                    summarize(
+                        "db", f"chat_history@{size}", await time_async(lambda: db.get_chat_history_async(session_id), repeat), history=size
+                    )
+                )
+        finally:
+            db.close()
+    return results
+
+
+async def bench_storage(backend: str, repeat: int) -> List[Dict[str, Any]]:
+    from .storage import LocalStorageProvider, get_storage_provider
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # The fake backend always writes to a scratch directory; real uses the configured provider.
+        provider = LocalStorageProvider(Path(tmp)) if backend == "fake" else get_storage_provider(STORAGE_CONFIG, OUTPUT_DIR)
+        written: List[str] = []
+        for size_kb in FILE_SIZES_KB:
+            data = os.urandom(size_kb * 1024)
+
+            async def save():
+                written.append(f"bench_{uuid.uuid4().hex}.wav")
+                await provider.save_file_async(data, written[-1])
+
+            samples = await time_async(save, repeat)
+            results.append(
+                summarize(
+                    "storage",
+                    f"save_{size_kb}kb",
+                    samples,
+                    size_kb=size_kb,
+                    mb_per_s=round(size_kb / 1024 / statistics.median(samples), 1),
+                )
+            )
+        await provider.drain()
+        provider.delete_files(written)
+    return results
+
+
+BENCHMARKS = {"stt": bench_stt, "tts": bench_tts, "llm": bench_llm, "db": bench_db, "storage": bench_storage}
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(stages: List[str], backend: str, repeat: int) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+    errors: Dict[str, str] = {}
+    for stage in stages:
+        logger.info("Benchmarking stage=%s backend=%s", stage, backend)
+        try:
+            results.extend(await BENCHMARKS[stage](backend, repeat))
+        except Exception as exc:
+            logger.exception("Benchmark failed stage=%s", stage)
+            errors[stage] = str(exc)
+    return {
+        "meta": {
+            "backend": backend,
+            "repeat": repeat,
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "started_at": time.time(),
+        },
+        "results": results,
+        "errors": errors,
+    }
+
+
+def compare(run_report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Cases whose p50 is more than `threshold` (fraction) slower than in the baseline run."""
+    previous = {(r["stage"], r["case"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in run_report["results"]:
+        before = previous.get((result["stage"], result["case"]))
+        if before and before["p50_ms"] > 0 and result["p50_ms"] > before["p50_ms"] * (1 + threshold):
+            regressions.append(
+                {
+                    "stage": result["stage"],
+                    "case": result["case"],
+                    "baseline_p50_ms": before["p50_ms"],
+                    "p50_ms": result["p50_ms"],
+                    "change": round(result["p50_ms"] / before["p50_ms"] - 1, 3),
+                }
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Per-stage micro-benchmarks for the speech coach server")
+    parser.add_argument("--backend", choices=["fake", "real"], default="fake")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated subset of {','.join(STAGES)}")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", type=Path, help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", type=Path, help="baseline JSON report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p50 slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = sorted(set(stages) - set(BENCHMARKS))
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    try:
+        report = asyncio.run(run(stages, args.backend, args.repeat))
+    finally:
+        shutdown_executors(wait=False)
+
+    exit_code = 1 if report["errors"] else 0
+    if args.compare:
+        report["regressions"] = compare(report, json.loads(args.compare.read_text(encoding="utf-8")), args.threshold)
+        for r in report["regressions"]:
+            print(f"REGRESSION {r['stage']}/{r['case']}: {r['baseline_p50_ms']} -> {r['p50_ms']} ms", file=sys.stderr)
+        if report["regressions"]:
+            exit_code = 1
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
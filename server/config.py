@@ -9,9 +9,14 @@ LLM_CONFIG_PATH = BASE_DIR / "llm_models_config.json"
 TTS_CONFIG_PATH = BASE_DIR / "tts_model_info.json"
 OUTPUT_DIR = BASE_DIR / "output"
 DB_PATH = BASE_DIR / "server" / "data" / "app.db"
+# Precomputed XTTS speaker conditioning latents, one file per model version
+XTTS_LATENTS_DIR = BASE_DIR / "server" / "data" / "xtts_latents"
+# Optional reference clips for custom XTTS voices: <speaker id>.wav
+XTTS_SPEAKER_WAV_DIR = BASE_DIR / "voices"
 
 OUTPUT_DIR.mkdir(exist_ok=True, parents=True)
 DB_PATH.parent.mkdir(exist_ok=True, parents=True)
+XTTS_LATENTS_DIR.mkdir(exist_ok=True, parents=True)
 
 # Storage Configuration
 STORAGE_CONFIG = {
@@ -20,6 +25,20 @@ STORAGE_CONFIG = {
     "S3_REGION": os.getenv("S3_REGION"),
     "AWS_ACCESS_KEY_ID": os.getenv("AWS_ACCESS_KEY_ID"),
     "AWS_SECRET_ACCESS_KEY": os.getenv("AWS_SECRET_ACCESS_KEY"),
+    # S3 client tuning: pooled keep-alive connections shared by all storage executor threads
+    "S3_MAX_POOL_CONNECTIONS": int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32")),
+    "S3_CONNECT_TIMEOUT_S": float(os.getenv("S3_CONNECT_TIMEOUT_S", "5")),
+    "S3_READ_TIMEOUT_S": float(os.getenv("S3_READ_TIMEOUT_S", "30")),
+    # Uploads at or above the threshold are streamed as multipart uploads in chunks of this size
+    "S3_MULTIPART_THRESHOLD_MB": int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "8")),
+    "S3_MULTIPART_CHUNK_MB": int(os.getenv("S3_MULTIPART_CHUNK_MB", "8")),
+    # Return the URL right away and finish the upload in the background (retried with backoff)
+    "S3_BACKGROUND_UPLOADS": os.getenv("S3_BACKGROUND_UPLOADS", "false").lower() in {"1", "true", "yes"},
+    "S3_UPLOAD_RETRIES": int(os.getenv("S3_UPLOAD_RETRIES", "3")),
+    # Delivery: serve objects from a CDN origin, or hand out presigned GET URLs for a private bucket
+    "S3_PUBLIC_BASE_URL": os.getenv("S3_PUBLIC_BASE_URL"),
+    "S3_PRESIGNED_URLS": os.getenv("S3_PRESIGNED_URLS", "false").lower() in {"1", "true", "yes"},
+    "S3_PRESIGN_EXPIRES_S": int(os.getenv("S3_PRESIGN_EXPIRES_S", "3600")),
 }
 
 
@@ -53,6 +72,139 @@ def _select_default_tts_model():
 
 TTS_DEFAULT_MODEL = _select_default_tts_model()
 
+# Call mode streaming: stream LLM tokens and synthesize the reply sentence by sentence.
+# Clients can override per connection with the `stream` query parameter.
+CALL_STREAMING_DEFAULT = os.getenv("CALL_STREAMING", "false").lower() in {"1", "true", "yes"}
+# Sentences shorter than this are merged with the next one before synthesis.
+STREAM_MIN_SENTENCE_CHARS = int(os.getenv("STREAM_MIN_SENTENCE_CHARS", "20"))
+
+# Streaming ingest: the call WebSocket accepts raw 16-bit mono PCM frames with `?ingest=pcm`
+# and decides end-of-utterance server side with an energy-based VAD.
+STREAM_INGEST_SAMPLE_RATE = int(os.getenv("STREAM_INGEST_SAMPLE_RATE", "16000"))
+STREAM_INGEST_SAMPLE_RATE_RANGE = (8000, 48000)  # accepted `sample_rate` query values (inclusive)
+VAD_ENERGY_THRESHOLD = float(os.getenv("VAD_ENERGY_THRESHOLD", "0.01"))  # RMS of float samples in [-1, 1]
+VAD_FRAME_MS = 30
+VAD_SILENCE_MS = int(os.getenv("VAD_SILENCE_MS", "700"))
+VAD_MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", "250"))
+VAD_MAX_UTTERANCE_MS = int(os.getenv("VAD_MAX_UTTERANCE_MS", "30000"))
+VAD_PREROLL_MS = 300
+PARTIAL_TRANSCRIPT_INTERVAL_MS = int(os.getenv("PARTIAL_TRANSCRIPT_INTERVAL_MS", "1000"))
+
+# Per-stage executors: each pipeline stage gets its own bounded thread pool so a burst
+# of one kind of work (e.g. CPU-heavy TTS) cannot starve the others.
+STAGE_WORKERS = {
+    "stt": int(os.getenv("STT_WORKERS", "2")),
+    "tts": int(os.getenv("TTS_WORKERS", "2")),
+    "db": int(os.getenv("DB_WORKERS", "4")),
+    "storage": int(os.getenv("STORAGE_WORKERS", "8")),  # blocking storage I/O (uploads, reads, GC)
+    "encode": int(os.getenv("ENCODE_WORKERS", "4")),  # ffmpeg encoding of coach audio
+}
+
+# SQLite: one writer connection plus a pool of reader connections (WAL lets readers run concurrently)
+DB_READER_CONNECTIONS = int(os.getenv("DB_READER_CONNECTIONS", "4"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+# Write-behind: session/message inserts are queued and group-committed by one writer thread
+DB_WRITE_BEHIND = os.getenv("DB_WRITE_BEHIND", "false").lower() in {"1", "true", "yes"}
+DB_WRITE_BEHIND_MAX_BATCH = int(os.getenv("DB_WRITE_BEHIND_MAX_BATCH", "100"))
+DB_WRITE_BEHIND_INTERVAL_MS = int(os.getenv("DB_WRITE_BEHIND_INTERVAL_MS", "5"))
+
+# Whisper micro-batching: utterances arriving within WHISPER_BATCH_MAX_WAIT_MS of each other are
+# decoded in one batched forward pass (up to WHISPER_BATCH_MAX_SIZE). Only clips up to 30 s are batched.
+WHISPER_BATCHING = os.getenv("WHISPER_BATCHING", "false").lower() in {"1", "true", "yes"}
+WHISPER_BATCH_MAX_SIZE = int(os.getenv("WHISPER_BATCH_MAX_SIZE", "8"))
+WHISPER_BATCH_MAX_WAIT_MS = int(os.getenv("WHISPER_BATCH_MAX_WAIT_MS", "20"))
+
+# TTS cache: replies are content-addressed by (text, model, speaker, language) so repeated
+# phrases reuse already stored audio instead of being synthesized again.
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+TTS_CACHE_DB_PATH = DB_PATH.parent / "tts_cache.db"
+TTS_CACHE_MAX_ENTRIES = int(os.getenv("TTS_CACHE_MAX_ENTRIES", "5000"))
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "512"))
+
+# Startup warmup: preload models and run one dummy inference per stage before reporting ready.
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in {"1", "true", "yes"}
+WARMUP_ALL_TTS_MODELS = os.getenv("WARMUP_ALL_TTS_MODELS", "false").lower() in {"1", "true", "yes"}
+WARMUP_COMPONENTS = [c.strip() for c in os.getenv("WARMUP_COMPONENTS", "stt,tts,llm").split(",") if c.strip()]
+# Failed components are retried in the background, backing off from the initial delay up to the cap.
+WARMUP_RETRY_INITIAL_S = float(os.getenv("WARMUP_RETRY_INITIAL_S", "2"))
+WARMUP_RETRY_MAX_S = float(os.getenv("WARMUP_RETRY_MAX_S", "60"))
+# How long Ollama keeps a model resident after the last request (Ollama duration string).
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+# Ollama daemons to route LLM requests across (comma-separated); defaults to OLLAMA_HOST as with the ollama CLI
+OLLAMA_HOSTS = [
+    h.strip()
+    for h in os.getenv("OLLAMA_HOSTS", os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")).split(",")
+    if h.strip()
+]
+# Seconds between health/model checks of every Ollama endpoint
+OLLAMA_HEALTH_CHECK_S = float(os.getenv("OLLAMA_HEALTH_CHECK_S", "15"))
+# Ollama HTTP client, one per endpoint
+OLLAMA_CONNECT_TIMEOUT_S = float(os.getenv("OLLAMA_CONNECT_TIMEOUT_S", "5"))
+OLLAMA_REQUEST_TIMEOUT_S = float(os.getenv("OLLAMA_REQUEST_TIMEOUT_S", "120"))  # also the max gap between streamed tokens
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "16"))
+# How long the list of models present on the Ollama host is trusted before it is re-read
+OLLAMA_MODEL_CACHE_TTL_S = int(os.getenv("OLLAMA_MODEL_CACHE_TTL_S", "300"))
+# Requests naming a model that is still downloading: "wait" up to OLLAMA_PULL_WAIT_S, then use
+# the default model, or "fallback" to the default model immediately. Pulls continue in the background.
+OLLAMA_PULL_POLICY = os.getenv("OLLAMA_PULL_POLICY", "fallback").lower()
+OLLAMA_PULL_WAIT_S = float(os.getenv("OLLAMA_PULL_WAIT_S", "10"))
+# Pull every model of the detected hardware tier in the background at startup
+OLLAMA_PREFETCH_TIER = os.getenv("OLLAMA_PREFETCH_TIER", "false").lower() in {"1", "true", "yes"}
+
+# Autotune: benchmark the candidate models of the fitting tiers and make the best one that answers a
+# typical coaching turn (prompt and reply sizes below) within the latency target the default model.
+# Results are cached per host fingerprint in LLM_AUTOTUNE_CACHE_PATH, so restarts do not re-benchmark.
+LLM_AUTOTUNE = os.getenv("LLM_AUTOTUNE", "false").lower() in {"1", "true", "yes"}
+LLM_AUTOTUNE_TARGET_S = float(os.getenv("LLM_AUTOTUNE_TARGET_S", "4"))
+LLM_AUTOTUNE_PROMPT_TOKENS = int(os.getenv("LLM_AUTOTUNE_PROMPT_TOKENS", "800"))
+LLM_AUTOTUNE_REPLY_TOKENS = int(os.getenv("LLM_AUTOTUNE_REPLY_TOKENS", "80"))
+# Also pull candidates that are not present yet (otherwise only present models are benchmarked)
+LLM_AUTOTUNE_PULL = os.getenv("LLM_AUTOTUNE_PULL", "false").lower() in {"1", "true", "yes"}
+# Models whose size plus this headroom (KV cache, Whisper/TTS, the OS) exceeds the memory available
+# at tune time are skipped. Only checked when the Ollama endpoints run on this host.
+LLM_AUTOTUNE_MEMORY_HEADROOM_GB = float(os.getenv("LLM_AUTOTUNE_MEMORY_HEADROOM_GB", "1.5"))
+LLM_AUTOTUNE_CACHE_PATH = Path(os.getenv("LLM_AUTOTUNE_CACHE_PATH", str(DB_PATH.parent / "llm_autotune.json")))
+
+# Stub mode for load testing: STT, LLM and TTS models are replaced by stand-ins so the server's own
+# overhead can be profiled without models. Each stand-in costs time proportional to its input.
+STUB_SERVICES = os.getenv("STUB_SERVICES", "false").lower() in {"1", "true", "yes"}
+STUB_STT_RTF = float(os.getenv("STUB_STT_RTF", "0.01"))  # seconds per second of audio
+STUB_TTS_S_PER_CHAR = float(os.getenv("STUB_TTS_S_PER_CHAR", "0.0005"))
+STUB_LLM_TOKENS_PER_S = float(os.getenv("STUB_LLM_TOKENS_PER_S", "0"))  # 0 = reply instantly
+
+# Per-turn tracing: every stage of a turn becomes a span carrying the turn id. "log" writes spans as
+# JSON log lines (logger speech_coach.trace); "otel" hands them to OpenTelemetry when it is installed.
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() in {"1", "true", "yes"}
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "log").lower()
+
+# Per-session chat history cache (LRU over sessions, idle sessions expire after the TTL)
+HISTORY_CACHE_MAX_SESSIONS = int(os.getenv("HISTORY_CACHE_MAX_SESSIONS", "256"))
+HISTORY_CACHE_TTL_S = int(os.getenv("HISTORY_CACHE_TTL_S", "1800"))
+
+# Coach audio output codec: wav, opus (Opus in OGG) or mp3. Sessions and requests may override it.
+AUDIO_OUTPUT_FORMAT = os.getenv("AUDIO_OUTPUT_FORMAT", "wav").lower()
+AUDIO_BITRATES = {
+    "opus": os.getenv("OPUS_BITRATE", "24k"),
+    "mp3": os.getenv("MP3_BITRATE", "64k"),
+}
+
+# Local audio delivery: generated files never change, so clients and proxies may cache them for good.
+AUDIO_CACHE_MAX_AGE_S = int(os.getenv("AUDIO_CACHE_MAX_AGE_S", str(365 * 24 * 3600)))
+# When set (e.g. "/_audio"), /output responses only carry an X-Accel-Redirect to this internal
+# nginx location, which then sends the file itself with sendfile.
+AUDIO_ACCEL_REDIRECT_PREFIX = os.getenv("AUDIO_ACCEL_REDIRECT_PREFIX")
+
+# Storage garbage collection: periodically removes generated audio no message or TTS cache
+# entry references. Files younger than the grace period are never touched (in-flight turns).
+STORAGE_GC_ENABLED = os.getenv("STORAGE_GC_ENABLED", "true").lower() in {"1", "true", "yes"}
+STORAGE_GC_INTERVAL_S = int(os.getenv("STORAGE_GC_INTERVAL_S", "3600"))
+STORAGE_GC_GRACE_S = int(os.getenv("STORAGE_GC_GRACE_S", "3600"))
+STORAGE_GC_BATCH_SIZE = int(os.getenv("STORAGE_GC_BATCH_SIZE", "1000"))  # S3 DeleteObjects takes at most 1000 keys
+STORAGE_GC_PREFIX = os.getenv("STORAGE_GC_PREFIX", "coach_tts_")  # only files with this prefix are collected
+# Drop audio of messages older than this many days (0 keeps audio as long as it is referenced)
+AUDIO_RETENTION_DAYS = float(os.getenv("AUDIO_RETENTION_DAYS", "0"))
+
 # Default whisper model size; can be overridden via env in the future.
 WHISPER_MODEL_SIZE = "tiny"
 
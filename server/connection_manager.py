@@ -1,17 +1,76 @@
 import logging
 import asyncio
-from typing import Dict, List, Any
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Tuple
 from fastapi import WebSocket, WebSocketDisconnect
-from pathlib import Path
 
+import numpy as np
+
+from . import metrics
+from .audio_utils import AUDIO_FORMATS, concat_audio, new_audio_filename, WHISPER_SAMPLE_RATE
+from .config import (
+    AUDIO_OUTPUT_FORMAT,
+    CALL_STREAMING_DEFAULT,
+    STREAM_MIN_SENTENCE_CHARS,
+    STREAM_INGEST_SAMPLE_RATE,
+    PARTIAL_TRANSCRIPT_INTERVAL_MS,
+)
 from .db import Database
+from .executors import get_executor
 from .stt_service import WhisperService
 from .ollama_service import OllamaService
 from .tts_service import TTSService
 from .storage import StorageProvider
+from .tts_cache import TTSCache
+from .context_builder import ContextBuilder
+from .vad import UtteranceSegmenter
 
 logger = logging.getLogger("speech_coach.websocket")
 
+
+class SentenceChunker:
+    """Accumulates streamed LLM tokens and releases complete sentences for TTS."""
+
+    _BOUNDARY = re.compile(r"(?<=[.!?\u2026])[\"')\]]*\s+|\n+")
+
+    def __init__(self, min_chars: int = STREAM_MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, token: str) -> List[str]:
+        self.buffer += token
+        sentences = []
+        start = 0
+        for match in self._BOUNDARY.finditer(self.buffer):
+            candidate = self.buffer[start:match.end()].strip()
+            if len(candidate) >= self.min_chars:
+                sentences.append(candidate)
+                start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        tail = self.buffer.strip()
+        self.buffer = ""
+        return tail or None
+
+
+@dataclass
+class PcmIngestState:
+    """Per-connection state for streaming PCM ingest."""
+
+    segmenter: UtteranceSegmenter
+    options: Dict[str, Any]
+    turn_task: Optional[asyncio.Task] = None
+    partial_task: Optional[asyncio.Task] = None
+    last_partial_ms: int = 0
+
+    @property
+    def turn_active(self) -> bool:
+        return self.turn_task is not None and not self.turn_task.done()
+
+
 class ConnectionManager:
     def __init__(
         self,
@@ -20,35 +79,193 @@ class ConnectionManager:
         ollama_service: OllamaService,
         tts_service: TTSService,
         storage_provider: StorageProvider,
+        tts_cache: TTSCache,
+        context_builder: ContextBuilder,
     ):
         self.active_connections: Dict[str, WebSocket] = {}
+        self.pcm_ingests: Dict[str, PcmIngestState] = {}
         self.db = db
         self.stt_service = stt_service
         self.ollama_service = ollama_service
         self.tts_service = tts_service
         self.storage_provider = storage_provider
+        self.tts_cache = tts_cache
+        self.context_builder = context_builder
+        # Full-reply recordings of streamed turns, encoded and saved after the turn has ended.
+        self._recordings: set = set()
 
     async def connect(self, websocket: WebSocket, session_id: str):
         await websocket.accept()
+        if session_id not in self.active_connections:
+            metrics.ACTIVE_WEBSOCKETS.inc()
         self.active_connections[session_id] = websocket
         logger.info(f"WebSocket connected: session_id={session_id}")
 
     def disconnect(self, session_id: str):
         if session_id in self.active_connections:
             del self.active_connections[session_id]
+            metrics.ACTIVE_WEBSOCKETS.dec()
+        state = self.pcm_ingests.pop(session_id, None)
+        if state is not None:
+            for task in (state.turn_task, state.partial_task):
+                if task is not None and not task.done():
+                    task.cancel()
         logger.info(f"WebSocket disconnected: session_id={session_id}")
 
-    def build_chat_history(self, session_id: str) -> List[Dict[str, str]]:
-        messages = self.db.get_messages(session_id)
-        chat_messages = []
-        for msg in messages:
-            role = "assistant" if msg["sender"] == "coach" else "user"
-            content = msg["text"] or ""
-            chat_messages.append({"role": role, "content": content})
-        return chat_messages
+    async def build_chat_history(self, session_id: str) -> List[Dict[str, str]]:
+        return await self.db.get_chat_history_async(session_id)
+
+    async def _stream_reply(
+        self,
+        websocket: WebSocket,
+        history: List[Dict[str, str]],
+        model: str,
+        speaker: str,
+        tts_model: str,
+        audio_format: str,
+    ) -> Tuple[str, List[bytes]]:
+        """Stream LLM tokens and synthesize each finished sentence while generation continues.
+
+        Returns the full reply text and the encoded bytes of every synthesized chunk, in order.
+        """
+        sentences: asyncio.Queue = asyncio.Queue()
+
+        async def produce() -> str:
+            chunker = SentenceChunker()
+            parts = []
+            try:
+                async for token in self.ollama_service.chat_stream(history, model=model):
+                    parts.append(token)
+                    await websocket.send_json({"type": "text_delta", "text": token})
+                    for sentence in chunker.feed(token):
+                        await sentences.put(sentence)
+                tail = chunker.flush()
+                if tail:
+                    await sentences.put(tail)
+            finally:
+                await sentences.put(None)
+            return "".join(parts)
+
+        async def consume() -> List[bytes]:
+            chunks = []
+            while (sentence := await sentences.get()) is not None:
+                if not chunks:
+                    await websocket.send_json({"type": "status", "status": "speaking"})
+                audio_url, audio_data = await self.tts_cache.synthesize(
+                    sentence, speaker=speaker, model=tts_model, need_bytes=True, audio_format=audio_format
+                )
+                await websocket.send_json(
+                    {
+                        "type": "audio_chunk",
+                        "index": len(chunks),
+                        "url": self.storage_provider.delivery_url(audio_url),
+                        "text": sentence,
+                    }
+                )
+                chunks.append(audio_data)
+            return chunks
+
+        producer = asyncio.create_task(produce())
+        consumer = asyncio.create_task(consume())
+        done, pending = await asyncio.wait({producer, consumer}, return_when=asyncio.FIRST_EXCEPTION)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+        return producer.result(), consumer.result()
+
+    async def _save_recording(self, chunks: List[bytes], audio_format: str, filename: str):
+        try:
+            recording = await get_executor("encode").run(concat_audio, chunks, audio_format)
+            await self.storage_provider.save_file_async(recording, filename)
+        except Exception:
+            logger.exception("Saving reply recording %s failed", filename)
+
+    async def drain(self):
+        """Wait for reply recordings still being saved."""
+        if self._recordings:
+            await asyncio.gather(*self._recordings, return_exceptions=True)
+
+    async def _respond(
+        self,
+        websocket: WebSocket,
+        session_id: str,
+        user_text: str,
+        model: str = None,
+        speaker: str = None,
+        tts_model: str = None,
+        stream: Optional[bool] = None,
+        audio_format: Optional[str] = None,
+    ):
+        """Run the LLM and TTS stages for a transcribed user turn and push results to the client."""
+        audio_format = audio_format or AUDIO_OUTPUT_FORMAT
+        logger.info(f"Transcribed: {user_text}")
+        await websocket.send_json({"type": "transcription", "text": user_text})
+        
+        await self.db.add_message_async(session_id=session_id, sender="user", text=user_text)
+
+        # 2. LLM
+        history = await self.build_chat_history(session_id)
+        history.append({"role": "user", "content": user_text})  # Add current msg
+        history = await self.context_builder.build(session_id, history, model)
+        
+        # Send "thinking" status
+        await websocket.send_json({"type": "status", "status": "thinking"})
+
+        if CALL_STREAMING_DEFAULT if stream is None else stream:
+            coach_reply, chunks = await self._stream_reply(
+                websocket, history, model, speaker, tts_model, audio_format
+            )
+            logger.info(f"Coach Reply (streamed, {len(chunks)} chunks): {coach_reply}")
+            await websocket.send_json({"type": "text_response", "text": coach_reply})
+
+            # History keeps the whole reply as one recording. The client already has every chunk,
+            # so the concatenation is encoded and saved off the turn's critical path.
+            audio_url = None
+            if chunks:
+                filename = new_audio_filename(ext=AUDIO_FORMATS[audio_format]["ext"])
+                audio_url = self.storage_provider.get_url(filename)
+            await self.db.add_message_async(session_id=session_id, sender="coach", text=coach_reply, audio_path=audio_url)
+
+            await websocket.send_json(
+                {"type": "audio_complete", "url": self.storage_provider.delivery_url(audio_url), "chunks": len(chunks)}
+            )
+            await websocket.send_json({"type": "status", "status": "idle"})
+            if chunks:
+                task = asyncio.create_task(self._save_recording(chunks, audio_format, filename))
+                self._recordings.add(task)
+                task.add_done_callback(self._recordings.discard)
+            return
+
+        coach_reply = await self.ollama_service.chat(history, model=model)
+        logger.info(f"Coach Reply: {coach_reply}")
+        await websocket.send_json({"type": "text_response", "text": coach_reply})
+
+        # 3. TTS
+        await websocket.send_json({"type": "status", "status": "speaking"})
+
+        audio_url, _ = await self.tts_cache.synthesize(
+            coach_reply, speaker=speaker, model=tts_model, audio_format=audio_format
+        )
+
+        await self.db.add_message_async(session_id=session_id, sender="coach", text=coach_reply, audio_path=audio_url)
+
+        # Send audio URL to client (or bytes directly if preferred)
+        await websocket.send_json({"type": "audio_url", "url": self.storage_provider.delivery_url(audio_url)})
+        
+        # Also send end status
+        await websocket.send_json({"type": "status", "status": "idle"})
 
     async def process_audio_stream(
-        self, session_id: str, audio_bytes: bytes, model: str = None, speaker: str = None, tts_model: str = None
+        self,
+        session_id: str,
+        audio_bytes: bytes,
+        model: str = None,
+        speaker: str = None,
+        tts_model: str = None,
+        stream: Optional[bool] = None,
+        audio_format: Optional[str] = None,
     ):
         websocket = self.active_connections.get(session_id)
         if not websocket:
@@ -56,76 +273,103 @@ class ConnectionManager:
             return
 
         try:
-            # 1. Transcribe
-            logger.info("Starting transcription...")
-            # Ideally STT service would accept bytes directly, but our current implementation expects file/uploadfile
-            # We will use transcribe_upload logic but adapted for bytes
-            import tempfile
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-                tmp.write(audio_bytes)
-                tmp_path = Path(tmp.name)
-            
-            try:
-                user_text = await self.stt_service.transcribe_file(tmp_path)
-            finally:
-                tmp_path.unlink(missing_ok=True)
-
-            logger.info(f"Transcribed: {user_text}")
-            await websocket.send_json({"type": "transcription", "text": user_text})
-            
-            self.db.add_message(session_id=session_id, sender="user", text=user_text)
-
-            # 2. LLM
-            history = self.build_chat_history(session_id)
-            history.append({"role": "user", "content": user_text})  # Add current msg
-            
-            # Send "thinking" status
-            await websocket.send_json({"type": "status", "status": "thinking"})
-            
-            coach_reply = await self.ollama_service.chat(history, model=model)
-            logger.info(f"Coach Reply: {coach_reply}")
-            await websocket.send_json({"type": "text_response", "text": coach_reply})
+            with metrics.turn(session_id, mode="call", flow="ws"):
+                # 1. Transcribe
+                logger.info("Starting transcription...")
+                with metrics.stage("stt"):
+                    user_text = await self.stt_service.transcribe_bytes(audio_bytes)
 
-            # 3. TTS
-            await websocket.send_json({"type": "status", "status": "speaking"})
-            
-            # Use storage provider indirectly via tts_service or manually?
-            # Existing tts_service uses direct file writes. We should update TTSService to use StorageProvider 
-            # Or temporarily, we let TTSService write to disk, then we upload to StorageProvider?
-            # Implementation plan said "Refactor process_audio to use StorageService".
-            # Let's assume for now TTSService returns a Path (local), we then use StorageProvider to 'save' it (upload it) if needed.
-            # But wait, TTSService currently writes to OUTPUT_DIR. 
-            # Ideally TTSService should be injected with StorageProvider.
-            
-            # For this step, I'll pass the local content to storage provider if I had updated TTSService to take it.
-            # Since I haven't updated TTSService signature yet, I will get the Path from TTSService, read it, and put it in StorageProvider, then return URL.
-            
-            tts_path = await self.tts_service.synthesize(coach_reply, speaker=speaker, model=tts_model)
-            
-            # Read back generated file to save via provider (if we were fully abstracting)
-            # But currently TTSService writes to `config.OUTPUT_DIR` which is what LocalStorageProvider uses.
-            # So if we are Local, it's already there. 
-            # If we are S3, we need to upload it.
-            
-            with open(tts_path, "rb") as f:
-                audio_data = f.read()
-            
-            filename = tts_path.name
-            audio_url = self.storage_provider.save_file(audio_data, filename)
-            
-            # If S3, we can delete the local temp file generated by TTS service
-            # but TTSService currently manages its output. 
-            # We will rely on TTSService internal logic for now, but really we should refactor TTS service later to be cleaner.
-             
-            self.db.add_message(session_id=session_id, sender="coach", text=coach_reply, audio_path=audio_url)
-
-            # Send audio URL to client (or bytes directly if preferred)
-            await websocket.send_json({"type": "audio_url", "url": audio_url})
-            
-            # Also send end status
-            await websocket.send_json({"type": "status", "status": "idle"})
+                await self._respond(websocket, session_id, user_text, model, speaker, tts_model, stream, audio_format)
 
         except Exception as e:
             logger.exception("Error in process_audio_stream")
             await websocket.send_json({"type": "error", "message": str(e)})
 
+    def start_pcm_ingest(self, session_id: str, sample_rate: int = STREAM_INGEST_SAMPLE_RATE, **options):
+        """Switch a connection to streaming ingest of raw 16-bit mono PCM frames.
+
+        `options` (model, speaker, tts_model, stream, audio_format) are applied to every turn.
+        """
+        self.pcm_ingests[session_id] = PcmIngestState(
+            segmenter=UtteranceSegmenter(sample_rate=sample_rate), options=options
+        )
+        logger.info(f"PCM ingest enabled: session_id={session_id} sample_rate={sample_rate}")
+
+    async def process_pcm_frame(self, session_id: str, data: bytes):
+        state = self.pcm_ingests.get(session_id)
+        if state is None:
+            logger.warning(f"PCM frame for session without streaming ingest: {session_id}")
+            return
+        if state.turn_active:
+            # Half-duplex: microphone audio is dropped while the coach turn is in flight.
+            return
+
+        segmenter = state.segmenter
+        utterance = segmenter.feed(data)
+        if utterance is not None:
+            self._start_turn(session_id, state, utterance)
+            return
+
+        if not segmenter.in_speech:
+            state.last_partial_ms = 0
+            return
+        partial_idle = state.partial_task is None or state.partial_task.done()
+        if partial_idle and segmenter.speech_ms - state.last_partial_ms >= PARTIAL_TRANSCRIPT_INTERVAL_MS:
+            state.last_partial_ms = segmenter.speech_ms
+            state.partial_task = asyncio.create_task(self._emit_partial(session_id, segmenter.current_audio()))
+
+    def end_utterance(self, session_id: str):
+        """Force an endpoint when the client signals the user stopped speaking."""
+        state = self.pcm_ingests.get(session_id)
+        if state is None or state.turn_active:
+            return
+        utterance = state.segmenter.flush()
+        if utterance is not None:
+            self._start_turn(session_id, state, utterance)
+
+    def _start_turn(self, session_id: str, state: PcmIngestState, utterance: np.ndarray):
+        if state.partial_task is not None and not state.partial_task.done():
+            state.partial_task.cancel()
+        state.last_partial_ms = 0
+        state.turn_task = asyncio.create_task(self.process_utterance(session_id, utterance, **state.options))
+
+    async def _emit_partial(self, session_id: str, audio: np.ndarray):
+        websocket = self.active_connections.get(session_id)
+        if not websocket:
+            return
+        try:
+            text = await self.stt_service.transcribe_array(audio)
+        except Exception:
+            logger.exception("Partial transcription failed")
+            return
+        if text:
+            await websocket.send_json({"type": "partial_transcript", "text": text})
+
+    async def process_utterance(
+        self,
+        session_id: str,
+        audio: np.ndarray,
+        model: str = None,
+        speaker: str = None,
+        tts_model: str = None,
+        stream: Optional[bool] = None,
+        audio_format: Optional[str] = None,
+    ):
+        """Transcribe an endpointed 16 kHz utterance and run the rest of the turn."""
+        websocket = self.active_connections.get(session_id)
+        if not websocket:
+            logger.warning(f"No active WebSocket for session {session_id}")
+            return
+
+        try:
+            with metrics.turn(session_id, mode="call", flow="ws_pcm"):
+                logger.info("Endpoint reached; transcribing %.2fs utterance", audio.size / WHISPER_SAMPLE_RATE)
+                with metrics.stage("stt"):
+                    user_text = await self.stt_service.transcribe_array(audio)
+                if not user_text:
+                    await websocket.send_json({"type": "status", "status": "idle"})
+                    return
+                await self._respond(websocket, session_id, user_text, model, speaker, tts_model, stream, audio_format)
+        except Exception as e:
+            logger.exception("Error in process_utterance")
+            await websocket.send_json({"type": "error", "message": str(e)})
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from .config import LLM_CONFIG
+from .db import Database
+from .ollama_service import OllamaService
+
+logger = logging.getLogger("speech_coach.context")
+
+SUMMARY_PROMPT = (
+    "You maintain running notes for a speech coaching session. Update the notes with the new "
+    "conversation turns below. Keep the learner's goals, recurring mistakes, corrections already "
+    "given and the current topic. Reply with the updated notes only, in at most 150 words."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) plus per-message framing overhead."""
+    return len(text) // 4 + 4
+
+
+class ContextBuilder:
+    """Builds a bounded LLM prompt from a session's history.
+
+    The last `keep_turns` turns are sent verbatim; older messages are folded into a rolling
+    summary that is refreshed in the background and stored with the session. Until the summary
+    catches up, unsummarized older messages are included verbatim as far as the token budget
+    allows, newest first.
+    """
+
+    def __init__(self, db: Database, ollama_service: OllamaService):
+        self.db = db
+        self.ollama_service = ollama_service
+        settings = LLM_CONFIG.get("app_settings", {})
+        self.default_budget = settings.get("context_budget_tokens", 3072)
+        self.reply_reserve = settings.get("context_reply_reserve_tokens", 512)
+        self.keep_messages = 2 * settings.get("context_keep_turns", 6)
+        self.summary_min_messages = settings.get("context_summary_min_messages", 4)
+        self._model_budgets: Dict[str, int] = {}
+        for tier in LLM_CONFIG.get("hardware_tiers", []):
+            for m in tier.get("models", []):
+                if m.get("context_budget_tokens"):
+                    self._model_budgets[m.get("ollama_tag")] = m["context_budget_tokens"]
+        self._summarizing: Dict[str, asyncio.Task] = {}
+
+    def budget_for(self, model: Optional[str]) -> int:
+        """Prompt token budget for a model, leaving room for the reply."""
+        total = self._model_budgets.get(model or self.ollama_service.default_model, self.default_budget)
+        return max(total - self.reply_reserve, 256)
+
+    async def build(self, session_id: str, history: List[Dict[str, str]], model: Optional[str] = None) -> List[Dict[str, str]]:
+        budget = self.budget_for(model)
+        older = history[: -self.keep_messages] if len(history) > self.keep_messages else []
+        recent = history[len(older):]
+
+        summary = await self.db.get_session_summary_async(session_id) if older else None
+        covered = min(summary["covered_count"], len(older)) if summary else 0
+        unsummarized = older[covered:]
+        if len(unsummarized) >= self.summary_min_messages:
+            self._schedule_summary(session_id, older, summary, model)
+
+        prefix = []
+        if summary:
+            prefix.append({"role": "system", "content": f"Notes from earlier in this session:\n{summary['summary']}"})
+        used = sum(estimate_tokens(m["content"]) for m in prefix)
+
+        # Recent turns have priority; the current user message is always kept.
+        kept: List[Dict[str, str]] = []
+        for msg in reversed(recent):
+            cost = estimate_tokens(msg["content"])
+            if kept and used + cost > budget:
+                break
+            kept.append(msg)
+            used += cost
+        if len(kept) == len(recent):
+            for msg in reversed(unsummarized):
+                cost = estimate_tokens(msg["content"])
+                if used + cost > budget:
+                    break
+                kept.append(msg)
+                used += cost
+        kept.reverse()
+
+        if len(kept) + len(prefix) < len(history):
+            logger.info(
+                "Compacted context session_id=%s msgs=%s->%s est_tokens=%s budget=%s",
+                session_id,
+                len(history),
+                len(kept) + len(prefix),
+                used,
+                budget,
+            )
+        return prefix + kept
+
+    def _schedule_summary(
+        self, session_id: str, older: List[Dict[str, str]], summary: Optional[Dict], model: Optional[str]
+    ):
+        task = self._summarizing.get(session_id)
+        if task is not None and not task.done():
+            return
+        task = asyncio.create_task(self._summarize(session_id, list(older), summary, model))
+        self._summarizing[session_id] = task
+        task.add_done_callback(lambda _: self._summarizing.pop(session_id, None))
+
+    async def _summarize(
+        self, session_id: str, older: List[Dict[str, str]], summary: Optional[Dict], model: Optional[str]
+    ):
+        covered = summary["covered_count"] if summary else 0
+        new_turns = "\n".join(f"{m['role']}: {m['content']}" for m in older[covered:])
+        previous = summary["summary"] if summary else "(none yet)"
+        messages = [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": f"Current notes:\n{previous}\n\nNew turns:\n{new_turns}"},
+        ]
+        try:
+            updated = await self.ollama_service.chat(messages, model=model)
+        except Exception:
+            logger.exception("Summary update failed session_id=%s", session_id)
+            return
+        if not await self.db.session_exists_async(session_id):
+            return
+        await self.db.save_session_summary_async(session_id, updated.strip(), len(older))
+        logger.info("Updated summary session_id=%s covered=%s", session_id, len(older))
@@ -1,20 +1,293 @@
+import json
+import logging
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import Callable, Iterator, List, Optional, Dict, Any, Set, Tuple
 
-from .config import DB_PATH
+from .config import (
+    DB_PATH,
+    DB_READER_CONNECTIONS,
+    DB_BUSY_TIMEOUT_MS,
+    DB_WRITE_BEHIND,
+    DB_WRITE_BEHIND_MAX_BATCH,
+    DB_WRITE_BEHIND_INTERVAL_MS,
+)
+from . import metrics
+from .executors import get_executor
+from .history_cache import SessionHistoryCache, to_chat_message
+
+logger = logging.getLogger("speech_coach.db")
+
+# Whole seconds between two ISO timestamps, truncated like timedelta.total_seconds(). julianday
+# differences carry floating-point error, so round to the millisecond before truncating.
+_DURATION_SECONDS = "CAST(ROUND((julianday({last}) - julianday({first})) * 86400, 3) AS INTEGER)"
+
+_STATS_INSERT_TRIGGER = f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_insert_stats AFTER INSERT ON messages BEGIN
+            INSERT INTO session_stats (session_id, message_count, first_message, last_message)
+            VALUES (NEW.session_id, 1, NEW.created_at, NEW.created_at)
+            ON CONFLICT(session_id) DO UPDATE SET
+                message_count = message_count + 1,
+                first_message = MIN(first_message, excluded.first_message),
+                last_message = MAX(last_message, excluded.last_message);
+            UPDATE session_stats
+            SET duration_seconds = {_DURATION_SECONDS.format(last="last_message", first="first_message")}
+            WHERE session_id = NEW.session_id;
+        END
+        """
+
+_STATS_DELETE_TRIGGER = f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_delete_stats AFTER DELETE ON messages BEGIN
+            UPDATE session_stats SET
+                message_count = (SELECT COUNT(*) FROM messages WHERE session_id = OLD.session_id),
+                first_message = (SELECT MIN(created_at) FROM messages WHERE session_id = OLD.session_id),
+                last_message = (SELECT MAX(created_at) FROM messages WHERE session_id = OLD.session_id)
+            WHERE session_id = OLD.session_id;
+            UPDATE session_stats
+            SET duration_seconds = COALESCE(
+                {_DURATION_SECONDS.format(last="last_message", first="first_message")}, 0
+            )
+            WHERE session_id = OLD.session_id;
+        END
+        """
+
+# Schema migrations applied in order on top of the base tables; PRAGMA user_version
+# records how many have run. An entry may be a single statement or a tuple of statements.
+MIGRATIONS = [
+    "CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages(session_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions(created_at)",
+    (
+        # Per-session statistics maintained by triggers so listing never aggregates messages.
+        """
+        CREATE TABLE IF NOT EXISTS session_stats (
+            session_id TEXT PRIMARY KEY,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            first_message TEXT,
+            last_message TEXT,
+            duration_seconds INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        f"""
+        INSERT OR REPLACE INTO session_stats (session_id, message_count, first_message, last_message, duration_seconds)
+        SELECT session_id, COUNT(*), MIN(created_at), MAX(created_at),
+               {_DURATION_SECONDS.format(last="MAX(created_at)", first="MIN(created_at)")}
+        FROM messages GROUP BY session_id
+        """,
+        _STATS_INSERT_TRIGGER,
+        _STATS_DELETE_TRIGGER,
+        "CREATE INDEX IF NOT EXISTS idx_sessions_created_id ON sessions(created_at, id)",
+    ),
+    # Preferred coach audio codec for the session (NULL = server default)
+    "ALTER TABLE sessions ADD COLUMN audio_format TEXT",
+    (
+        # Databases created before the duration fix: durations came out a second short.
+        "DROP TRIGGER IF EXISTS trg_messages_insert_stats",
+        "DROP TRIGGER IF EXISTS trg_messages_delete_stats",
+        _STATS_INSERT_TRIGGER,
+        _STATS_DELETE_TRIGGER,
+        f"""
+        UPDATE session_stats SET duration_seconds = COALESCE(
+            {_DURATION_SECONDS.format(last="last_message", first="first_message")}, 0
+        )
+        """,
+    ),
+]
+
+SESSION_LIST_COLUMNS = """
+    s.id,
+    s.mode,
+    s.created_at,
+    s.topic,
+    s.language,
+    s.model,
+    COALESCE(st.message_count, 0) AS message_count,
+    st.first_message,
+    st.last_message,
+    COALESCE(st.duration_seconds, 0) AS duration_seconds
+"""
+
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Group-commits queued INSERTs from a single writer thread.
+
+    Statements are batched into one transaction once `max_batch` rows are queued or
+    `interval_ms` has passed since the first one. `flush` blocks until everything queued
+    before it is committed; `close` flushes and stops the thread.
+    """
+
+    def __init__(self, db: "Database", max_batch: int, interval_ms: int):
+        self.db = db
+        self.max_batch = max_batch
+        self.interval_s = interval_ms / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self._thread = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql: str, params: tuple, on_done: Optional[Callable[[], None]] = None):
+        with self._pending_lock:
+            self._pending += 1
+        self._queue.put((sql, params, on_done))
+
+    def flush(self):
+        with self._pending_lock:
+            if self._pending == 0:
+                return
+        barrier = threading.Event()
+        self._queue.put(barrier)
+        barrier.wait()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            batch, barriers = [], []
+            deadline = time.monotonic() + self.interval_s
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    barriers.append(item)
+                else:
+                    batch.append(item)
+                if stop or barriers or len(batch) >= self.max_batch:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                self._commit(batch)
+            for barrier in barriers:
+                barrier.set()
+        # Drain anything queued behind the stop marker.
+        leftover = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is not _STOP:
+                leftover.append(item)
+        if leftover:
+            self._commit(leftover)
+
+    def _commit(self, batch):
+        try:
+            with self.db._write(flush=False) as cur:
+                for sql, params, _ in batch:
+                    cur.execute(sql, params)
+        except sqlite3.Error:
+            logger.exception("Group commit of %s rows failed; retrying row by row", len(batch))
+            for sql, params, _ in batch:
+                try:
+                    with self.db._write(flush=False) as cur:
+                        cur.execute(sql, params)
+                except sqlite3.Error:
+                    logger.exception("Dropping write-behind row: %s %s", sql, params)
+        self.batches += 1
+        self.rows += len(batch)
+        for _, _, on_done in batch:
+            if on_done is not None:
+                on_done()
+        with self._pending_lock:
+            self._pending -= len(batch)
 
 
 class Database:
-    def __init__(self, db_path: Path = DB_PATH):
+    def __init__(
+        self, db_path: Path = DB_PATH, readers: int = DB_READER_CONNECTIONS, write_behind: bool = DB_WRITE_BEHIND
+    ):
         self.db_path = db_path
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
+        self.history_cache = SessionHistoryCache()
+        self._write_behind: Optional[WriteBehindQueue] = None
+        self._write_conn = self._connect()
+        self._write_lock = threading.Lock()
         self._init_tables()
+        self._migrate()
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(max(1, readers)):
+            self._readers.put(self._connect())
+        # Sessions whose INSERT is still queued, so session_exists can answer without a flush.
+        self._pending_sessions: set = set()
+        if write_behind:
+            self._write_behind = WriteBehindQueue(self, DB_WRITE_BEHIND_MAX_BATCH, DB_WRITE_BEHIND_INTERVAL_MS)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL only fsyncs at checkpoints; a crash can lose the last commits but never corrupts.
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-16000")  # ~16 MB page cache per connection
+        conn.execute("PRAGMA mmap_size=134217728")
+        return conn
+
+    def _flush_pending(self):
+        """Wait until queued write-behind inserts are committed (read-your-writes)."""
+        if self._write_behind is not None:
+            self._write_behind.flush()
+
+    @contextmanager
+    def _write(self, flush: bool = True) -> Iterator[sqlite3.Cursor]:
+        """Serialize writes on the single writer connection; commit on success.
+
+        Direct writes first flush queued inserts so statements are applied in call order.
+        """
+        if flush:
+            self._flush_pending()
+        with self._write_lock:
+            cur = self._write_conn.cursor()
+            try:
+                yield cur
+                self._write_conn.commit()
+            except Exception:
+                self._write_conn.rollback()
+                raise
+
+    @contextmanager
+    def _read(self) -> Iterator[sqlite3.Cursor]:
+        """Borrow a reader connection from the pool."""
+        conn = self._readers.get()
+        try:
+            yield conn.cursor()
+        finally:
+            self._readers.put(conn)
+
+    def _migrate(self):
+        with self._write() as cur:
+            version = cur.execute("PRAGMA user_version").fetchone()[0]
+            for index, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                logger.info("Applying DB migration %s", index)
+                statements = migration if isinstance(migration, tuple) else (migration,)
+                for statement in statements:
+                    cur.execute(statement)
+                cur.execute(f"PRAGMA user_version={index}")
 
     def _init_tables(self):
-        cur = self.conn.cursor()
+        with self._write() as cur:
+            self._create_tables(cur)
+
+    def _create_tables(self, cur: sqlite3.Cursor):
         cur.execute(
             """
             CREATE TABLE IF NOT EXISTS sessions (
@@ -40,63 +313,181 @@ class Database:
             )
             """
         )
-        self.conn.commit()
-
-    def add_session(self, session_id: str, mode: str, topic: str = None, language: str = None, model: str = None):
-        cur = self.conn.cursor()
         cur.execute(
-            "INSERT INTO sessions (id, mode, created_at, topic, language, model) VALUES (?, ?, ?, ?, ?, ?)",
-            (session_id, mode, datetime.utcnow().isoformat(), topic, language, model),
+            """
+            CREATE TABLE IF NOT EXISTS session_summaries (
+                session_id TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                covered_count INTEGER NOT NULL,
+                updated_at TEXT NOT NULL,
+                FOREIGN KEY(session_id) REFERENCES sessions(id)
+            )
+            """
         )
-        self.conn.commit()
 
-    def add_message(self, session_id: str, sender: str, text: str, audio_path: Optional[str] = None):
-        cur = self.conn.cursor()
-        cur.execute(
-            "INSERT INTO messages (session_id, sender, text, audio_path, created_at) VALUES (?, ?, ?, ?, ?)",
-            (session_id, sender, text, audio_path, datetime.utcnow().isoformat()),
+    def add_session(
+        self,
+        session_id: str,
+        mode: str,
+        topic: str = None,
+        language: str = None,
+        model: str = None,
+        audio_format: str = None,
+    ):
+        sql = (
+            "INSERT INTO sessions (id, mode, created_at, topic, language, model, audio_format) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)"
         )
-        self.conn.commit()
+        params = (session_id, mode, datetime.utcnow().isoformat(), topic, language, model, audio_format)
+        if self._write_behind is not None:
+            self._pending_sessions.add(session_id)
+            self._write_behind.submit(sql, params, lambda: self._pending_sessions.discard(session_id))
+            return
+        with self._write() as cur:
+            cur.execute(sql, params)
+
+    def add_message(self, session_id: str, sender: str, text: str, audio_path: Optional[str] = None):
+        # Hold the cache lock across commit and append so a concurrent cache load cannot miss or double the row.
+        sql = "INSERT INTO messages (session_id, sender, text, audio_path, created_at) VALUES (?, ?, ?, ?, ?)"
+        params = (session_id, sender, text, audio_path, datetime.utcnow().isoformat())
+        with self.history_cache.lock:
+            if self._write_behind is not None:
+                self._write_behind.submit(sql, params)
+            else:
+                with self._write() as cur:
+                    cur.execute(sql, params)
+            self.history_cache.append(session_id, to_chat_message(sender, text))
 
     def get_messages(self, session_id: str) -> List[Dict[str, Any]]:
-        cur = self.conn.cursor()
-        rows = cur.execute(
-            "SELECT id, session_id, sender, text, audio_path, created_at FROM messages WHERE session_id=? ORDER BY id",
-            (session_id,),
-        ).fetchall()
+        self._flush_pending()
+        with self._read() as cur:
+            rows = cur.execute(
+                "SELECT id, session_id, sender, text, audio_path, created_at FROM messages WHERE session_id=? ORDER BY id",
+                (session_id,),
+            ).fetchall()
         return [dict(row) for row in rows]
 
+    def _load_chat_history(self, session_id: str) -> List[Dict[str, str]]:
+        self._flush_pending()
+        with self._read() as cur:
+            rows = cur.execute(
+                "SELECT sender, text FROM messages WHERE session_id=? ORDER BY id",
+                (session_id,),
+            ).fetchall()
+        return [to_chat_message(row["sender"], row["text"]) for row in rows]
+
+    def get_chat_history(self, session_id: str) -> List[Dict[str, str]]:
+        """Session history in Ollama chat format, served from the in-memory cache when possible."""
+        return self.history_cache.get(session_id, self._load_chat_history)
+
+    def get_session_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Rolling summary of the oldest `covered_count` messages of a session, if any."""
+        with self._read() as cur:
+            row = cur.execute(
+                "SELECT summary, covered_count, updated_at FROM session_summaries WHERE session_id=?",
+                (session_id,),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def save_session_summary(self, session_id: str, summary: str, covered_count: int):
+        with self._write() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO session_summaries (session_id, summary, covered_count, updated_at) VALUES (?, ?, ?, ?)",
+                (session_id, summary, covered_count, datetime.utcnow().isoformat()),
+            )
+
     def session_exists(self, session_id: str) -> bool:
-        cur = self.conn.cursor()
-        row = cur.execute("SELECT 1 FROM sessions WHERE id=?", (session_id,)).fetchone()
+        if session_id in self._pending_sessions:
+            return True
+        with self._read() as cur:
+            row = cur.execute("SELECT 1 FROM sessions WHERE id=?", (session_id,)).fetchone()
         return row is not None
 
+    def get_session_audio_format(self, session_id: str) -> Optional[str]:
+        """The session's preferred audio codec, or None when it uses the server default."""
+        if session_id in self._pending_sessions:
+            self._flush_pending()
+        with self._read() as cur:
+            row = cur.execute("SELECT audio_format FROM sessions WHERE id=?", (session_id,)).fetchone()
+        return row["audio_format"] if row else None
+
     def get_all_sessions(self) -> List[Dict[str, Any]]:
         """Get all sessions with message count and duration stats."""
-        cur = self.conn.cursor()
-        rows = cur.execute(
-            """
-            SELECT 
-                s.id,
-                s.mode,
-                s.created_at,
-                s.topic,
-                s.language,
-                s.model,
-                COUNT(m.id) as message_count,
-                MIN(m.created_at) as first_message,
-                MAX(m.created_at) as last_message
-            FROM sessions s
-            LEFT JOIN messages m ON s.id = m.session_id
-            GROUP BY s.id
-            ORDER BY s.created_at DESC
-            """
-        ).fetchall()
+        self._flush_pending()
+        with self._read() as cur:
+            rows = cur.execute(
+                f"""
+                SELECT {SESSION_LIST_COLUMNS}
+                FROM sessions s
+                LEFT JOIN session_stats st ON st.session_id = s.id
+                ORDER BY s.created_at DESC, s.id DESC
+                """
+            ).fetchall()
         return [dict(row) for row in rows]
 
-    def update_session_metadata(self, session_id: str, topic: str = None, language: str = None, model: str = None):
-        """Update session metadata (topic, language, model)."""
-        cur = self.conn.cursor()
+    def get_sessions_page(
+        self, limit: int, before: Optional[Tuple[str, str]] = None, after: Optional[Tuple[str, str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Keyset page of sessions, newest first.
+
+        `before`/`after` are (created_at, id) keys of the last/first row of an adjacent page:
+        `before` returns older sessions, `after` returns newer ones.
+        """
+        self._flush_pending()
+        where, params, order = "", [], "DESC"
+        if before is not None:
+            where, params = "WHERE (s.created_at, s.id) < (?, ?)", list(before)
+        elif after is not None:
+            where, params, order = "WHERE (s.created_at, s.id) > (?, ?)", list(after), "ASC"
+        with self._read() as cur:
+            rows = cur.execute(
+                f"""
+                SELECT {SESSION_LIST_COLUMNS}
+                FROM sessions s
+                LEFT JOIN session_stats st ON st.session_id = s.id
+                {where}
+                ORDER BY s.created_at {order}, s.id {order}
+                LIMIT ?
+                """,
+                params + [limit],
+            ).fetchall()
+        result = [dict(row) for row in rows]
+        if order == "ASC":
+            result.reverse()
+        return result
+
+    def get_messages_page(
+        self, session_id: str, limit: int, before: Optional[int] = None, after: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Keyset page of a session's messages in chronological order.
+
+        Without a cursor the latest `limit` messages are returned; `before`/`after` are message ids.
+        """
+        self._flush_pending()
+        where, params, order = "", [session_id], "DESC"
+        if before is not None:
+            where, params = "AND id < ?", [session_id, before]
+        elif after is not None:
+            where, params, order = "AND id > ?", [session_id, after], "ASC"
+        with self._read() as cur:
+            rows = cur.execute(
+                f"""
+                SELECT id, session_id, sender, text, audio_path, created_at FROM messages
+                WHERE session_id=? {where}
+                ORDER BY id {order}
+                LIMIT ?
+                """,
+                params + [limit],
+            ).fetchall()
+        result = [dict(row) for row in rows]
+        if order == "DESC":
+            result.reverse()
+        return result
+
+    def update_session_metadata(
+        self, session_id: str, topic: str = None, language: str = None, model: str = None, audio_format: str = None
+    ):
+        """Update session metadata (topic, language, model, audio format)."""
         updates = []
         params = []
         
@@ -109,19 +500,106 @@ class Database:
         if model is not None:
             updates.append("model = ?")
             params.append(model)
+        if audio_format is not None:
+            updates.append("audio_format = ?")
+            params.append(audio_format)
         
         if updates:
             params.append(session_id)
             query = f"UPDATE sessions SET {', '.join(updates)} WHERE id = ?"
-            cur.execute(query, params)
-            self.conn.commit()
+            with self._write() as cur:
+                cur.execute(query, params)
 
     def delete_session(self, session_id: str):
         """Delete a session and all its messages."""
-        cur = self.conn.cursor()
-        # Delete messages first (foreign key constraint)
-        cur.execute("DELETE FROM messages WHERE session_id=?", (session_id,))
-        # Delete session
-        cur.execute("DELETE FROM sessions WHERE id=?", (session_id,))
-        self.conn.commit()
+        self.delete_sessions([session_id])
+
+    def delete_sessions(self, session_ids: Optional[List[str]] = None) -> int:
+        """Delete several sessions (every session when `session_ids` is None) in one transaction.
+
+        Returns the number of sessions removed. Their audio files are left to storage GC.
+        """
+        if session_ids is None:
+            where, params = "", ()
+        else:
+            if not session_ids:
+                return 0
+            # One JSON parameter keeps the statement set-based regardless of how many ids are passed.
+            where, params = " WHERE {} IN (SELECT value FROM json_each(?))", (json.dumps(list(session_ids)),)
+        with self._write() as cur:
+            # Drop stats first so the per-row message delete trigger has nothing to recompute.
+            cur.execute("DELETE FROM session_stats" + where.format("session_id"), params)
+            # Delete messages first (foreign key constraint)
+            cur.execute("DELETE FROM messages" + where.format("session_id"), params)
+            cur.execute("DELETE FROM session_summaries" + where.format("session_id"), params)
+            cur.execute("DELETE FROM sessions" + where.format("id"), params)
+            deleted = cur.rowcount
+        if session_ids is None:
+            self.history_cache.invalidate()
+        else:
+            for session_id in session_ids:
+                self.history_cache.invalidate(session_id)
+        return deleted
+
+    def expire_audio_references(self, older_than: datetime) -> int:
+        """Detach audio from messages created before `older_than`; returns the number of messages updated."""
+        with self._write() as cur:
+            cur.execute(
+                "UPDATE messages SET audio_path=NULL WHERE audio_path IS NOT NULL AND created_at < ?",
+                (older_than.isoformat(),),
+            )
+            return cur.rowcount
+
+    def referenced_audio_paths(self) -> Set[str]:
+        """Every distinct audio_path still referenced by a message."""
+        self._flush_pending()
+        with self._read() as cur:
+            cur.execute("SELECT DISTINCT audio_path FROM messages WHERE audio_path IS NOT NULL")
+            return {row[0] for row in cur}
+
+    # Async wrappers: run the blocking call on the "db" executor so handlers never block the event loop.
+
+    async def _run(self, fn: Callable, *args):
+        with metrics.stage("db", operation=fn.__name__):
+            return await get_executor("db").run(fn, *args)
+
+    async def add_session_async(
+        self, session_id: str, mode: str, topic: str = None, language: str = None, model: str = None
+    ):
+        return await self._run(self.add_session, session_id, mode, topic, language, model)
+
+    async def add_message_async(self, session_id: str, sender: str, text: str, audio_path: Optional[str] = None):
+        return await self._run(self.add_message, session_id, sender, text, audio_path)
+
+    async def get_messages_async(self, session_id: str) -> List[Dict[str, Any]]:
+        return await self._run(self.get_messages, session_id)
+
+    async def get_chat_history_async(self, session_id: str) -> List[Dict[str, str]]:
+        return await self._run(self.get_chat_history, session_id)
+
+    async def get_session_summary_async(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return await self._run(self.get_session_summary, session_id)
+
+    async def save_session_summary_async(self, session_id: str, summary: str, covered_count: int):
+        return await self._run(self.save_session_summary, session_id, summary, covered_count)
+
+    async def session_exists_async(self, session_id: str) -> bool:
+        return await self._run(self.session_exists, session_id)
+
+    async def get_session_audio_format_async(self, session_id: str) -> Optional[str]:
+        return await self._run(self.get_session_audio_format, session_id)
+
+    def write_behind_stats(self) -> Optional[Dict[str, int]]:
+        if self._write_behind is None:
+            return None
+        return {"batches": self._write_behind.batches, "rows": self._write_behind.rows}
 
+    def close(self):
+        """Flush queued writes and close all connections."""
+        if self._write_behind is not None:
+            self._write_behind.close()
+            self._write_behind = None
+        with self._write_lock:
+            self._write_conn.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
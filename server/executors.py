@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from .config import STAGE_WORKERS
+
+logger = logging.getLogger("speech_coach.executors")
+
+
+class StageExecutor:
+    """Bounded thread pool for one pipeline stage, with queue depth and wait-time accounting.
+
+    Admission is controlled on the event loop with a semaphore sized to the pool, so the
+    time a job spends waiting for a free worker is measured without wrapping the job itself.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-stage")
+        self._slots = asyncio.Semaphore(max_workers)
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+        self.total_run_s = 0.0
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        loop = asyncio.get_running_loop()
+        enqueued = time.perf_counter()
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        started = time.perf_counter()
+        wait = started - enqueued
+        self.total_wait_s += wait
+        self.max_wait_s = max(self.max_wait_s, wait)
+        self.running += 1
+        try:
+            return await loop.run_in_executor(self._executor, fn, *args)
+        except asyncio.CancelledError:
+            # The caller gave up (interrupted turn, superseded partial transcript); not a job failure.
+            self.cancelled += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.total_run_s += time.perf_counter() - started
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        done = self.completed or 1
+        return {
+            "max_workers": self.max_workers,
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "avg_wait_ms": round(self.total_wait_s / done * 1000, 2),
+            "max_wait_ms": round(self.max_wait_s * 1000, 2),
+            "avg_run_ms": round(self.total_run_s / done * 1000, 2),
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_executors: Dict[str, StageExecutor] = {}
+
+
+def get_executor(stage: str) -> StageExecutor:
+    """Return the executor for a pipeline stage (stt, tts, db, storage, encode), creating it on first use."""
+    executor = _executors.get(stage)
+    if executor is None:
+        if stage not in STAGE_WORKERS:
+            raise KeyError(f"Unknown pipeline stage: {stage}")
+        executor = StageExecutor(stage, STAGE_WORKERS[stage])
+        _executors[stage] = executor
+        logger.info("Created executor stage=%s max_workers=%s", stage, executor.max_workers)
+    return executor
+
+
+def executor_stats() -> Dict[str, Dict[str, Any]]:
+    return {stage: get_executor(stage).stats() for stage in STAGE_WORKERS}
+
+
+def shutdown_executors(wait: bool = True):
+    for executor in _executors.values():
+        executor.shutdown(wait=wait)
+    _executors.clear()
@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from .config import HISTORY_CACHE_MAX_SESSIONS, HISTORY_CACHE_TTL_S
+
+
+def to_chat_message(sender: str, text: Optional[str]) -> Dict[str, str]:
+    """Convert a stored message to Ollama chat format."""
+    role = "assistant" if sender == "coach" else "user"
+    return {"role": role, "content": text or ""}
+
+
+class SessionHistoryCache:
+    """Bounded per-session cache of chat history in Ollama message format.
+
+    Sessions are evicted least-recently-used beyond `max_sessions`, and dropped once idle
+    for longer than `ttl_s`. Only sessions already loaded are appended to; a miss loads
+    the full history once through the supplied loader.
+    """
+
+    def __init__(self, max_sessions: int = HISTORY_CACHE_MAX_SESSIONS, ttl_s: float = HISTORY_CACHE_TTL_S):
+        self.max_sessions = max_sessions
+        self.ttl_s = ttl_s
+        self._sessions: "OrderedDict[str, List[Dict[str, str]]]" = OrderedDict()
+        self._touched: Dict[str, float] = {}
+        # Re-entrant so callers can hold it around a DB write plus the matching append.
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def _expire(self, now: float):
+        while self._sessions:
+            oldest = next(iter(self._sessions))
+            if now - self._touched[oldest] <= self.ttl_s and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.pop(oldest)
+            self._touched.pop(oldest)
+
+    def get(self, session_id: str, loader: Callable[[str], List[Dict[str, str]]]) -> List[Dict[str, str]]:
+        """Return a copy of the session's history, loading it with `loader` on a miss."""
+        now = time.monotonic()
+        with self.lock:
+            self._expire(now)
+            history = self._sessions.get(session_id)
+            if history is not None:
+                self.hits += 1
+                self._sessions.move_to_end(session_id)
+            else:
+                # Load under the lock so a concurrent append cannot slip in between read and insert.
+                self.misses += 1
+                history = loader(session_id)
+                self._sessions[session_id] = history
+            self._touched[session_id] = now
+            self._expire(now)
+            return list(history)
+
+    def append(self, session_id: str, message: Dict[str, str]):
+        with self.lock:
+            history = self._sessions.get(session_id)
+            if history is not None:
+                history.append(message)
+                self._sessions.move_to_end(session_id)
+                self._touched[session_id] = time.monotonic()
+
+    def invalidate(self, session_id: Optional[str] = None):
+        """Drop one session, or every session when `session_id` is None."""
+        with self.lock:
+            if session_id is None:
+                self._sessions.clear()
+                self._touched.clear()
+            else:
+                self._sessions.pop(session_id, None)
+                self._touched.pop(session_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"sessions": len(self._sessions), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,304 @@
+"""Load generator: python -m server.loadtest --url http://localhost:8000 --callers 20 --flows ws,audio,text
+
+Each simulated caller opens its own session and runs `--turns` turns on one flow: the call
+WebSocket (`ws`), `/api/process_audio` (`audio`) or `/api/send_text` (`text`); callers are spread
+over the flows round-robin. Callers start evenly over `--ramp-up` seconds and pause `--think-time`
+seconds (+-50% jitter) between turns. Audio comes from `--corpus` (a directory of audio files) or a
+synthetic clip; text from `--text-corpus` (one message per line) or built-in phrases.
+
+Per flow it reports p50/p95/p99 of time to transcription, first text, text response, first audio
+URL and the full turn (WebSocket), or the full request (HTTP), plus error rate and throughput.
+Start the server with STUB_SERVICES=true to measure the server without models.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import random
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+import websockets
+
+from .audio_utils import WHISPER_SAMPLE_RATE, encode_wav
+
+logger = logging.getLogger("speech_coach.loadtest")
+
+FLOWS = ("ws", "audio", "text")
+AUDIO_EXTENSIONS = {".wav", ".webm", ".ogg", ".mp3", ".m4a", ".flac"}
+DEFAULT_PHRASES = [
+    "Hi, I would like to practice small talk.",
+    "Can you help me with my pronunciation of the word comfortable?",
+    "Yesterday I goes to the market and buyed some apples.",
+    "How do I politely disagree with my manager in a meeting?",
+]
+
+
+def synthetic_clip(seconds: float = 2.0) -> bytes:
+    """A short speech-like WAV (modulated tone plus noise) for runs without a corpus."""
+    t = np.arange(int(seconds * WHISPER_SAMPLE_RATE)) / WHISPER_SAMPLE_RATE
+    rng = np.random.default_rng(0)
+    wave = 0.3 * np.sin(2 * np.pi * 220 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)) + 0.02 * rng.standard_normal(t.size)
+    return encode_wav(wave.astype(np.float32), WHISPER_SAMPLE_RATE)
+
+
+def load_audio_corpus(path: Optional[Path]) -> List[bytes]:
+    if path is None:
+        return [synthetic_clip()]
+    files = sorted(p for p in path.iterdir() if p.suffix.lower() in AUDIO_EXTENSIONS)
+    if not files:
+        raise SystemExit(f"No audio files ({', '.join(sorted(AUDIO_EXTENSIONS))}) in {path}")
+    return [p.read_bytes() for p in files]
+
+
+def load_text_corpus(path: Optional[Path]) -> List[str]:
+    if path is None:
+        return DEFAULT_PHRASES
+    lines = [line.strip() for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+    if not lines:
+        raise SystemExit(f"No messages in {path}")
+    return lines
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+@dataclass
+class FlowStats:
+    turns: int = 0
+    errors: int = 0
+    error_samples: List[str] = field(default_factory=list)
+    timings: Dict[str, List[float]] = field(default_factory=dict)  # metric -> seconds
+
+    def record(self, metric: str, seconds: float):
+        self.timings.setdefault(metric, []).append(seconds)
+
+    def fail(self, message: str):
+        self.errors += 1
+        if len(self.error_samples) < 10:
+            self.error_samples.append(message)
+
+    def report(self, elapsed_s: float) -> Dict[str, Any]:
+        attempted = self.turns + self.errors
+        metrics = {}
+        for metric, values in self.timings.items():
+            ms = sorted(v * 1000 for v in values)
+            metrics[metric] = {
+                "n": len(ms),
+                "p50_ms": round(percentile(ms, 50), 1),
+                "p95_ms": round(percentile(ms, 95), 1),
+                "p99_ms": round(percentile(ms, 99), 1),
+                "max_ms": round(ms[-1], 1),
+            }
+        return {
+            "turns": self.turns,
+            "errors": self.errors,
+            "error_rate": round(self.errors / attempted, 4) if attempted else 0.0,
+            "turns_per_s": round(self.turns / elapsed_s, 2) if elapsed_s else 0.0,
+            "metrics": metrics,
+            "error_samples": self.error_samples,
+        }
+
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace, audio: List[bytes], texts: List[str]):
+        self.args = args
+        self.audio = audio
+        self.texts = texts
+        self.stats = {flow: FlowStats() for flow in FLOWS}
+        self.http = httpx.AsyncClient(
+            base_url=args.url,
+            timeout=args.timeout,
+            limits=httpx.Limits(max_connections=args.callers, max_keepalive_connections=args.callers),
+        )
+
+    def ws_url(self, session_id: str) -> str:
+        base = self.args.url.replace("https://", "wss://", 1).replace("http://", "ws://", 1)
+        params = [f"format={self.args.format}"] if self.args.format else []
+        if self.args.stream is not None:
+            params.append(f"stream={'true' if self.args.stream else 'false'}")
+        query = f"?{'&'.join(params)}" if params else ""
+        return f"{base}/api/ws/call/{session_id}{query}"
+
+    async def ws_turn(self, ws, clip: bytes, stats: FlowStats):
+        started = time.perf_counter()
+        await ws.send(clip)
+        seen = set()
+        while True:
+            message = json.loads(await asyncio.wait_for(ws.recv(), timeout=self.args.timeout))
+            kind = message.get("type")
+            elapsed = time.perf_counter() - started
+            if kind == "error":
+                raise RuntimeError(message.get("message"))
+            metric = {
+                "transcription": "transcription",
+                "text_delta": "first_text",
+                "text_response": "text_response",
+                "audio_chunk": "audio_url",
+                "audio_url": "audio_url",
+            }.get(kind)
+            if metric and metric not in seen:
+                seen.add(metric)
+                stats.record(metric, elapsed)
+            if kind == "status" and message.get("status") == "idle" and "text_response" in seen:
+                stats.record("turn", elapsed)
+                return
+
+    async def run_ws_caller(self, caller: int, stats: FlowStats):
+        session_id = f"load-{uuid.uuid4()}"
+        async with websockets.connect(self.ws_url(session_id), max_size=None) as ws:
+            for turn in range(self.args.turns):
+                await self.run_turn(stats, self.ws_turn(ws, self.audio[(caller + turn) % len(self.audio)], stats))
+                await self.think()
+
+    async def audio_turn(self, session_id: str, clip: bytes, stats: FlowStats):
+        data = {"session_id": session_id}
+        if self.args.format:
+            data["audio_format"] = self.args.format
+        started = time.perf_counter()
+        response = await self.http.post("/api/process_audio", data=data, files={"audio": ("turn.wav", clip, "audio/wav")})
+        response.raise_for_status()
+        stats.record("turn", time.perf_counter() - started)
+
+    async def text_turn(self, session_id: str, text: str, stats: FlowStats):
+        payload = {"session_id": session_id, "text": text}
+        if self.args.format:
+            payload["audio_format"] = self.args.format
+        started = time.perf_counter()
+        response = await self.http.post("/api/send_text", json=payload)
+        response.raise_for_status()
+        stats.record("turn", time.perf_counter() - started)
+
+    async def run_http_caller(self, flow: str, caller: int, stats: FlowStats):
+        session_id = f"load-{uuid.uuid4()}"
+        for turn in range(self.args.turns):
+            if flow == "audio":
+                work = self.audio_turn(session_id, self.audio[(caller + turn) % len(self.audio)], stats)
+            else:
+                work = self.text_turn(session_id, self.texts[(caller + turn) % len(self.texts)], stats)
+            await self.run_turn(stats, work)
+            await self.think()
+
+    async def run_turn(self, stats: FlowStats, work):
+        try:
+            await work
+        except Exception as exc:
+            stats.fail(f"{type(exc).__name__}: {exc}")
+        else:
+            stats.turns += 1
+
+    async def think(self):
+        if self.args.think_time > 0:
+            await asyncio.sleep(self.args.think_time * random.uniform(0.5, 1.5))
+
+    async def run_caller(self, flow: str, caller: int):
+        await asyncio.sleep(self.args.ramp_up * caller / self.args.callers)
+        stats = self.stats[flow]
+        try:
+            if flow == "ws":
+                await self.run_ws_caller(caller, stats)
+            else:
+                await self.run_http_caller(flow, caller, stats)
+        except Exception as exc:
+            # Connection-level failure (e.g. the WebSocket could not be opened or was closed).
+            logger.warning("Caller %s (%s) aborted: %s", caller, flow, exc)
+            stats.fail(f"{type(exc).__name__}: {exc}")
+
+    async def run(self) -> Dict[str, Any]:
+        flows = itertools.cycle(self.args.flows)
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(self.run_caller(next(flows), caller) for caller in range(self.args.callers)))
+        finally:
+            await self.http.aclose()
+        elapsed = time.perf_counter() - started
+        total_turns = sum(s.turns for s in self.stats.values())
+        total_errors = sum(s.errors for s in self.stats.values())
+        return {
+            "config": {
+                "url": self.args.url,
+                "callers": self.args.callers,
+                "turns": self.args.turns,
+                "flows": self.args.flows,
+                "ramp_up_s": self.args.ramp_up,
+                "think_time_s": self.args.think_time,
+                "stream": self.args.stream,
+                "format": self.args.format,
+            },
+            "elapsed_s": round(elapsed, 2),
+            "turns": total_turns,
+            "errors": total_errors,
+            "error_rate": round(total_errors / (total_turns + total_errors), 4) if total_turns + total_errors else 0.0,
+            "turns_per_s": round(total_turns / elapsed, 2) if elapsed else 0.0,
+            "flows": {flow: self.stats[flow].report(elapsed) for flow in self.args.flows},
+        }
+
+
+def print_summary(report: Dict[str, Any]):
+    print(
+        f"{report['turns']} turns, {report['errors']} errors ({report['error_rate']:.1%}) in "
+        f"{report['elapsed_s']} s = {report['turns_per_s']} turns/s",
+        file=sys.stderr,
+    )
+    for flow, stats in report["flows"].items():
+        print(f"[{flow}] turns={stats['turns']} errors={stats['errors']} turns/s={stats['turns_per_s']}", file=sys.stderr)
+        for metric, m in stats["metrics"].items():
+            print(
+                f"  {metric:<14} p50={m['p50_ms']:>8} ms  p95={m['p95_ms']:>8} ms  p99={m['p99_ms']:>8} ms  (n={m['n']})",
+                file=sys.stderr,
+            )
+        for sample in stats["error_samples"][:3]:
+            print(f"  error: {sample}", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Concurrent load test of the speech coach call flows")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--callers", type=int, default=10, help="concurrent simulated callers")
+    parser.add_argument("--turns", type=int, default=5, help="turns per caller")
+    parser.add_argument("--flows", default=",".join(FLOWS), help="comma-separated subset of ws,audio,text")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds over which callers start")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean pause between turns in seconds")
+    parser.add_argument("--corpus", type=Path, help="directory of audio files to send")
+    parser.add_argument("--text-corpus", type=Path, help="file with one text message per line")
+    parser.add_argument("--stream", type=lambda v: v.lower() in {"1", "true", "yes"}, default=None, help="WebSocket streaming mode")
+    parser.add_argument("--format", help="coach audio format (wav, opus, mp3)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-turn timeout in seconds")
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--max-error-rate", type=float, default=None, help="exit non-zero above this error rate")
+    args = parser.parse_args(argv)
+
+    args.flows = [f.strip() for f in args.flows.split(",") if f.strip()]
+    unknown = sorted(set(args.flows) - set(FLOWS))
+    if unknown or not args.flows:
+        parser.error(f"unknown flows: {', '.join(unknown)}" if unknown else "no flows given")
+    if args.callers < 1:
+        parser.error("--callers must be at least 1")
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    report = asyncio.run(LoadTest(args, load_audio_corpus(args.corpus), load_text_corpus(args.text_corpus)).run())
+    print_summary(report)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    if args.max_error_rate is not None and report["error_rate"] > args.max_error_rate:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
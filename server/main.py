@@ -1,19 +1,48 @@
+import asyncio
+import base64
+import json
+import re
 import uuid
 import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import List, Dict
 
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-
-from .config import OUTPUT_DIR, LLM_CONFIG, TTS_MODELS, TTS_DEFAULT_MODEL, STORAGE_CONFIG
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+
+from .config import (
+    OUTPUT_DIR,
+    LLM_CONFIG,
+    TTS_MODELS,
+    TTS_DEFAULT_MODEL,
+    STORAGE_CONFIG,
+    STREAM_INGEST_SAMPLE_RATE,
+    STREAM_INGEST_SAMPLE_RATE_RANGE,
+    AUDIO_OUTPUT_FORMAT,
+    AUDIO_CACHE_MAX_AGE_S,
+    AUDIO_ACCEL_REDIRECT_PREFIX,
+    OLLAMA_PREFETCH_TIER,
+    OLLAMA_HEALTH_CHECK_S,
+    LLM_AUTOTUNE,
+    WARMUP_ENABLED,
+    WARMUP_COMPONENTS,
+    STUB_SERVICES,
+)
+from .audio_utils import content_type_for, normalize_audio_format
 from .db import Database
 from .ollama_service import OllamaService
 from .stt_service import WhisperService
 from .tts_service import TTSService
-from .storage import get_storage_provider
+from .storage import LocalStorageProvider, get_storage_provider
+from .tts_cache import TTSCache
+from .storage_gc import StorageGC
+from .context_builder import ContextBuilder
 from .connection_manager import ConnectionManager
+from .executors import executor_stats, shutdown_executors
+from .warmup import WarmupState, run_warmup
+from . import metrics
+from .stub_backends import install_stub_backends, stub_ollama_client_factory
 from .schemas import (
     SessionCreateRequest,
     SessionCreateResponse,
@@ -22,9 +51,36 @@ from .schemas import (
     ChatHistoryResponse,
     Message,
     UpdateMetadataRequest,
+    BulkDeleteRequest,
+    ModelPullRequest,
 )
 
-app = FastAPI(title="Speech Coach")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so the liveness probe answers immediately.
+    warmup_task = asyncio.create_task(run_warmup(warmup_state, whisper_service, tts_service, ollama_service))
+    gc_task = asyncio.create_task(storage_gc.run_forever()) if storage_gc.enabled else None
+    health_task = asyncio.create_task(ollama_service.router.run_health_checks(OLLAMA_HEALTH_CHECK_S))
+    if OLLAMA_PREFETCH_TIER:
+        asyncio.create_task(ollama_service.prefetch_tier())
+    if LLM_AUTOTUNE and not (WARMUP_ENABLED and "llm" in WARMUP_COMPONENTS):
+        # Otherwise the LLM warmup runs the autotune before loading the chosen model.
+        asyncio.create_task(ollama_service.autotune())
+    yield
+    if not warmup_task.done():
+        warmup_task.cancel()
+    if gc_task is not None:
+        gc_task.cancel()
+    health_task.cancel()
+    await connection_manager.drain()
+    await storage_provider.drain()
+    shutdown_executors(wait=False)
+    # Flushes any write-behind inserts and TTS cache index updates still queued.
+    db.close()
+    tts_cache.close()
+
+
+app = FastAPI(title="Speech Coach", lifespan=lifespan)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -42,30 +98,100 @@ app.add_middleware(
 )
 
 db = Database()
-ollama_service = OllamaService()
+if STUB_SERVICES:
+    ollama_service = OllamaService(hosts=["http://ollama-stub"], client_factory=stub_ollama_client_factory())
+else:
+    ollama_service = OllamaService()
 whisper_service = WhisperService()
 tts_service = TTSService()
+if STUB_SERVICES:
+    install_stub_backends(whisper_service, tts_service)
 storage_provider = get_storage_provider(STORAGE_CONFIG, OUTPUT_DIR)
-connection_manager = ConnectionManager(db, whisper_service, ollama_service, tts_service, storage_provider)
+tts_cache = TTSCache(tts_service, storage_provider)
+storage_gc = StorageGC(db, storage_provider, tts_cache)
+context_builder = ContextBuilder(db, ollama_service)
+connection_manager = ConnectionManager(
+    db, whisper_service, ollama_service, tts_service, storage_provider, tts_cache, context_builder
+)
+warmup_state = WarmupState()
 
 BASE_DIR = Path(__file__).resolve().parent
 
-# Mount output directory for serving generated audio files
-app.mount("/output", StaticFiles(directory=str(OUTPUT_DIR)), name="output")
+# Upper bound for `limit` on paginated listing endpoints
+MAX_PAGE_SIZE = 200
 
 logger.info(f"TTS_DEFAULT_MODEL: {TTS_DEFAULT_MODEL}")
 logger.info(f"Storage Provider: {type(storage_provider).__name__}")
-
-def build_chat_history(session_id: str) -> List[Dict[str, str]]:
-    """Convert stored messages to Ollama chat format."""
-    messages = db.get_messages(session_id)
-    chat_messages = []
-    for msg in messages:
-        role = "assistant" if msg["sender"] == "coach" else "user"
-        content = msg["text"] or ""
-        chat_messages.append({"role": role, "content": content})
-    return chat_messages
-
+if STUB_SERVICES:
+    logger.warning("STUB_SERVICES is on: STT, LLM and TTS replies come from stand-in models")
+
+_HASHED_AUDIO_NAME = re.compile(r"coach_tts_([0-9a-f]{32})\.\w+")
+
+
+@app.api_route("/output/{filename}", methods=["GET", "HEAD"])
+def serve_audio(filename: str, request: Request):
+    """Serve generated audio from local storage.
+
+    Files are immutable, so responses carry a long-lived immutable Cache-Control. Coach audio
+    named `coach_tts_<hash>` gets a strong ETag from that hash (a hash of the cached audio's bytes,
+    or a unique id for recordings written once); any other file gets a weak ETag from its size
+    and mtime.
+    FileResponse handles Range/If-Range and uses the ASGI pathsend extension (sendfile) when the
+    server offers it; with AUDIO_ACCEL_REDIRECT_PREFIX nginx sends the file instead.
+    """
+    if not isinstance(storage_provider, LocalStorageProvider) or filename.startswith("."):
+        raise HTTPException(status_code=404, detail="Audio not found")
+    path = storage_provider.path_for(filename)
+    try:
+        stat_result = path.stat()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    named = _HASHED_AUDIO_NAME.fullmatch(filename)
+    etag = f'"{named.group(1)}"' if named else f'W/"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+    headers = {"Cache-Control": f"public, max-age={AUDIO_CACHE_MAX_AGE_S}, immutable", "ETag": etag}
+    if_none_match = request.headers.get("if-none-match")
+    # If-None-Match uses weak comparison: W/ prefixes are ignored on both sides.
+    opaque = etag.removeprefix("W/")
+    if if_none_match and (
+        if_none_match.strip() == "*" or opaque in (t.strip().removeprefix("W/") for t in if_none_match.split(","))
+    ):
+        return Response(status_code=304, headers=headers)
+
+    media_type = content_type_for(filename)
+    if AUDIO_ACCEL_REDIRECT_PREFIX:
+        relative = path.relative_to(storage_provider.base_dir).as_posix()
+        headers["X-Accel-Redirect"] = f"{AUDIO_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{relative}"
+        return Response(headers=headers, media_type=media_type)
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat_result)
+
+
+@app.get("/api/health/live")
+def health_live():
+    return {"status": "alive"}
+
+
+@app.get("/api/health/ready")
+def health_ready():
+    """503 until warmup has loaded every configured component; includes per-component timings."""
+    report = warmup_state.report()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
+
+async def resolve_audio_format(session_id: str, requested: str | None) -> str:
+    """Coach audio codec for a turn: the request's choice, else the session's, else AUDIO_OUTPUT_FORMAT."""
+    if requested is None:
+        requested = await db.get_session_audio_format_async(session_id) or AUDIO_OUTPUT_FORMAT
+    return normalize_audio_format(requested)
+
+
+def validated_audio_format(audio_format: str | None) -> str | None:
+    if audio_format is None:
+        return None
+    try:
+        return normalize_audio_format(audio_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.post("/api/session", response_model=SessionCreateResponse)
@@ -73,8 +199,9 @@ def create_session(payload: SessionCreateRequest):
     logger.info("Creating session mode=%s topic=%s language=%s", payload.mode, payload.topic, payload.language)
     if payload.mode not in {"call", "chat"}:
         raise HTTPException(status_code=400, detail="mode must be 'call' or 'chat'")
+    audio_format = validated_audio_format(payload.audio_format)
     session_id = str(uuid.uuid4())
-    db.add_session(session_id, payload.mode, payload.topic, payload.language, payload.model)
+    db.add_session(session_id, payload.mode, payload.topic, payload.language, payload.model, audio_format)
     logger.info("Session created id=%s mode=%s", session_id, payload.mode)
     return SessionCreateResponse(session_id=session_id)
 
@@ -87,6 +214,7 @@ async def process_audio(
     speaker: str | None = Form(None),
     tts_model: str | None = Form(None),
     call_mode: bool = Form(False),
+    audio_format: str | None = Form(None),
 ):
     logger.info(
         "process_audio start session_id=%s model=%s speaker=%s tts_model=%s call_mode=%s filename=%s",
@@ -97,56 +225,61 @@ async def process_audio(
         call_mode,
         audio.filename,
     )
-    if not db.session_exists(session_id):
-        db.add_session(session_id, mode="call")
-
+    if not await db.session_exists_async(session_id):
+        await db.add_session_async(session_id, mode="call")
     try:
-        # Transcribe user audio
-        user_text = await whisper_service.transcribe_upload(audio)
-        logger.info("Transcription done len=%s", len(user_text))
-        db.add_message(session_id=session_id, sender="user", text=user_text)
-
-        logger.info("User text: %s", user_text)
-
-        # Build context and query LLM
-        history = build_chat_history(session_id)
-        history.append({"role": "user", "content": user_text})
-        
-        try:
-            coach_reply = await ollama_service.chat(history, model=model)
-            logger.info("LLM reply len=%s", len(coach_reply))
-        except Exception as e:
-            logger.error("LLM failed: %s", e)
-            raise HTTPException(status_code=500, detail=f"LLM generation failed: {str(e)}")
+        audio_format = await resolve_audio_format(session_id, audio_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Synthesize coach reply
+    with metrics.turn(session_id, mode="call", flow="process_audio"):
         try:
-            tts_path = await tts_service.synthesize(coach_reply, speaker=speaker, model=tts_model)
-            logger.info("TTS synthesized path=%s", tts_path)
-            
-            # Use StorageProvider to handle the file (Local or S3)
-            with open(tts_path, "rb") as f:
-                audio_bytes = f.read()
-            audio_url = storage_provider.save_file(audio_bytes, tts_path.name)
+            # Transcribe user audio
+            with metrics.stage("stt"):
+                user_text = await whisper_service.transcribe_upload(audio)
+            logger.info("Transcription done len=%s", len(user_text))
+            await db.add_message_async(session_id=session_id, sender="user", text=user_text)
+
+            logger.info("User text: %s", user_text)
+
+            # Build context and query LLM
+            history = await db.get_chat_history_async(session_id)
+            history.append({"role": "user", "content": user_text})
+            history = await context_builder.build(session_id, history, model)
+        
+            try:
+                coach_reply = await ollama_service.chat(history, model=model)
+                logger.info("LLM reply len=%s", len(coach_reply))
+            except Exception as e:
+                logger.error("LLM failed: %s", e)
+                raise HTTPException(status_code=500, detail=f"LLM generation failed: {str(e)}")
+
+            # Synthesize coach reply
+            try:
+                # Cached replies reuse stored audio; misses are synthesized and saved via StorageProvider
+                audio_url, _ = await tts_cache.synthesize(
+                    coach_reply, speaker=speaker, model=tts_model, audio_format=audio_format
+                )
+                logger.info("TTS audio url=%s", audio_url)
             
-        except Exception as e:
-            logger.error("TTS failed: %s", e)
-            raise HTTPException(status_code=500, detail=f"TTS synthesis failed: {str(e)}")
+            except Exception as e:
+                logger.error("TTS failed: %s", e)
+                raise HTTPException(status_code=500, detail=f"TTS synthesis failed: {str(e)}")
 
-        db.add_message(session_id=session_id, sender="coach", text=coach_reply, audio_path=audio_url)
+            await db.add_message_async(session_id=session_id, sender="coach", text=coach_reply, audio_path=audio_url)
 
-        return ProcessAudioResponse(
-            session_id=session_id,
-            user_transcript=user_text,
-            coach_reply=coach_reply,
-            coach_audio_url=audio_url,
-        )
+            return ProcessAudioResponse(
+                session_id=session_id,
+                user_transcript=user_text,
+                coach_reply=coach_reply,
+                coach_audio_url=storage_provider.delivery_url(audio_url),
+            )
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.exception("Unexpected error in process_audio")
-        raise HTTPException(status_code=500, detail=str(e))
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.exception("Unexpected error in process_audio")
+            raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/send_text", response_model=ProcessAudioResponse)
@@ -158,97 +291,141 @@ async def send_text(payload: TextMessageRequest):
         payload.speaker,
         payload.tts_model,
     )
-    if not db.session_exists(payload.session_id):
-        db.add_session(payload.session_id, mode="chat")
+    if not await db.session_exists_async(payload.session_id):
+        await db.add_session_async(payload.session_id, mode="chat")
+    try:
+        audio_format = await resolve_audio_format(payload.session_id, payload.audio_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    db.add_message(session_id=payload.session_id, sender="user", text=payload.text)
+    with metrics.turn(payload.session_id, mode="chat", flow="send_text"):
+        await db.add_message_async(session_id=payload.session_id, sender="user", text=payload.text)
     
-    try:
-        history = build_chat_history(payload.session_id)
-        history.append({"role": "user", "content": payload.text})
-        
-        coach_reply = await ollama_service.chat(history, model=payload.model)
-        logger.info("LLM reply len=%s", len(coach_reply))
+        try:
+            history = await db.get_chat_history_async(payload.session_id)
+            history.append({"role": "user", "content": payload.text})
+            history = await context_builder.build(payload.session_id, history, payload.model)
         
-        tts_path = await tts_service.synthesize(coach_reply, speaker=payload.speaker, model=payload.tts_model)
-        logger.info("TTS synthesized path=%s", tts_path)
+            coach_reply = await ollama_service.chat(history, model=payload.model)
+            logger.info("LLM reply len=%s", len(coach_reply))
         
-        # Use StorageProvider
-        with open(tts_path, "rb") as f:
-            audio_bytes = f.read()
-        audio_url = storage_provider.save_file(audio_bytes, tts_path.name)
-
-        db.add_message(session_id=payload.session_id, sender="coach", text=coach_reply, audio_path=audio_url)
-
-        return ProcessAudioResponse(
-            session_id=payload.session_id,
-            user_transcript=payload.text,
-            coach_reply=coach_reply,
-            coach_audio_url=audio_url,
-        )
-    except Exception as e:
-        logger.exception("Error in send_text")
-        raise HTTPException(status_code=500, detail=str(e))
+            audio_url, _ = await tts_cache.synthesize(
+                coach_reply, speaker=payload.speaker, model=payload.tts_model, audio_format=audio_format
+            )
+            logger.info("TTS audio url=%s", audio_url)
+
+            await db.add_message_async(session_id=payload.session_id, sender="coach", text=coach_reply, audio_path=audio_url)
+
+            return ProcessAudioResponse(
+                session_id=payload.session_id,
+                user_transcript=payload.text,
+                coach_reply=coach_reply,
+                coach_audio_url=storage_provider.delivery_url(audio_url),
+            )
+        except Exception as e:
+            logger.exception("Error in send_text")
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+def history_message(row: dict) -> Message:
+    return Message(**{**row, "audio_path": storage_provider.delivery_url(row["audio_path"])})
 
 
 @app.get("/api/chat/history", response_model=ChatHistoryResponse)
-def chat_history(session_id: str):
-    logger.info("chat_history session_id=%s", session_id)
+def chat_history(session_id: str, limit: int | None = None, before: int | None = None, after: int | None = None):
+    """Chat history for a session; with `limit`, a keyset page (`before`/`after` are message ids)."""
+    logger.info("chat_history session_id=%s limit=%s before=%s after=%s", session_id, limit, before, after)
     if not db.session_exists(session_id):
         raise HTTPException(status_code=404, detail="Unknown session")
-    messages = [Message(**m) for m in db.get_messages(session_id)]
-    return ChatHistoryResponse(session_id=session_id, messages=messages)
+    if limit is None:
+        rows = db.get_messages(session_id)
+        return ChatHistoryResponse(session_id=session_id, messages=[history_message(m) for m in rows])
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    # Fetch one extra row to know whether another page exists in the requested direction.
+    rows = db.get_messages_page(session_id, limit + 1, before=before, after=after)
+    has_more = len(rows) > limit
+    if has_more:
+        rows = rows[:limit] if after is not None else rows[1:]
+    return ChatHistoryResponse(
+        session_id=session_id,
+        messages=[history_message(m) for m in rows],
+        has_more=has_more,
+        next_before=rows[0]["id"] if rows else None,
+        next_after=rows[-1]["id"] if rows else None,
+    )
+
+
+def encode_cursor(session: dict) -> str:
+    return base64.urlsafe_b64encode(f"{session['created_at']}|{session['id']}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, session_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, session_id
+
+
+def session_payload(session: dict) -> dict:
+    return {
+        "session_id": session["id"],
+        "mode": session["mode"],
+        "created_at": session["created_at"],
+        "message_count": session["message_count"],
+        "duration_seconds": session["duration_seconds"],
+        "first_message": session["first_message"],
+        "last_message": session["last_message"],
+    }
 
 
 @app.get("/api/sessions/all")
-def get_all_sessions():
-    """Get all sessions with statistics."""
-    logger.info("get_all_sessions called")
-    sessions = db.get_all_sessions()
-    
-    # Calculate duration for each session
-    result = []
-    for session in sessions:
-        session_data = {
-            "session_id": session["id"],
-            "mode": session["mode"],
-            "created_at": session["created_at"],
-            "message_count": session["message_count"],
-        }
-        
-        # Calculate duration in seconds if messages exist
-        if session["first_message"] and session["last_message"]:
-            from datetime import datetime
-            first = datetime.fromisoformat(session["first_message"])
-            last = datetime.fromisoformat(session["last_message"])
-            duration = (last - first).total_seconds()
-            session_data["duration_seconds"] = int(duration)
-            session_data["first_message"] = session["first_message"]
-            session_data["last_message"] = session["last_message"]
-        else:
-            session_data["duration_seconds"] = 0
-            session_data["first_message"] = None
-            session_data["last_message"] = None
-        
-        result.append(session_data)
-    
-    return {"sessions": result}
+def get_all_sessions(limit: int | None = None, before: str | None = None, after: str | None = None):
+    """Get sessions with statistics, newest first; with `limit`, a keyset page.
+
+    `next_cursor` goes in `before` for older sessions, `prev_cursor` in `after` for newer ones.
+    """
+    logger.info("get_all_sessions called limit=%s", limit)
+    if limit is None:
+        return {"sessions": [session_payload(session) for session in db.get_all_sessions()]}
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    sessions = db.get_sessions_page(
+        limit + 1,
+        before=decode_cursor(before) if before else None,
+        after=decode_cursor(after) if after else None,
+    )
+    has_more = len(sessions) > limit
+    if has_more:
+        sessions = sessions[1:] if after else sessions[:limit]
+    return {
+        "sessions": [session_payload(session) for session in sessions],
+        "has_more": has_more,
+        "next_cursor": encode_cursor(sessions[-1]) if sessions else None,
+        "prev_cursor": encode_cursor(sessions[0]) if sessions else None,
+    }
 
 
 @app.delete("/api/sessions/clear-all")
 def clear_all_sessions():
     """Delete all sessions and messages."""
     logger.info("clear_all_sessions called")
-    sessions = db.get_all_sessions()
-    count = len(sessions)
-    
-    for session in sessions:
-        db.delete_session(session["id"])
-    
+    count = db.delete_sessions()
+    storage_gc.trigger()
     logger.info(f"Cleared {count} sessions")
     return {"success": True, "message": f"{count} sessions deleted", "count": count}
 
 
+@app.post("/api/sessions/bulk-delete")
+def bulk_delete_sessions(payload: BulkDeleteRequest):
+    """Delete the given sessions and their messages in one transaction."""
+    logger.info("bulk_delete_sessions count=%s", len(payload.session_ids))
+    count = db.delete_sessions(payload.session_ids)
+    storage_gc.trigger()
+    return {"success": True, "message": f"{count} sessions deleted", "count": count}
+
+
 @app.delete("/api/sessions/{session_id}")
 def delete_session(session_id: str):
     """Delete a session and all its messages."""
@@ -257,6 +434,7 @@ def delete_session(session_id: str):
         raise HTTPException(status_code=404, detail="Session not found")
     
     db.delete_session(session_id)
+    storage_gc.trigger()
     logger.info("Session deleted session_id=%s", session_id)
     return {"success": True, "message": "Session deleted successfully"}
 
@@ -268,7 +446,8 @@ def update_session_metadata(session_id: str, payload: UpdateMetadataRequest):
     if not db.session_exists(session_id):
         raise HTTPException(status_code=404, detail="Session not found")
     
-    db.update_session_metadata(session_id, payload.topic, payload.language, payload.model)
+    audio_format = validated_audio_format(payload.audio_format)
+    db.update_session_metadata(session_id, payload.topic, payload.language, payload.model, audio_format)
     return {"success": True}
 
 
@@ -306,32 +485,146 @@ def models_info():
     }
 
 
+@app.get("/api/models/pulls")
+def model_pulls():
+    """Background Ollama pulls with byte progress and status."""
+    return {"pulls": ollama_service.pull_manager.report()}
+
+
+@app.post("/api/models/pulls")
+async def start_model_pull(payload: ModelPullRequest):
+    """Start pulling a model onto every endpoint missing it (joins pulls already running for the tag)."""
+    return {"pulls": [job.report() for job in ollama_service.start_pull(payload.model)]}
+
+
+@app.post("/api/models/prefetch")
+async def prefetch_tier_models():
+    """Pull every model of the detected hardware tier that is not present yet."""
+    return {"tier": ollama_service.tier.get("tier_id"), "started": await ollama_service.prefetch_tier()}
+
+
+@app.get("/api/models/autotune")
+def model_autotune_report():
+    """Latest autotune benchmark results and the model it selected."""
+    return {"default_model": ollama_service.default_model, "report": ollama_service.autotuner.last_report}
+
+
+@app.post("/api/models/autotune")
+async def run_model_autotune(force: bool = False):
+    """Run the autotune now; `force=true` re-benchmarks models that already have cached results."""
+    await ollama_service.autotune(force=force)
+    return {"default_model": ollama_service.default_model, "report": ollama_service.autotuner.last_report}
+
+
+@app.get("/api/llm/endpoints")
+def llm_endpoints():
+    """Health, load, latency and models of every Ollama endpoint requests are routed across."""
+    return {"endpoints": ollama_service.router.stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus text exposition of stage latencies, LLM token rates, errors and queue depths."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/api/executors")
+def executors_info():
+    """Queue depth, concurrency and wait/run times for each pipeline stage executor."""
+    return {
+        "stages": executor_stats(),
+        "stt_batching": whisper_service.batch_stats(),
+        "db_write_behind": db.write_behind_stats(),
+    }
+
+
+@app.get("/api/tts/cache")
+def tts_cache_info():
+    """TTS cache size and hit/miss counters."""
+    return tts_cache.stats()
+
+
+@app.get("/api/storage/gc")
+def storage_gc_info():
+    """Storage GC settings and the outcome of the last pass."""
+    return storage_gc.stats()
+
+
+@app.post("/api/storage/gc")
+async def run_storage_gc():
+    """Run a storage GC pass now and return its counters."""
+    return await storage_gc.run_once()
+
+
+def parse_sample_rate(value: str | None) -> int | None:
+    """The PCM ingest sample rate from the query string, or None when invalid or out of range."""
+    if value is None:
+        return STREAM_INGEST_SAMPLE_RATE
+    try:
+        rate = int(value)
+    except ValueError:
+        return None
+    low, high = STREAM_INGEST_SAMPLE_RATE_RANGE
+    return rate if low <= rate <= high else None
+
+
 @app.websocket("/api/ws/call/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
     await connection_manager.connect(websocket, session_id)
+    stream_param = websocket.query_params.get("stream")
+    stream = None if stream_param is None else stream_param.lower() in {"1", "true", "yes"}
+    # "blob": one complete audio file per turn (client-side VAD).
+    # "pcm": continuous 16-bit mono PCM frames; the server endpoints utterances itself.
+    ingest = websocket.query_params.get("ingest", "blob")
     try:
-        if not db.session_exists(session_id):
-            db.add_session(session_id, mode="call")
-            
+        if not await db.session_exists_async(session_id):
+            await db.add_session_async(session_id, mode="call")
+        try:
+            audio_format = await resolve_audio_format(session_id, websocket.query_params.get("format"))
+        except ValueError as e:
+            await websocket.send_json({"type": "error", "message": str(e)})
+            raise
+        if ingest == "pcm":
+            sample_rate = parse_sample_rate(websocket.query_params.get("sample_rate"))
+            if sample_rate is None:
+                low, high = STREAM_INGEST_SAMPLE_RATE_RANGE
+                await websocket.send_json(
+                    {"type": "error", "message": f"sample_rate must be an integer between {low} and {high}"}
+                )
+                await websocket.close(code=1008)
+                connection_manager.disconnect(session_id)
+                return
+            connection_manager.start_pcm_ingest(
+                session_id, sample_rate=sample_rate, stream=stream, audio_format=audio_format
+            )
+
         while True:
-            # Expecting bytes for audio or json for control/metadata
-            # For simplicity, assuming the client sends raw audio bytes
-            # Ideally client should send a JSON first with metadata, or we use a custom protocol.
-            # But the requirement is "user speaks", so likely streaming audio chunks.
-            # For this MVP, let's assume the client sends one blob per turn (Turn-based as in plan).
-            
-            data = await websocket.receive_bytes()
-            # We assume it's audio data
-            # Tricky part: how to know model params? 
-            # We can default them or expect client to have set them in a previous message or query params.
-            # Let's fallback to defaults for now or parse if text frame. 
-            # Note: receive_bytes will fail if text is sent. 
-            
-            # Better approach: `receive()` and check type.
-            # But for "call" feature, audio bytes is most efficient. 
-            
-            await connection_manager.process_audio_stream(session_id, data)
-            
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            data = message.get("bytes")
+            if ingest == "pcm":
+                if data is not None:
+                    await connection_manager.process_pcm_frame(session_id, data)
+                elif message.get("text"):
+                    # Text frames carry control messages, e.g. {"type": "end_utterance"}.
+                    try:
+                        control = json.loads(message["text"])
+                    except ValueError:
+                        control = None
+                    if not isinstance(control, dict):
+                        logger.warning("Ignoring malformed control frame session_id=%s", session_id)
+                        await websocket.send_json({"type": "error", "message": "Control frames must be JSON objects"})
+                        continue
+                    if control.get("type") == "end_utterance":
+                        connection_manager.end_utterance(session_id)
+                continue
+
+            if data is None:
+                continue
+            await connection_manager.process_audio_stream(session_id, data, stream=stream, audio_format=audio_format)
+
     except WebSocketDisconnect:
         connection_manager.disconnect(session_id)
     except Exception as e:
@@ -341,5 +634,3 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
         except:
             pass
         connection_manager.disconnect(session_id)
-
-
@@ -0,0 +1,247 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from . import tracing
+from .executors import executor_stats
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+TOKENS_PER_S_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        unknown = set(labels) - set(self.labelnames)
+        if unknown:
+            raise ValueError(f"{self.name}: unknown labels {sorted(unknown)}")
+        return tuple("" if labels.get(n) is None else str(labels[n]) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """A settable gauge, or one read at scrape time from `callback` (label values -> value)."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> List[str]:
+        if self.callback is not None:
+            items = list(self.callback().items())
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> (per-bucket counts, sum, count)
+        self._values: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(counts), total, n) for k, (counts, total, n) in self._values.items()]
+        lines = []
+        for key, counts, total, n in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _executor_gauge(field: str) -> Callable[[], Dict[LabelValues, float]]:
+    return lambda: {(stage,): stats[field] for stage, stats in executor_stats().items()}
+
+
+STAGE_SECONDS: Dict[str, Histogram] = {
+    "stt": REGISTRY.register(Histogram("speech_coach_stt_seconds", "Whisper transcription latency", ["mode"])),
+    "llm": REGISTRY.register(Histogram("speech_coach_llm_seconds", "LLM reply latency (full reply)", ["model", "mode"])),
+    "tts": REGISTRY.register(Histogram("speech_coach_tts_seconds", "TTS synthesis and encoding latency (cache misses)", ["tts_model", "mode"])),
+    "storage": REGISTRY.register(Histogram("speech_coach_storage_seconds", "Storage operation latency", ["operation", "provider", "mode"])),
+    "db": REGISTRY.register(Histogram("speech_coach_db_seconds", "Database call latency including executor wait", ["operation", "mode"])),
+}
+TURN_SECONDS = REGISTRY.register(Histogram("speech_coach_turn_seconds", "Full turn latency", ["mode", "flow"]))
+LLM_FIRST_TOKEN_SECONDS = REGISTRY.register(
+    Histogram("speech_coach_llm_first_token_seconds", "Time to the first streamed LLM token", ["model", "mode"])
+)
+LLM_PROMPT_TOKENS_PER_S = REGISTRY.register(
+    Histogram("speech_coach_llm_prompt_tokens_per_second", "Ollama prompt evaluation speed", ["model"], TOKENS_PER_S_BUCKETS)
+)
+LLM_GENERATION_TOKENS_PER_S = REGISTRY.register(
+    Histogram("speech_coach_llm_generation_tokens_per_second", "Ollama generation speed", ["model"], TOKENS_PER_S_BUCKETS)
+)
+LLM_TOKENS = REGISTRY.register(Counter("speech_coach_llm_tokens_total", "Tokens processed by Ollama", ["model", "kind"]))
+TTS_CACHE_REQUESTS = REGISTRY.register(Counter("speech_coach_tts_cache_requests_total", "TTS cache lookups", ["result"]))
+ERRORS = REGISTRY.register(Counter("speech_coach_errors_total", "Failed pipeline stages and turns", ["stage", "mode"]))
+ACTIVE_WEBSOCKETS = REGISTRY.register(Gauge("speech_coach_active_websockets", "Open call WebSocket connections"))
+EXECUTOR_QUEUE_DEPTH = REGISTRY.register(
+    Gauge("speech_coach_executor_queue_depth", "Jobs waiting for a stage executor worker", ["stage"], _executor_gauge("queued"))
+)
+EXECUTOR_RUNNING = REGISTRY.register(
+    Gauge("speech_coach_executor_running", "Jobs running on a stage executor", ["stage"], _executor_gauge("running"))
+)
+
+
+@contextmanager
+def stage(name: str, **labels) -> Iterator[None]:
+    """Time a pipeline stage into its histogram and a trace span; exceptions count as errors."""
+    histogram = STAGE_SECONDS[name]
+    mode = tracing.current_mode()
+    if "mode" in histogram.labelnames:
+        labels["mode"] = mode
+    started = time.perf_counter()
+    with tracing.span(name, **labels):
+        try:
+            yield
+        except Exception:
+            ERRORS.inc(stage=name, mode=mode)
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - started, **labels)
+
+
+@contextmanager
+def turn(session_id: Optional[str], mode: str, flow: str) -> Iterator[tracing.TurnContext]:
+    """Run one user turn under a fresh turn id and record its end-to-end latency."""
+    started = time.perf_counter()
+    with tracing.turn(session_id, mode) as context:
+        try:
+            yield context
+        except Exception:
+            ERRORS.inc(stage="turn", mode=mode)
+            raise
+        finally:
+            TURN_SECONDS.observe(time.perf_counter() - started, mode=mode, flow=flow)
+
+
+def observe_llm_response(model: str, response: Any):
+    """Record Ollama's own token counts and timings (final chat response or last stream chunk)."""
+    prompt_count = response.get("prompt_eval_count")
+    prompt_ns = response.get("prompt_eval_duration")
+    eval_count = response.get("eval_count")
+    eval_ns = response.get("eval_duration")
+    if prompt_count:
+        LLM_TOKENS.inc(prompt_count, model=model, kind="prompt")
+        if prompt_ns:
+            LLM_PROMPT_TOKENS_PER_S.observe(prompt_count / (prompt_ns / 1e9), model=model)
+    if eval_count:
+        LLM_TOKENS.inc(eval_count, model=model, kind="generation")
+        if eval_ns:
+            LLM_GENERATION_TOKENS_PER_S.observe(eval_count / (eval_ns / 1e9), model=model)
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import logging
+import os
+import platform
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+from .config import (
+    LLM_AUTOTUNE_CACHE_PATH,
+    LLM_AUTOTUNE_MEMORY_HEADROOM_GB,
+    LLM_AUTOTUNE_PROMPT_TOKENS,
+    LLM_AUTOTUNE_PULL,
+    LLM_AUTOTUNE_REPLY_TOKENS,
+    LLM_AUTOTUNE_TARGET_S,
+)
+from .ollama_router import OllamaRouter
+from .pull_manager import PullManager
+
+try:
+    import psutil  # type: ignore
+except ImportError:  # optional: candidates are then not filtered by available memory
+    psutil = None
+
+logger = logging.getLogger("speech_coach.autotune")
+
+# Filler for the benchmark prompt; roughly one token per word.
+_PROMPT_TEXT = (
+    "You are a friendly speech coach. The learner just described their weekend, a trip to the coast "
+    "with friends, the weather, the food they tried and a conversation with a stranger on the train. "
+)
+_NS = 1e9
+_GB = 1024**3
+_LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1", "0.0.0.0"}
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def _is_local(host: str) -> bool:
+    return urlparse(host if "://" in host else f"http://{host}").hostname in _LOCAL_HOSTS
+
+
+def host_fingerprint(ram_gb: float, hosts: List[str]) -> str:
+    """Stable id of the hardware the benchmark ran on: CPU, cores, RAM and the Ollama endpoints."""
+    parts = [platform.system(), platform.machine(), _cpu_model(), str(os.cpu_count()), f"{round(ram_gb)}GB", *sorted(hosts)]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class ModelBenchmark:
+    model: str
+    load_s: Optional[float] = None  # Ollama load_duration of the first (cold) request
+    prompt_tps: Optional[float] = None
+    gen_tps: Optional[float] = None
+    error: Optional[str] = None
+    measured_at: float = 0.0
+
+    def reply_latency_s(self, prompt_tokens: int, reply_tokens: int) -> Optional[float]:
+        """Estimated time for a warm model to read a typical prompt and generate a typical reply."""
+        if not self.prompt_tps or not self.gen_tps:
+            return None
+        return prompt_tokens / self.prompt_tps + reply_tokens / self.gen_tps
+
+
+class ModelAutotuner:
+    """Benchmarks candidate models on the Ollama endpoints and picks a default that is fast enough.
+
+    Candidates come ordered best-first (larger tiers first, primary recommendation first within a
+    tier); the first one whose estimated reply latency meets `target_s` wins, otherwise the fastest.
+    Measurements are cached per host fingerprint, so only models without a result are benchmarked.
+    Models that would not fit in the memory available right now are skipped for this run.
+    """
+
+    def __init__(
+        self,
+        router: OllamaRouter,
+        pull_manager: PullManager,
+        cache_path: Path = LLM_AUTOTUNE_CACHE_PATH,
+        target_s: float = LLM_AUTOTUNE_TARGET_S,
+        prompt_tokens: int = LLM_AUTOTUNE_PROMPT_TOKENS,
+        reply_tokens: int = LLM_AUTOTUNE_REPLY_TOKENS,
+        pull_missing: bool = LLM_AUTOTUNE_PULL,
+        memory_headroom_gb: float = LLM_AUTOTUNE_MEMORY_HEADROOM_GB,
+    ):
+        self.router = router
+        self.pull_manager = pull_manager
+        self.cache_path = cache_path
+        self.target_s = target_s
+        self.prompt_tokens = prompt_tokens
+        self.reply_tokens = reply_tokens
+        self.pull_missing = pull_missing
+        self.memory_headroom_gb = memory_headroom_gb
+        self.last_report: Optional[Dict[str, Any]] = None
+
+    def _load_cache(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring unreadable autotune cache %s: %s", self.cache_path, exc)
+            return {}
+
+    def _save_cache(self, cache: Dict[str, Any]):
+        tmp = self.cache_path.with_name(f".{self.cache_path.name}.tmp")
+        tmp.write_text(json.dumps(cache, indent=2), encoding="utf-8")
+        os.replace(tmp, self.cache_path)
+
+    def memory_skips(self, candidates: List[str]) -> Dict[str, str]:
+        """Candidates that do not fit in the memory available right now -> reason.
+
+        A model needs its size (as reported by Ollama) plus the headroom, unless it is already
+        loaded. Remote endpoints' memory is not visible from here, so they are not checked, and
+        neither are models whose size is unknown because they have not been pulled yet.
+        """
+        if psutil is None:
+            logger.info("psutil not installed; not filtering autotune candidates by available memory")
+            return {}
+        endpoints = self.router.endpoints
+        if not endpoints or not all(_is_local(e.host) for e in endpoints):
+            return {}
+        available = psutil.virtual_memory().available
+        skipped = {}
+        for model in candidates:
+            size = self.router.model_size(model)
+            if size is None or any(model in e.resident for e in endpoints):
+                continue
+            needed = size + self.memory_headroom_gb * _GB
+            if needed > available:
+                skipped[model] = f"needs {needed / _GB:.1f} GB, {available / _GB:.1f} GB available"
+                logger.warning("Autotune skipping model=%s: %s", model, skipped[model])
+        return skipped
+
+    async def benchmark(self, model: str) -> ModelBenchmark:
+        """One cold request for the load time, then one warm request for prompt and generation speed."""
+        result = ModelBenchmark(model=model, measured_at=time.time())
+        if not self.router.has_model(model):
+            if not self.pull_missing:
+                result.error = "not present"
+                return result
+            endpoint = self.router.least_loaded()
+            if endpoint is None:
+                result.error = "no endpoint"
+                return result
+            job = await self.pull_manager.wait(self.pull_manager.start(model, endpoint))
+            if job.status != "done":
+                result.error = f"pull failed: {job.error}"
+                return result
+        endpoint = self.router.pick(model)
+        prompt = _PROMPT_TEXT * max(1, self.prompt_tokens // 40)
+        options = {"num_predict": self.reply_tokens, "temperature": 0}
+        try:
+            async with self.router.track(endpoint, model):
+                cold = await endpoint.client.generate(model=model, prompt="Hi", options={"num_predict": 1})
+                # A fresh nonce keeps Ollama from reusing the cached prompt prefix.
+                warm = await endpoint.client.generate(
+                    model=model, prompt=f"[{uuid.uuid4().hex}] {prompt}", options=options
+                )
+        except Exception as exc:
+            logger.warning("Benchmark of model=%s failed: %s", model, exc)
+            result.error = str(exc)
+            return result
+        result.load_s = round((cold.load_duration or 0) / _NS, 3)
+        if warm.prompt_eval_count and warm.prompt_eval_duration:
+            result.prompt_tps = round(warm.prompt_eval_count / (warm.prompt_eval_duration / _NS), 1)
+        if warm.eval_count and warm.eval_duration:
+            result.gen_tps = round(warm.eval_count / (warm.eval_duration / _NS), 1)
+        logger.info(
+            "Benchmarked model=%s load=%.2fs prompt=%s tok/s gen=%s tok/s",
+            model, result.load_s, result.prompt_tps, result.gen_tps,
+        )
+        return result
+
+    async def select(self, candidates: List[str], fingerprint: str, force: bool = False) -> Optional[str]:
+        """Return the chosen model, or None when no candidate could be benchmarked."""
+        await self.router.refresh_all()
+        cache = self._load_cache()
+        entry = cache.setdefault(fingerprint, {"results": {}})
+        results = entry["results"]
+        measured = False
+        skipped = self.memory_skips(candidates)
+        for model in candidates:
+            if model in skipped:
+                continue
+            cached = results.get(model)
+            # Models that were only missing are retried, since they may have been pulled since.
+            if cached and not force and cached.get("error") != "not present":
+                continue
+            results[model] = asdict(await self.benchmark(model))
+            measured = True
+
+        benchmarks = [ModelBenchmark(**results[m]) for m in candidates if m in results]
+        estimates = {b.model: b.reply_latency_s(self.prompt_tokens, self.reply_tokens) for b in benchmarks}
+        usable = [m for m in candidates if m not in skipped and estimates.get(m) is not None]
+        chosen = next((m for m in usable if estimates[m] <= self.target_s), None)
+        if chosen is None and usable:
+            chosen = min(usable, key=lambda m: estimates[m])
+            logger.warning("No model meets the %.1fs target; using fastest model=%s", self.target_s, chosen)
+
+        entry.update(selected=chosen, updated_at=time.time())
+        if measured:
+            self._save_cache(cache)
+        self.last_report = {
+            "fingerprint": fingerprint,
+            "target_s": self.target_s,
+            "selected": chosen,
+            "benchmarked": measured,
+            "candidates": [
+                {**results[m], "reply_latency_s": round(estimates[m], 2) if estimates.get(m) is not None else None}
+                for m in candidates
+                if m in results
+            ],
+            "skipped": skipped,
+        }
+        return chosen
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Set
+
+import httpx
+from ollama import AsyncClient, ResponseError  # type: ignore
+
+logger = logging.getLogger("speech_coach.ollama_router")
+
+# Errors meaning the endpoint itself is unreachable or broken (the ollama client turns
+# connection failures into ConnectionError).
+ENDPOINT_ERRORS = (httpx.TransportError, ConnectionError)
+
+# Weight of the newest sample in the per-endpoint latency average
+_LATENCY_ALPHA = 0.2
+
+
+def _model_names(models: Iterable[Any]) -> Set[str]:
+    return set(_model_sizes(models))
+
+
+def _model_sizes(models: Iterable[Any]) -> Dict[str, int]:
+    """Model name (and its name without ":latest") -> size in bytes as reported by Ollama."""
+    sizes = {}
+    for m in models:
+        name = m["model"]
+        sizes[name] = m.get("size") or 0
+        if name.endswith(":latest"):
+            sizes[name[: -len(":latest")]] = sizes[name]
+    return sizes
+
+
+@dataclass
+class OllamaEndpoint:
+    host: str
+    client: AsyncClient
+    healthy: bool = True
+    inflight: int = 0
+    latency_ms: Optional[float] = None  # moving average over completed requests
+    requests: int = 0
+    failures: int = 0
+    models: Set[str] = field(default_factory=set)  # pulled on this host (/api/tags)
+    sizes: Dict[str, int] = field(default_factory=dict)  # model -> bytes on disk (/api/tags)
+    resident: Set[str] = field(default_factory=set)  # loaded in memory (/api/ps)
+    checked_at: float = 0.0
+
+    def load_key(self):
+        return (self.inflight, self.latency_ms or 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "host": self.host,
+            "healthy": self.healthy,
+            "inflight": self.inflight,
+            "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+            "models": sorted(self.models),
+            "resident": sorted(self.resident),
+        }
+
+
+class OllamaRouter:
+    """Spreads LLM requests over several Ollama daemons.
+
+    Each request goes to the least-loaded healthy endpoint (fewest in-flight requests, then
+    lowest average latency), preferring endpoints that already hold the model in memory over
+    those that merely have it pulled. Connection failures mark an endpoint unhealthy so the
+    caller can fail over; the periodic health check brings it back once it answers again.
+    """
+
+    def __init__(self, hosts: List[str], client_factory: Callable[[str], AsyncClient]):
+        self.endpoints = [OllamaEndpoint(host=host, client=client_factory(host)) for host in hosts]
+        self.refreshed_at = 0.0
+
+    async def refresh(self, endpoint: OllamaEndpoint):
+        """Re-read which models the endpoint has pulled and loaded; updates its health."""
+        try:
+            tags, ps = await asyncio.gather(endpoint.client.list(), endpoint.client.ps())
+        except (*ENDPOINT_ERRORS, ResponseError) as exc:
+            if endpoint.healthy:
+                logger.warning("Ollama endpoint %s unhealthy: %s", endpoint.host, exc)
+            endpoint.healthy = False
+        else:
+            if not endpoint.healthy:
+                logger.info("Ollama endpoint %s healthy again", endpoint.host)
+            endpoint.healthy = True
+            endpoint.sizes = _model_sizes(tags["models"])
+            endpoint.models = set(endpoint.sizes)
+            endpoint.resident = _model_names(ps["models"])
+        endpoint.checked_at = time.monotonic()
+
+    async def refresh_all(self):
+        await asyncio.gather(*(self.refresh(endpoint) for endpoint in self.endpoints))
+        self.refreshed_at = time.monotonic()
+
+    async def run_health_checks(self, interval_s: float):
+        while True:
+            await asyncio.sleep(interval_s)
+            await self.refresh_all()
+
+    def healthy_endpoints(self) -> List[OllamaEndpoint]:
+        return [endpoint for endpoint in self.endpoints if endpoint.healthy]
+
+    def has_model(self, model: str) -> bool:
+        return any(model in endpoint.models for endpoint in self.healthy_endpoints())
+
+    def pick(self, model: str, exclude: Iterable[str] = ()) -> Optional[OllamaEndpoint]:
+        """Least-loaded endpoint holding `model`; unhealthy ones only as a last resort."""
+        excluded = set(exclude)
+        with_model = [e for e in self.endpoints if model in e.models and e.host not in excluded]
+        candidates = [e for e in with_model if e.healthy] or with_model
+        if not candidates:
+            return None
+        resident = [e for e in candidates if model in e.resident]
+        return min(resident or candidates, key=OllamaEndpoint.load_key)
+
+    def model_size(self, model: str) -> Optional[int]:
+        """Size in bytes of `model` as reported by any endpoint holding it, or None if unknown."""
+        sizes = [e.sizes[model] for e in self.endpoints if e.sizes.get(model)]
+        return max(sizes) if sizes else None
+
+    def least_loaded(self) -> Optional[OllamaEndpoint]:
+        healthy = self.healthy_endpoints()
+        return min(healthy, key=OllamaEndpoint.load_key) if healthy else None
+
+    @asynccontextmanager
+    async def track(self, endpoint: OllamaEndpoint, model: str) -> AsyncIterator[OllamaEndpoint]:
+        """Account one request against `endpoint`; connection errors mark it unhealthy."""
+        endpoint.inflight += 1
+        started = time.perf_counter()
+        try:
+            yield endpoint
+        except ENDPOINT_ERRORS:
+            endpoint.failures += 1
+            endpoint.healthy = False
+            logger.warning("Ollama endpoint %s failed; marking unhealthy", endpoint.host)
+            raise
+        else:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            endpoint.requests += 1
+            if endpoint.latency_ms is None:
+                endpoint.latency_ms = elapsed_ms
+            else:
+                endpoint.latency_ms += _LATENCY_ALPHA * (elapsed_ms - endpoint.latency_ms)
+            # Ollama keeps the model loaded after serving it.
+            endpoint.resident.add(model)
+        finally:
+            endpoint.inflight -= 1
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [endpoint.stats() for endpoint in self.endpoints]
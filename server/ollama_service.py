@@ -1,21 +1,49 @@
 import asyncio
 import logging
 import os
-from concurrent.futures import Executor
-from typing import List, Dict, Any
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Set, Tuple
 
-from ollama import Client, ResponseError  # type: ignore
-from tqdm.auto import tqdm  # type: ignore
+import httpx
+from ollama import AsyncClient, ResponseError  # type: ignore
 
-from .config import LLM_CONFIG
+from .config import (
+    LLM_CONFIG,
+    OLLAMA_HOSTS,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_CONNECT_TIMEOUT_S,
+    OLLAMA_REQUEST_TIMEOUT_S,
+    OLLAMA_MAX_CONNECTIONS,
+    OLLAMA_MODEL_CACHE_TTL_S,
+    OLLAMA_PULL_POLICY,
+    OLLAMA_PULL_WAIT_S,
+)
+from . import metrics, tracing
+from .model_autotune import ModelAutotuner, host_fingerprint
+from .ollama_router import ENDPOINT_ERRORS, OllamaEndpoint, OllamaRouter
+from .pull_manager import PullJob, PullManager
 
 logger = logging.getLogger("speech_coach.ollama")
 
 
+def _make_client(host: str) -> AsyncClient:
+    # One pooled async HTTP client per Ollama host; calls never tie up an executor thread.
+    return AsyncClient(
+        host=host,
+        timeout=httpx.Timeout(OLLAMA_REQUEST_TIMEOUT_S, connect=OLLAMA_CONNECT_TIMEOUT_S),
+        limits=httpx.Limits(max_connections=OLLAMA_MAX_CONNECTIONS, max_keepalive_connections=OLLAMA_MAX_CONNECTIONS),
+    )
+
+
 class OllamaService:
-    def __init__(self):
-        self.client = Client()
+    def __init__(self, hosts: List[str] = OLLAMA_HOSTS, client_factory: Callable[[str], AsyncClient] = _make_client):
+        self.router = OllamaRouter(hosts, client_factory)
         self.default_model = self._select_default_model()
+        # Which models each endpoint has is cached on the router and re-read when older than
+        # OLLAMA_MODEL_CACHE_TTL_S, by the health check, or when a request reports a model missing.
+        self._models_lock = asyncio.Lock()
+        self.pull_manager = PullManager()
+        self.autotuner = ModelAutotuner(self.router, self.pull_manager)
 
     def _detect_ram_gb(self) -> float:
         try:
@@ -34,7 +62,7 @@ class OllamaService:
 
     def _select_default_model(self) -> str:
         tiers = LLM_CONFIG.get("hardware_tiers", [])
-        ram_gb = self._detect_ram_gb()
+        ram_gb = self.ram_gb = self._detect_ram_gb()
         logger.info("Detected RAM: %.1f GB", ram_gb)
 
         def tier_fits(t):
@@ -50,6 +78,7 @@ class OllamaService:
 
         # Choose the tier with the highest min_ram among fitting
         chosen_tier = sorted(fitting, key=lambda t: t.get("min_ram_gb", 0), reverse=True)[0]
+        self.tier = chosen_tier
         logger.info("Chosen tier=%s (%.1f-%.1f GB)", chosen_tier.get("tier_id"), chosen_tier.get("min_ram_gb"), chosen_tier.get("max_ram_gb"))
 
         for model in chosen_tier.get("models", []):
@@ -61,64 +90,210 @@ class OllamaService:
             return chosen_tier["models"][0].get("ollama_tag")
         raise RuntimeError("No LLM models found in configuration.")
 
-    def _ensure_model_pulled(self, model: str):
-        try:
-            self.client.show(model)
-        except ResponseError:
-            # Model not present; pull it with streamed progress.
-            logger.info("Pulling Ollama model=%s", model)
-            pbar = None
-            last_completed = 0
+    def autotune_candidates(self) -> List[str]:
+        """Models of every tier this host has the RAM for, best first (larger tiers, then primary)."""
+        tiers = [t for t in LLM_CONFIG.get("hardware_tiers", []) if self.ram_gb >= t.get("min_ram_gb", 0)] or [self.tier]
+        candidates: List[str] = []
+        for tier in sorted(tiers, key=lambda t: t.get("min_ram_gb", 0), reverse=True):
+            models = sorted(tier.get("models", []), key=lambda m: not m.get("is_primary_recommendation"))
+            candidates.extend(m["ollama_tag"] for m in models if m.get("ollama_tag") and m["ollama_tag"] not in candidates)
+        return candidates
+
+    async def autotune(self, force: bool = False) -> str:
+        """Replace the RAM-based default with the best benchmarked model that meets the latency target."""
+        fingerprint = host_fingerprint(self.ram_gb, [e.host for e in self.router.endpoints])
+        chosen = await self.autotuner.select(self.autotune_candidates(), fingerprint, force=force)
+        if chosen is None:
+            logger.warning("Autotune found no usable model; keeping default model=%s", self.default_model)
+            return self.default_model
+        if chosen != self.default_model:
+            logger.info("Autotune selected model=%s (was %s)", chosen, self.default_model)
+        self.default_model = chosen
+        for tier in LLM_CONFIG.get("hardware_tiers", []):
+            if any(m.get("ollama_tag") == chosen for m in tier.get("models", [])):
+                self.tier = tier
+                break
+        return chosen
+
+    async def _refresh_if_needed(self, model: str):
+        async with self._models_lock:
+            stale = time.monotonic() - self.router.refreshed_at > OLLAMA_MODEL_CACHE_TTL_S
+            if stale or not self.router.has_model(model):
+                await self.router.refresh_all()
+
+    async def ensure_model(self, model: str) -> str:
+        """Return the model to use for a request for `model`; no HTTP call when it is known present.
+
+        A model no endpoint has is pulled in the background onto the least-loaded endpoint.
+        With OLLAMA_PULL_POLICY=wait the request waits up to OLLAMA_PULL_WAIT_S for it, otherwise
+        ("fallback") it fails over to the default model at once. Requests for the default model
+        always wait for its pull.
+        """
+        stale = time.monotonic() - self.router.refreshed_at > OLLAMA_MODEL_CACHE_TTL_S
+        if self.router.has_model(model) and not stale:
+            return model
+        await self._refresh_if_needed(model)
+        if self.router.has_model(model):
+            return model
+
+        job = self._start_pull(model)
+        if model == self.default_model:
+            await self.pull_manager.wait(job)
+        elif OLLAMA_PULL_POLICY == "wait":
+            await self.pull_manager.wait(job, timeout=OLLAMA_PULL_WAIT_S)
+        if job.status == "done":
+            return model
+        if model == self.default_model:
+            raise RuntimeError(f"Pulling default model {model} failed: {job.error}")
+        logger.warning("Model %s not available yet (pull %s); using default %s", model, job.status, self.default_model)
+        return await self.ensure_model(self.default_model)
+
+    def _start_pull(self, model: str) -> PullJob:
+        job = self.pull_manager.find_active(model)
+        if job is not None:
+            return job
+        endpoint = self.router.least_loaded()
+        if endpoint is None:
+            raise RuntimeError("No Ollama endpoint is reachable")
+        return self.pull_manager.start(model, endpoint)
+
+    def start_pull(self, model: str) -> List[PullJob]:
+        """Pull `model` onto every healthy endpoint that does not have it yet."""
+        return [
+            self.pull_manager.start(model, endpoint)
+            for endpoint in self.router.healthy_endpoints()
+            if model not in endpoint.models
+        ]
+
+    def tier_models(self) -> List[str]:
+        """Ollama tags of every model in the hardware tier detected for this host."""
+        return [m["ollama_tag"] for m in self.tier.get("models", []) if m.get("ollama_tag")]
+
+    async def prefetch_tier(self) -> List[str]:
+        """Start background pulls of the detected tier's models onto every endpoint missing them."""
+        await self.router.refresh_all()
+        started = []
+        for model in self.tier_models():
+            if self.start_pull(model):
+                started.append(model)
+        if started:
+            logger.info("Prefetching tier models %s", started)
+        return started
+
+    async def _candidates(self, model: str) -> AsyncIterator[Tuple[OllamaEndpoint, str]]:
+        """Yield (endpoint, model) pairs to try in failover order, each endpoint at most once.
+
+        When no untried endpoint holds the model, ensure_model gets one chance to refresh,
+        pull or fall back to the default model before giving up.
+        """
+        tried: Set[str] = set()
+        ensured = False
+        while True:
+            endpoint = self.router.pick(model, exclude=tried)
+            if endpoint is None:
+                if ensured:
+                    raise RuntimeError(f"No Ollama endpoint could serve model={model}")
+                ensured = True
+                model = await self.ensure_model(model)
+                continue
+            tried.add(endpoint.host)
+            yield endpoint, model
+
+    async def _call(self, model: str, request: Callable[[AsyncClient, str], Awaitable[Any]]) -> Any:
+        """Run `request(client, model)` on the best endpoint for `model`, failing over to the others."""
+        async for endpoint, target_model in self._candidates(model):
             try:
-                for chunk in self.client.pull(model, stream=True):
-                    status = chunk.get("status")
-                    completed = chunk.get("completed")
-                    total = chunk.get("total")
-                    if total and pbar is None:
-                        pbar = tqdm(total=total, desc=f"Pull {model}", unit="B", unit_scale=True)
-                    if pbar and completed is not None:
-                        pbar.update(max(completed - last_completed, 0))
-                        last_completed = completed
-                    elif status:
-                        logger.info("Pulling %s: %s", model, status)
-                if pbar:
-                    pbar.close()
-            finally:
-                logger.info("Pull completed model=%s", model)
-
-    def _chat_sync(self, messages: List[Dict[str, str]], model: str) -> str:
-        """Blocking internal method for chat."""
-        try:
-            logger.info("Calling Ollama model=%s msgs=%s", model, len(messages))
-            response = self.client.chat(model=model, messages=messages)
-            return response["message"]["content"]
-        except ResponseError as exc:
-            # Surface meaningful message
-            raise RuntimeError(f"Ollama chat failed: {exc}") from exc
+                async with self.router.track(endpoint, target_model):
+                    return await request(endpoint.client, target_model)
+            except ENDPOINT_ERRORS as exc:
+                logger.warning("Ollama request to %s failed (%s); trying next endpoint", endpoint.host, exc)
+            except ResponseError as exc:
+                if not self._model_missing(exc, endpoint, target_model):
+                    # Surface meaningful message
+                    raise RuntimeError(f"Ollama chat failed: {exc}") from exc
 
-    async def chat(self, messages: List[Dict[str, str]], model: str | None = None) -> str:
-        target_model = model or self.default_model
-        
-        # We can pull in the main thread (blocking) or offload it too. 
-        # Pulling is rare (once per model), so leaving it sync or partly sync is okay, 
-        # but let's be safe. _ensure_model_pulled interacts with tqdm which might be cleaner on main thread 
-        # or we might want to check it quickly. 
-        # However, `chat` is the main loop. 
-        
-        # NOTE: _ensure_model_pulled calls client.pull which is network IO. 
-        # Ideally that should be async too. But let's stick to the main chat function first.
-        # We will keep _ensure_model_pulled as is for now, assuming models are largely present or the user accepts the wait.
-        # If we really want non-blocking pull, we'd need more work. 
-        
-        loop = asyncio.get_running_loop()
-        
-        # Ensure requested model is available (this might block, but it's okay for now as it's a "setup" step)
-        if target_model != self.default_model:
-            await loop.run_in_executor(None, self._ensure_model_pulled, target_model)
-        else:
-             # Lazy check for default
-            await loop.run_in_executor(None, self._ensure_model_pulled, target_model)
-
-        return await loop.run_in_executor(None, self._chat_sync, messages, target_model)
+    def _model_missing(self, exc: ResponseError, endpoint: OllamaEndpoint, model: str) -> bool:
+        """True if the endpoint rejected the request because the model is gone; drops it from its cache."""
+        if exc.status_code != 404:
+            return False
+        logger.warning("Ollama %s reports model=%s missing", endpoint.host, model)
+        endpoint.models.discard(model)
+        endpoint.resident.discard(model)
+        return True
+
+    async def warmup(self, model: str | None = None):
+        """Ensure the model is on every reachable endpoint and loaded into RAM with a one-token generation."""
+        target_model = await self.ensure_model(model or self.default_model)
+        for job in self.start_pull(target_model):
+            await self.pull_manager.wait(job)
+        endpoints = [e for e in self.router.healthy_endpoints() if target_model in e.models]
+        await asyncio.gather(
+            *(
+                e.client.generate(
+                    model=target_model, prompt="Hi", options={"num_predict": 1}, keep_alive=OLLAMA_KEEP_ALIVE
+                )
+                for e in endpoints
+            )
+        )
+        for e in endpoints:
+            e.resident.add(target_model)
 
+    async def chat_stream(self, messages: List[Dict[str, str]], model: str | None = None) -> AsyncIterator[str]:
+        """Yield reply tokens as they are generated.
 
+        Fails over to another endpoint only before the first token; afterwards errors propagate.
+        """
+        target_model = await self.ensure_model(model or self.default_model)
+        logger.info("Streaming Ollama model=%s msgs=%s", target_model, len(messages))
+        # Timed by hand: a context-managed span would have to stay open across the yields.
+        mode = tracing.current_mode()
+        span = tracing.start_span("llm", model=target_model, streaming=True)
+        t0 = time.perf_counter()
+        error = None
+        try:
+            async for endpoint, target_model in self._candidates(target_model):
+                started = False
+                try:
+                    async with self.router.track(endpoint, target_model):
+                        stream = await endpoint.client.chat(
+                            model=target_model, messages=messages, stream=True, keep_alive=OLLAMA_KEEP_ALIVE
+                        )
+                        async for chunk in stream:
+                            if chunk.get("done"):
+                                metrics.observe_llm_response(target_model, chunk)
+                            content = chunk["message"]["content"]
+                            if content:
+                                if not started:
+                                    metrics.LLM_FIRST_TOKEN_SECONDS.observe(
+                                        time.perf_counter() - t0, model=target_model, mode=mode
+                                    )
+                                started = True
+                                yield content
+                    return
+                except ENDPOINT_ERRORS as exc:
+                    if started:
+                        raise RuntimeError(f"Ollama stream from {endpoint.host} broke off: {exc}") from exc
+                    logger.warning("Ollama stream to %s failed (%s); trying next endpoint", endpoint.host, exc)
+                except ResponseError as exc:
+                    # Ollama answers 404 before streaming anything, so a retry cannot duplicate tokens.
+                    if started or not self._model_missing(exc, endpoint, target_model):
+                        raise RuntimeError(f"Ollama chat failed: {exc}") from exc
+        except Exception as exc:
+            error = exc
+            metrics.ERRORS.inc(stage="llm", mode=mode)
+            raise
+        finally:
+            metrics.STAGE_SECONDS["llm"].observe(time.perf_counter() - t0, model=target_model, mode=mode)
+            if span is not None:
+                span.end(error)
+
+    async def chat(self, messages: List[Dict[str, str]], model: str | None = None) -> str:
+        target_model = await self.ensure_model(model or self.default_model)
+        logger.info("Calling Ollama model=%s msgs=%s", target_model, len(messages))
+        with metrics.stage("llm", model=target_model):
+            response = await self._call(
+                target_model,
+                lambda client, m: client.chat(model=m, messages=messages, keep_alive=OLLAMA_KEEP_ALIVE),
+            )
+        metrics.observe_llm_response(response["model"] or target_model, response)
+        return response["message"]["content"]
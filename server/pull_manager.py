@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .ollama_router import OllamaEndpoint
+
+logger = logging.getLogger("speech_coach.pulls")
+
+
+@dataclass
+class PullJob:
+    """Progress of one `ollama pull`; byte counts are summed over all layers."""
+
+    model: str
+    endpoint: OllamaEndpoint
+    status: str = "queued"  # queued, pulling, done, failed
+    detail: Optional[str] = None  # latest status line reported by Ollama
+    error: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    layers: Dict[str, Tuple[int, int]] = field(default_factory=dict)  # digest -> (completed, total)
+    task: Optional[asyncio.Task] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in {"queued", "pulling"}
+
+    def report(self) -> Dict[str, Any]:
+        completed = sum(c for c, _ in self.layers.values())
+        total = sum(t for _, t in self.layers.values())
+        return {
+            "model": self.model,
+            "host": self.endpoint.host,
+            "status": self.status,
+            "detail": self.detail,
+            "completed_bytes": completed,
+            "total_bytes": total,
+            "progress": round(completed / total, 4) if total else None,
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class PullManager:
+    """Runs Ollama model pulls in the background, at most one per tag and endpoint.
+
+    Requests for a tag that is already being pulled join the running job instead of
+    starting a second download. A finished pull is recorded in the endpoint's model set.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[Tuple[str, str], PullJob] = {}
+
+    def start(self, model: str, endpoint: OllamaEndpoint) -> PullJob:
+        job = self.jobs.get((endpoint.host, model))
+        if job is not None and job.active:
+            return job
+        job = PullJob(model=model, endpoint=endpoint)
+        job.task = asyncio.create_task(self._run(job))
+        self.jobs[(endpoint.host, model)] = job
+        return job
+
+    def find_active(self, model: str) -> Optional[PullJob]:
+        """A running pull of `model` on any endpoint."""
+        return next((job for job in self.jobs.values() if job.model == model and job.active), None)
+
+    @staticmethod
+    async def wait(job: PullJob, timeout: Optional[float] = None) -> PullJob:
+        """Wait up to `timeout` seconds for `job` to finish; the pull keeps running on timeout."""
+        try:
+            await asyncio.wait_for(asyncio.shield(job.task), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return job
+
+    async def _run(self, job: PullJob):
+        logger.info("Pulling Ollama model=%s host=%s", job.model, job.endpoint.host)
+        job.status = "pulling"
+        try:
+            async for chunk in await job.endpoint.client.pull(job.model, stream=True):
+                digest = chunk.get("digest")
+                if digest and chunk.get("total"):
+                    job.layers[digest] = (chunk.get("completed") or 0, chunk["total"])
+                status = chunk.get("status")
+                if status and status != job.detail:
+                    job.detail = status
+                    logger.info("Pulling %s: %s", job.model, status)
+        except Exception as exc:
+            job.status = "failed"
+            job.error = str(exc)
+            logger.error("Pull failed model=%s: %s", job.model, exc)
+        else:
+            job.status = "done"
+            job.endpoint.models.add(job.model)
+            logger.info("Pull completed model=%s", job.model)
+        finally:
+            job.finished_at = time.time()
+
+    def report(self) -> List[Dict[str, Any]]:
+        return [job.report() for job in self.jobs.values()]
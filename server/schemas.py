@@ -7,6 +7,7 @@ class SessionCreateRequest(BaseModel):
     topic: Optional[str] = None
     language: Optional[str] = None
     model: Optional[str] = None
+    audio_format: Optional[str] = None  # wav, opus or mp3; default for the session's coach audio
 
 
 class SessionCreateResponse(BaseModel):
@@ -26,9 +27,11 @@ class TextMessageRequest(BaseModel):
     model: Optional[str] = None
     speaker: Optional[str] = None
     tts_model: Optional[str] = None
+    audio_format: Optional[str] = None
 
 
 class Message(BaseModel):
+    id: Optional[int] = None
     sender: str
     text: Optional[str]
     audio_path: Optional[str]
@@ -38,11 +41,23 @@ class Message(BaseModel):
 class ChatHistoryResponse(BaseModel):
     session_id: str
     messages: List[Message]
+    # Pagination (only set when `limit` is given): pass next_before as `before` for older
+    # messages or next_after as `after` for newer ones.
+    has_more: Optional[bool] = None
+    next_before: Optional[int] = None
+    next_after: Optional[int] = None
 
 
 class UpdateMetadataRequest(BaseModel):
     topic: Optional[str] = None
     language: Optional[str] = None
     model: Optional[str] = None
+    audio_format: Optional[str] = None
 
 
+class BulkDeleteRequest(BaseModel):
+    session_ids: List[str]
+
+
+class ModelPullRequest(BaseModel):
+    model: str
@@ -1,24 +1,44 @@
+import asyncio
+import hashlib
+import io
 import logging
 import os
 import shutil
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Union
 
 try:
     import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config as BotoConfig
     from botocore.exceptions import NoCredentialsError
 except ImportError:
     boto3 = None
+    TransferConfig = None
+    BotoConfig = None
     NoCredentialsError = None
 
+from . import metrics
+from .audio_utils import content_type_for
+from .executors import get_executor
+
 logger = logging.getLogger("speech_coach.storage")
 
+# Audio payloads may be handed over as raw bytes or as a readable binary stream.
+AudioData = Union[bytes, BinaryIO]
+
+
+class StoredFile(NamedTuple):
+    name: str
+    size: int
+    modified: float  # unix timestamp
+
 
 class StorageProvider(ABC):
     @abstractmethod
-    def save_file(self, data: bytes, filename: str) -> str:
-        """Saves bytes to storage and returns a relative URL or path."""
+    def save_file(self, data: AudioData, filename: str) -> str:
+        """Saves bytes or a binary stream to storage and returns a relative URL or path."""
         pass
 
     @abstractmethod
@@ -26,30 +46,107 @@ class StorageProvider(ABC):
         """Returns the access URL for a given filename."""
         pass
 
+    @abstractmethod
+    def read_file(self, filename: str) -> bytes:
+        """Returns the stored bytes for a filename."""
+        pass
+
     @abstractmethod
     def delete_file(self, filename: str) -> None:
         """Deletes a file from storage."""
         pass
 
+    @abstractmethod
+    def iter_files(self, prefix: str = "") -> Iterator[StoredFile]:
+        """Lazily yields the stored files whose name starts with `prefix`."""
+        pass
+
+    def delete_files(self, filenames: List[str]) -> int:
+        """Deletes several files and returns how many were removed."""
+        for filename in filenames:
+            self.delete_file(filename)
+        return len(filenames)
+
+    def filename_from_url(self, url: str) -> str:
+        """Inverse of `get_url`: the stored filename an access URL points to."""
+        return url.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+
+    def delivery_url(self, url: Optional[str]) -> Optional[str]:
+        """URL to hand to clients for a stored URL (e.g. freshly presigned). Stored URLs stay stable."""
+        return url
+
+    # Async variants for request handlers: the blocking calls run on the "storage" executor
+    # so a slow disk or S3 round trip never stalls the event loop.
+
+    async def save_file_async(
+        self, data: AudioData, filename: str, on_failure: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """Save on the storage executor. Errors are raised here, except for providers that defer the
+        upload past the return: they call `on_failure(filename)` if it finally fails."""
+        with metrics.stage("storage", operation="save", provider=type(self).__name__):
+            return await get_executor("storage").run(self.save_file, data, filename)
+
+    async def read_file_async(self, filename: str) -> bytes:
+        with metrics.stage("storage", operation="read", provider=type(self).__name__):
+            return await get_executor("storage").run(self.read_file, filename)
+
+    async def delete_file_async(self, filename: str) -> None:
+        return await get_executor("storage").run(self.delete_file, filename)
+
+    async def drain(self) -> None:
+        """Waits for background work (e.g. deferred uploads) to finish; called on shutdown."""
+        pass
+
 
 class LocalStorageProvider(StorageProvider):
+    """Stores files under `base_dir` in a two-level sharded layout (`ab/cd/<filename>`).
+
+    The shard comes from a hash of the filename, so URLs stay flat (`/output/<filename>`) and
+    each directory holds a bounded number of entries even with millions of files. Files written
+    before sharding are still found at the top level.
+    """
+
     def __init__(self, base_dir: Path, base_url: str = "/output"):
         self.base_dir = base_dir
         self.base_url = base_url
         self.base_dir.mkdir(parents=True, exist_ok=True)
 
-    def save_file(self, data: bytes, filename: str) -> str:
-        file_path = self.base_dir / filename
-        with open(file_path, "wb") as f:
-            f.write(data)
+    def _shard_dir(self, filename: str) -> Path:
+        digest = hashlib.md5(filename.encode("utf-8"), usedforsecurity=False).hexdigest()
+        return self.base_dir / digest[:2] / digest[2:4]
+
+    def path_for(self, filename: str) -> Path:
+        """On-disk path of a stored file (sharded, or flat for files from the old layout)."""
+        path = self._shard_dir(filename) / filename
+        if not path.exists():
+            flat = self.base_dir / filename
+            if flat.exists():
+                return flat
+        return path
+
+    def save_file(self, data: AudioData, filename: str) -> str:
+        shard_dir = self._shard_dir(filename)
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        file_path = shard_dir / filename
+        # Write then rename, so a file being served or scanned is never seen half-written.
+        tmp_path = shard_dir / f".{filename}.tmp"
+        with open(tmp_path, "wb") as f:
+            if isinstance(data, (bytes, bytearray)):
+                f.write(data)
+            else:
+                shutil.copyfileobj(data, f)
+        os.replace(tmp_path, file_path)
         logger.info(f"Saved local file: {file_path}")
         return f"{self.base_url}/{filename}"
 
     def get_url(self, filename: str) -> str:
         return f"{self.base_url}/{filename}"
 
+    def read_file(self, filename: str) -> bytes:
+        return self.path_for(filename).read_bytes()
+
     def delete_file(self, filename: str) -> None:
-        file_path = self.base_dir / filename
+        file_path = self.path_for(filename)
         if file_path.exists():
             try:
                 os.remove(file_path)
@@ -59,25 +156,100 @@ class LocalStorageProvider(StorageProvider):
         else:
             logger.warning(f"File not found for deletion: {file_path}")
 
+    def iter_files(self, prefix: str = "") -> Iterator[StoredFile]:
+        # scandir streams directory entries instead of materializing the whole listing.
+        def scan(directory, depth: int) -> Iterator[StoredFile]:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if depth < 2 and len(entry.name) == 2 and entry.is_dir(follow_symlinks=False):
+                        yield from scan(entry.path, depth + 1)
+                        continue
+                    if entry.name.startswith(".") or not entry.name.startswith(prefix):
+                        continue  # dot-files are in-progress writes
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue
+                    yield StoredFile(entry.name, st.st_size, st.st_mtime)
+
+        yield from scan(self.base_dir, 0)
+
+    def delete_files(self, filenames: List[str]) -> int:
+        deleted = 0
+        for filename in filenames:
+            try:
+                os.remove(self.path_for(filename))
+                deleted += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Error deleting file {filename}: {e}")
+        logger.info(f"Deleted {deleted} local files")
+        return deleted
+
 
 class S3StorageProvider(StorageProvider):
-    def __init__(self, bucket_name: str, region_name: str, aws_access_key_id: str, aws_secret_access_key: str):
+    def __init__(
+        self,
+        bucket_name: str,
+        region_name: str,
+        aws_access_key_id: str,
+        aws_secret_access_key: str,
+        max_pool_connections: int = 32,
+        connect_timeout: float = 5,
+        read_timeout: float = 30,
+        multipart_threshold_mb: int = 8,
+        multipart_chunk_mb: int = 8,
+        background_uploads: bool = False,
+        upload_retries: int = 3,
+        public_base_url: Optional[str] = None,
+        presigned_urls: bool = False,
+        presign_expires_s: int = 3600,
+    ):
         self.bucket_name = bucket_name
         self.region_name = region_name
+        # boto3 clients are thread-safe; one client with a pool sized for the storage executor
+        # reuses keep-alive connections across uploads.
         self.s3_client = boto3.client(
             "s3",
             region_name=region_name,
             aws_access_key_id=aws_access_key_id,
             aws_secret_access_key=aws_secret_access_key,
+            config=BotoConfig(
+                max_pool_connections=max_pool_connections,
+                connect_timeout=connect_timeout,
+                read_timeout=read_timeout,
+                tcp_keepalive=True,
+                retries={"max_attempts": 3, "mode": "adaptive"},
+            ),
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold_mb * 1024 * 1024,
+            multipart_chunksize=multipart_chunk_mb * 1024 * 1024,
+            max_concurrency=4,
         )
+        self.background_uploads = background_uploads
+        self.upload_retries = upload_retries
+        # CDN (or other public) origin in front of the bucket; clients then never hit the API server.
+        self.public_base_url = public_base_url.rstrip("/") if public_base_url else None
+        self.presigned_urls = presigned_urls
+        self.presign_expires_s = presign_expires_s
+        # Deferred uploads still in flight, with their payloads so reads can be served meanwhile.
+        self._pending_uploads: Dict[str, bytes] = {}
+        self._upload_tasks: Set[asyncio.Task] = set()
 
-    def save_file(self, data: bytes, filename: str) -> str:
+    def save_file(self, data: AudioData, filename: str) -> str:
         try:
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=filename,
-                Body=data,
-                ContentType="audio/wav"  # Assuming wav for now, could be dynamic
+            # upload_fileobj streams the body and switches to a multipart upload above the threshold.
+            body = io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+            self.s3_client.upload_fileobj(
+                body,
+                self.bucket_name,
+                filename,
+                ExtraArgs={"ContentType": content_type_for(filename)},
+                Config=self.transfer_config,
             )
             logger.info(f"Uploaded to S3: {filename}")
             return self.get_url(filename)
@@ -89,10 +261,66 @@ class S3StorageProvider(StorageProvider):
             raise
 
     def get_url(self, filename: str) -> str:
-        # Constructing a standard public URL, or presigned if needed. 
-        # For simplicity in this demo, standard URL.
+        # Stable URL that is stored with messages; presigning happens per response in delivery_url.
+        if self.public_base_url:
+            return f"{self.public_base_url}/{filename}"
         return f"https://{self.bucket_name}.s3.{self.region_name}.amazonaws.com/{filename}"
 
+    def delivery_url(self, url: Optional[str]) -> Optional[str]:
+        if not url or not self.presigned_urls or self.public_base_url:
+            return url
+        # Signing is a local HMAC computation, no request to S3.
+        return self.s3_client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket_name, "Key": self.filename_from_url(url)},
+            ExpiresIn=self.presign_expires_s,
+        )
+
+    def read_file(self, filename: str) -> bytes:
+        pending = self._pending_uploads.get(filename)
+        if pending is not None:
+            return pending
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=filename)
+        return response["Body"].read()
+
+    async def save_file_async(
+        self, data: AudioData, filename: str, on_failure: Optional[Callable[[str], None]] = None
+    ) -> str:
+        if not self.background_uploads:
+            return await super().save_file_async(data, filename)
+        # The caller may close its stream once we return, so take the payload now.
+        payload = bytes(data) if isinstance(data, (bytes, bytearray)) else data.read()
+        self._pending_uploads[filename] = payload
+        task = asyncio.create_task(self._upload_with_retry(payload, filename, on_failure))
+        self._upload_tasks.add(task)
+        task.add_done_callback(self._upload_tasks.discard)
+        return self.get_url(filename)
+
+    async def _upload_with_retry(
+        self, payload: bytes, filename: str, on_failure: Optional[Callable[[str], None]] = None
+    ):
+        try:
+            for attempt in range(self.upload_retries + 1):
+                try:
+                    await super().save_file_async(payload, filename)
+                    return
+                except Exception as e:
+                    if attempt == self.upload_retries:
+                        logger.error(f"S3 background upload failed for {filename} after {attempt + 1} attempts: {e}")
+                        if on_failure is not None:
+                            on_failure(filename)
+                        return
+                    delay = 0.5 * 2**attempt
+                    logger.warning(f"S3 background upload of {filename} failed ({e}); retrying in {delay}s")
+                    await asyncio.sleep(delay)
+        finally:
+            self._pending_uploads.pop(filename, None)
+
+    async def drain(self) -> None:
+        if self._upload_tasks:
+            logger.info(f"Waiting for {len(self._upload_tasks)} background S3 uploads")
+            await asyncio.gather(*list(self._upload_tasks), return_exceptions=True)
+
     def delete_file(self, filename: str) -> None:
         try:
             self.s3_client.delete_object(Bucket=self.bucket_name, Key=filename)
@@ -100,6 +328,32 @@ class S3StorageProvider(StorageProvider):
         except Exception as e:
             logger.error(f"S3 Delete Error: {e}")
 
+    def iter_files(self, prefix: str = "") -> Iterator[StoredFile]:
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield StoredFile(obj["Key"], obj["Size"], obj["LastModified"].timestamp())
+
+    def delete_files(self, filenames: List[str]) -> int:
+        # One DeleteObjects request per 1000 keys instead of a round trip per file.
+        deleted = 0
+        for start in range(0, len(filenames), 1000):
+            chunk = filenames[start : start + 1000]
+            try:
+                response = self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in chunk], "Quiet": True},
+                )
+            except Exception as e:
+                logger.error(f"S3 Batch Delete Error: {e}")
+                continue
+            errors = response.get("Errors", [])
+            for error in errors:
+                logger.error(f"S3 Delete Error: {error.get('Key')}: {error.get('Message')}")
+            deleted += len(chunk) - len(errors)
+        logger.info(f"Deleted {deleted} objects from S3")
+        return deleted
+
 
 def get_storage_provider(config: dict, output_dir: Path) -> StorageProvider:
     """Factory to get the configured storage provider."""
@@ -111,6 +365,16 @@ def get_storage_provider(config: dict, output_dir: Path) -> StorageProvider:
             region_name=config.get("S3_REGION"),
             aws_access_key_id=config.get("AWS_ACCESS_KEY_ID"),
             aws_secret_access_key=config.get("AWS_SECRET_ACCESS_KEY"),
+            max_pool_connections=config.get("S3_MAX_POOL_CONNECTIONS", 32),
+            connect_timeout=config.get("S3_CONNECT_TIMEOUT_S", 5),
+            read_timeout=config.get("S3_READ_TIMEOUT_S", 30),
+            multipart_threshold_mb=config.get("S3_MULTIPART_THRESHOLD_MB", 8),
+            multipart_chunk_mb=config.get("S3_MULTIPART_CHUNK_MB", 8),
+            background_uploads=config.get("S3_BACKGROUND_UPLOADS", False),
+            upload_retries=config.get("S3_UPLOAD_RETRIES", 3),
+            public_base_url=config.get("S3_PUBLIC_BASE_URL"),
+            presigned_urls=config.get("S3_PRESIGNED_URLS", False),
+            presign_expires_s=config.get("S3_PRESIGN_EXPIRES_S", 3600),
         )
     else:
         return LocalStorageProvider(base_dir=output_dir)
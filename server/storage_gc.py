@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from .config import (
+    STORAGE_GC_ENABLED,
+    STORAGE_GC_INTERVAL_S,
+    STORAGE_GC_GRACE_S,
+    STORAGE_GC_BATCH_SIZE,
+    STORAGE_GC_PREFIX,
+    AUDIO_RETENTION_DAYS,
+)
+from .db import Database
+from .executors import get_executor
+from .storage import StorageProvider
+from .tts_cache import TTSCache
+
+logger = logging.getLogger("speech_coach.storage_gc")
+
+
+class StorageGC:
+    """Removes generated audio that nothing references any more.
+
+    A file is kept while a message's `audio_path` or a TTS cache entry points to it, and while it
+    is younger than `grace_s` (its message may not be committed yet). With `retention_days` set,
+    messages older than that lose their audio reference first, so their files are collected too.
+    Orphans are deleted in batches of `batch_size` through the storage provider.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        storage_provider: StorageProvider,
+        tts_cache: TTSCache,
+        interval_s: float = STORAGE_GC_INTERVAL_S,
+        grace_s: float = STORAGE_GC_GRACE_S,
+        retention_days: float = AUDIO_RETENTION_DAYS,
+        batch_size: int = STORAGE_GC_BATCH_SIZE,
+        prefix: str = STORAGE_GC_PREFIX,
+        enabled: bool = STORAGE_GC_ENABLED,
+    ):
+        self.db = db
+        self.storage_provider = storage_provider
+        self.tts_cache = tts_cache
+        self.interval_s = interval_s
+        self.grace_s = grace_s
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.prefix = prefix
+        self.enabled = enabled
+        self.runs = 0
+        self.deleted_total = 0
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def collect(self) -> Dict[str, Any]:
+        """One blocking GC pass; returns counters for the run."""
+        started = time.time()
+        expired = 0
+        if self.retention_days > 0:
+            expired = self.db.expire_audio_references(datetime.utcnow() - timedelta(days=self.retention_days))
+
+        # Snapshot references before scanning: anything referenced later is newer than the grace period.
+        referenced = {self.storage_provider.filename_from_url(path) for path in self.db.referenced_audio_paths()}
+        referenced |= self.tts_cache.filenames()
+
+        scanned = deleted = 0
+        batch: List[str] = []
+        cutoff = started - self.grace_s
+        for stored in self.storage_provider.iter_files(self.prefix):
+            scanned += 1
+            if stored.name in referenced or stored.modified > cutoff:
+                continue
+            batch.append(stored.name)
+            if len(batch) >= self.batch_size:
+                deleted += self.storage_provider.delete_files(batch)
+                batch = []
+        if batch:
+            deleted += self.storage_provider.delete_files(batch)
+
+        report = {
+            "scanned": scanned,
+            "referenced": len(referenced),
+            "deleted": deleted,
+            "expired_references": expired,
+            "duration_ms": round((time.time() - started) * 1000, 1),
+            "finished_at": datetime.utcnow().isoformat(),
+        }
+        logger.info("Storage GC done %s", report)
+        return report
+
+    async def run_once(self) -> Dict[str, Any]:
+        async with self._lock:
+            report = await get_executor("storage").run(self.collect)
+            self.runs += 1
+            self.deleted_total += report["deleted"]
+            self.last_report = report
+            return report
+
+    def trigger(self):
+        """Ask the background loop for a pass now (e.g. after sessions were deleted). Thread-safe."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def run_forever(self):
+        self._loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Storage GC failed")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "interval_s": self.interval_s,
+            "grace_s": self.grace_s,
+            "retention_days": self.retention_days,
+            "runs": self.runs,
+            "deleted_total": self.deleted_total,
+            "last_run": self.last_report,
+        }
@@ -3,18 +3,97 @@ import logging
 import tempfile
 from concurrent.futures import Executor
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
+import torch  # type: ignore
 import whisper  # type: ignore
 
-from .config import WHISPER_MODEL_SIZE
+from .audio_utils import decode_audio, ffmpeg_decode, WHISPER_SAMPLE_RATE
+from .config import WHISPER_MODEL_SIZE, WHISPER_BATCHING, WHISPER_BATCH_MAX_SIZE, WHISPER_BATCH_MAX_WAIT_MS
+from .executors import get_executor
 
 logger = logging.getLogger("speech_coach.stt")
 
+# Whisper's encoder sees fixed 30 s windows; longer clips need the sequential transcribe loop.
+BATCHABLE_MAX_SAMPLES = 30 * WHISPER_SAMPLE_RATE
+
+
+class WhisperBatcher:
+    """Collects utterances arriving within a short window and decodes them in one batched pass.
+
+    Each caller awaits its own future; a dispatcher task groups queued requests into batches
+    of up to `max_batch_size`, waiting at most `max_wait_ms` after the first one arrives.
+    """
+
+    def __init__(self, service: "WhisperService", max_batch_size: int, max_wait_ms: int):
+        self.service = service
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, audio: np.ndarray) -> str:
+        if self._dispatcher is None or self._dispatcher.done():
+            self._queue = asyncio.Queue()
+            self._dispatcher = asyncio.create_task(self._dispatch_loop())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((audio, future))
+        return await future
+
+    async def _dispatch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_s
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            batch = [(audio, future) for audio, future in batch if not future.done()]
+            if batch:
+                # Run batches concurrently up to the STT executor's limit while the next one fills.
+                task = asyncio.create_task(self._run_batch(batch))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+
+    async def _run_batch(self, batch: List[Tuple[np.ndarray, asyncio.Future]]):
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            texts = await get_executor("stt").run(self.service._transcribe_batch_sync, [a for a, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), text in zip(batch, texts):
+            if not future.done():
+                future.set_result(text)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": int(self.max_wait_s * 1000),
+        }
+
 
 class WhisperService:
     def __init__(self):
         self.model: Optional[any] = None
+        self.batcher: Optional[WhisperBatcher] = None
+        if WHISPER_BATCHING:
+            self.batcher = WhisperBatcher(self, WHISPER_BATCH_MAX_SIZE, WHISPER_BATCH_MAX_WAIT_MS)
 
     def _ensure_model(self):
         if self.model is None:
@@ -31,20 +110,82 @@ class WhisperService:
         logger.info("Transcription complete")
         return result.get("text", "").strip()
 
+    def _transcribe_array_sync(self, audio: np.ndarray) -> str:
+        """Blocking transcription of 16 kHz mono float32 samples."""
+        self._ensure_model()
+        logger.info("Transcribing array samples=%s", audio.size)
+        result = self.model.transcribe(audio.astype(np.float32, copy=False))
+        return result.get("text", "").strip()
+
+    def _transcribe_batch_sync(self, audios: List[np.ndarray]) -> List[str]:
+        """Blocking batched decode of clips up to 30 s: one encoder/decoder pass for the whole batch."""
+        self._ensure_model()
+        logger.info("Transcribing batch size=%s", len(audios))
+        mels = torch.stack(
+            [
+                whisper.log_mel_spectrogram(
+                    whisper.pad_or_trim(audio.astype(np.float32, copy=False)), n_mels=self.model.dims.n_mels
+                )
+                for audio in audios
+            ]
+        ).to(self.model.device)
+        options = whisper.DecodingOptions(fp16=self.model.device.type == "cuda", without_timestamps=True)
+        results = whisper.decode(self.model, mels, options)
+        return [result.text.strip() for result in results]
+
+    def _warmup_sync(self):
+        """Load the model and run one inference on a second of silence."""
+        self._ensure_model()
+        self._transcribe_array_sync(np.zeros(WHISPER_SAMPLE_RATE, dtype=np.float32))
+
+    async def warmup(self):
+        await get_executor("stt").run(self._warmup_sync)
+
+    async def transcribe_array(self, audio: np.ndarray) -> str:
+        if self.batcher is not None and audio.size <= BATCHABLE_MAX_SAMPLES:
+            return await self.batcher.submit(audio)
+        return await get_executor("stt").run(self._transcribe_array_sync, audio)
+
     async def transcribe_file(self, file_path: Path) -> str:
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self._transcribe_sync, file_path)
+        return await get_executor("stt").run(self._transcribe_sync, file_path)
 
-    async def transcribe_upload(self, upload_file) -> str:
-        """Accepts FastAPI UploadFile, saves to temp, transcribes."""
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-            tmp.write(await upload_file.read())
+    def _decode_sync(self, data: bytes) -> Optional[np.ndarray]:
+        """Decode in-process when possible; only exotic containers spawn ffmpeg."""
+        audio = decode_audio(data)
+        if audio is None:
+            try:
+                audio = ffmpeg_decode(data)
+            except RuntimeError:
+                return None
+        return audio
+
+    def _transcribe_seekable_sync(self, data: bytes) -> str:
+        # Containers that need seeking (e.g. MP4 with a trailing moov atom) cannot be piped.
+        with tempfile.NamedTemporaryFile(delete=False) as tmp:
+            tmp.write(data)
             tmp_path = Path(tmp.name)
-        
         try:
-            text = await self.transcribe_file(tmp_path)
-            return text
+            return self._transcribe_sync(tmp_path)
         finally:
             tmp_path.unlink(missing_ok=True)
 
+    def _transcribe_bytes_sync(self, data: bytes) -> str:
+        audio = self._decode_sync(data)
+        if audio is None:
+            return self._transcribe_seekable_sync(data)
+        return self._transcribe_array_sync(audio)
+
+    async def transcribe_bytes(self, data: bytes) -> str:
+        if self.batcher is None:
+            return await get_executor("stt").run(self._transcribe_bytes_sync, data)
+        audio = await get_executor("stt").run(self._decode_sync, data)
+        if audio is None:
+            return await get_executor("stt").run(self._transcribe_seekable_sync, data)
+        return await self.transcribe_array(audio)
+
+    async def transcribe_upload(self, upload_file) -> str:
+        """Accepts FastAPI UploadFile and transcribes it from memory."""
+        return await self.transcribe_bytes(await upload_file.read())
 
+    def batch_stats(self) -> Optional[Dict[str, Any]]:
+        return self.batcher.stats() if self.batcher is not None else None
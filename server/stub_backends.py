@@ -0,0 +1,107 @@
+"""Lightweight stand-ins for the Whisper, Coqui TTS and Ollama models.
+
+They replace only the models: requests still go through the real services, executors, audio
+encoding, caches, database and storage, so load tests and benchmarks measure the server itself.
+Each stand-in sleeps for a configurable, input-proportional time to mimic model cost (0 = none).
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+import httpx
+import numpy as np
+from ollama import AsyncClient  # type: ignore
+
+from .audio_utils import WHISPER_SAMPLE_RATE
+from .config import LLM_CONFIG, TTS_MODELS, STUB_STT_RTF, STUB_TTS_S_PER_CHAR, STUB_LLM_TOKENS_PER_S
+
+STUB_TRANSCRIPT = "I would like to practice introducing myself at a job interview."
+STUB_REPLY = "That was a clear start. Try slowing down a little and stress the key words. Shall we go again?"
+
+
+class FakeWhisperModel:
+    """Stands in for a Whisper model; costs `rtf` seconds per second of audio."""
+
+    def __init__(self, rtf: float = STUB_STT_RTF):
+        self.rtf = rtf
+
+    def transcribe(self, audio, **kwargs) -> Dict[str, Any]:
+        seconds = audio.size / WHISPER_SAMPLE_RATE if isinstance(audio, np.ndarray) else 1.0
+        if self.rtf:
+            time.sleep(seconds * self.rtf)
+        return {"text": STUB_TRANSCRIPT}
+
+
+class _FakeSynthesizer:
+    output_sample_rate = 22050
+
+
+class FakeTTS:
+    """Stands in for a Coqui TTS model: silence of a plausible length after `s_per_char` per character."""
+
+    synthesizer = _FakeSynthesizer()
+
+    def __init__(self, s_per_char: float = STUB_TTS_S_PER_CHAR):
+        self.s_per_char = s_per_char
+
+    def tts(self, text: str, **kwargs) -> np.ndarray:
+        if self.s_per_char:
+            time.sleep(len(text) * self.s_per_char)
+        # Roughly 15 characters per second of speech
+        return np.zeros(int(len(text) / 15 * self.synthesizer.output_sample_rate) + 1, dtype=np.float32)
+
+
+def _configured_models() -> List[Dict[str, str]]:
+    tags = {m["ollama_tag"] for tier in LLM_CONFIG.get("hardware_tiers", []) for m in tier.get("models", []) if m.get("ollama_tag")}
+    return [{"model": tag, "name": tag} for tag in sorted(tags)]
+
+
+def stub_ollama_transport(tokens_per_s: float = STUB_LLM_TOKENS_PER_S, reply: str = STUB_REPLY) -> httpx.MockTransport:
+    """Mock Ollama API holding every configured model; replies stream at `tokens_per_s` (0 = instantly).
+
+    Responses report no model time (`total_duration` 0), so callers see pure client-side overhead.
+    """
+    tokens = [word + " " for word in reply.split()]
+    delay = 1 / tokens_per_s if tokens_per_s > 0 else 0
+
+    async def stream(model: str):
+        for token in tokens:
+            if delay:
+                await asyncio.sleep(delay)
+            yield (json.dumps({"model": model, "message": {"role": "assistant", "content": token}, "done": False}) + "\n").encode()
+        yield (json.dumps({"model": model, "message": {"role": "assistant", "content": ""}, "done": True}) + "\n").encode()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path in ("/api/tags", "/api/ps"):
+            return httpx.Response(200, json={"models": _configured_models()})
+        body = json.loads(request.content or b"{}")
+        model = body.get("model")
+        if path == "/api/generate":
+            return httpx.Response(200, json={"model": model, "response": "Hi", "done": True, "total_duration": 0})
+        if path == "/api/chat":
+            if body.get("stream"):
+                return httpx.Response(200, content=stream(model))
+            if delay:
+                await asyncio.sleep(delay * len(tokens))
+            return httpx.Response(
+                200,
+                json={"model": model, "message": {"role": "assistant", "content": reply}, "done": True, "total_duration": 0},
+            )
+        return httpx.Response(404, json={"error": f"stub does not implement {path}"})
+
+    return httpx.MockTransport(handler)
+
+
+def stub_ollama_client_factory(**kwargs) -> Callable[[str], AsyncClient]:
+    transport = stub_ollama_transport(**kwargs)
+    return lambda host: AsyncClient(host=host, transport=transport)
+
+
+def install_stub_backends(whisper_service, tts_service):
+    """Put the fake Whisper and TTS models in place so the services never load real ones."""
+    whisper_service.model = FakeWhisperModel()
+    for model_info in TTS_MODELS:
+        tts_service.models_cache[model_info.get("model")] = FakeTTS()
@@ -0,0 +1,133 @@
+import json
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional
+
+from .config import TRACING_ENABLED, TRACING_EXPORTER
+
+logger = logging.getLogger("speech_coach.trace")
+
+try:
+    from opentelemetry import trace as otel_trace  # type: ignore
+except ImportError:  # optional: spans are logged instead
+    otel_trace = None
+
+_otel_tracer = None
+if TRACING_ENABLED and TRACING_EXPORTER == "otel":
+    if otel_trace is None:
+        logger.warning("TRACING_EXPORTER=otel but opentelemetry is not installed; logging spans instead")
+    else:
+        _otel_tracer = otel_trace.get_tracer("speech_coach")
+
+
+@dataclass
+class TurnContext:
+    """One conversational turn; its id doubles as the trace id of every span in the turn."""
+
+    turn_id: str
+    session_id: Optional[str]
+    mode: str
+
+
+_current_turn: ContextVar[Optional[TurnContext]] = ContextVar("speech_coach_turn", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("speech_coach_span", default=None)
+
+
+def current_turn() -> Optional[TurnContext]:
+    return _current_turn.get()
+
+
+def current_mode() -> str:
+    """Mode of the turn being processed (call, chat, ...), or "none" outside a turn."""
+    turn = _current_turn.get()
+    return turn.mode if turn is not None else "none"
+
+
+class Span:
+    """A timed pipeline step. Parent and turn are taken from the context it was started in."""
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        turn = _current_turn.get()
+        parent = _current_span.get()
+        self.name = name
+        self.attributes = attributes
+        self.turn_id = turn.turn_id if turn is not None else None
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._otel = None
+        if _otel_tracer is not None:
+            context = otel_trace.set_span_in_context(parent._otel) if parent is not None and parent._otel else None
+            self._otel = _otel_tracer.start_span(
+                name, context=context, attributes={**_otel_attributes(attributes), "turn.id": self.turn_id or ""}
+            )
+
+    def end(self, error: Optional[BaseException] = None):
+        duration_ms = (time.perf_counter() - self._started) * 1000
+        if self._otel is not None:
+            if error is not None:
+                self._otel.record_exception(error)
+                self._otel.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR, str(error)))
+            self._otel.end()
+            return
+        logger.info(
+            "span %s",
+            json.dumps(
+                {
+                    "name": self.name,
+                    "turn_id": self.turn_id,
+                    "span_id": self.span_id,
+                    "parent_id": self.parent_id,
+                    "start": round(self.started_at, 6),
+                    "duration_ms": round(duration_ms, 2),
+                    "error": str(error) if error is not None else None,
+                    **self.attributes,
+                },
+                default=str,
+            ),
+        )
+
+
+def _otel_attributes(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v if isinstance(v, (str, bool, int, float)) else str(v) for k, v in attributes.items() if v is not None}
+
+
+def start_span(name: str, **attributes) -> Optional[Span]:
+    """Start a span without making it current (for work spanning generator yields); None when tracing is off."""
+    return Span(name, attributes) if TRACING_ENABLED else None
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """Trace the enclosed block; spans started inside become its children."""
+    if not TRACING_ENABLED:
+        yield None
+        return
+    current = Span(name, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.end(exc)
+        raise
+    else:
+        current.end()
+    finally:
+        _current_span.reset(token)
+
+
+@contextmanager
+def turn(session_id: Optional[str], mode: str) -> Iterator[TurnContext]:
+    """Start a turn: a fresh turn id visible to every stage (and asyncio task) started inside."""
+    context = TurnContext(turn_id=uuid.uuid4().hex, session_id=session_id, mode=mode)
+    token = _current_turn.set(context)
+    try:
+        with span("turn", session_id=session_id, mode=mode):
+            yield context
+    finally:
+        _current_turn.reset(token)
@@ -0,0 +1,299 @@
+import asyncio
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from . import metrics
+from .audio_utils import AUDIO_FORMATS, encode_audio, new_audio_filename
+from .config import (
+    AUDIO_BITRATES,
+    AUDIO_OUTPUT_FORMAT,
+    TTS_CACHE_ENABLED,
+    TTS_CACHE_DB_PATH,
+    TTS_CACHE_MAX_ENTRIES,
+    TTS_CACHE_MAX_MB,
+)
+from .executors import get_executor
+from .storage import StorageProvider
+from .tts_service import TTSService
+
+logger = logging.getLogger("speech_coach.tts_cache")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class TTSCache:
+    """Content-addressed cache of synthesized coach audio.
+
+    Entries map a hash of (normalized text, TTS model, speaker, language, codec) to the stored file,
+    which is named by a hash of its bytes.
+    The index lives in memory as an LRU and is mirrored to SQLite so it survives restarts.
+    Mirror writes are coalesced per key and committed in batches on the "db" executor, so
+    lookups and stores never touch the disk on the event loop.
+    Evicting an entry only drops it from the index: the file may still be referenced by
+    message history and is left to storage garbage collection.
+    """
+
+    def __init__(
+        self,
+        tts_service: TTSService,
+        storage_provider: StorageProvider,
+        db_path: Path = TTS_CACHE_DB_PATH,
+        max_entries: int = TTS_CACHE_MAX_ENTRIES,
+        max_bytes: int = TTS_CACHE_MAX_MB * 1024 * 1024,
+        enabled: bool = TTS_CACHE_ENABLED,
+    ):
+        self.tts_service = tts_service
+        self.storage_provider = storage_provider
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._total_bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        # key -> pending mirror write: ("upsert", row) | ("touch", last_used) | ("delete", None)
+        self._pending: Dict[str, Tuple[str, Any]] = {}
+        self._flush_scheduled = False
+        self._flush_tasks: set = set()
+        self._conn_lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._init_tables()
+        self._load_index()
+
+    def _init_tables(self):
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tts_cache (
+                key TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                url TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at TEXT NOT NULL,
+                last_used TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def _load_index(self):
+        rows = self.conn.execute("SELECT key, filename, url, size FROM tts_cache ORDER BY last_used").fetchall()
+        for row in rows:
+            self._entries[row["key"]] = {"filename": row["filename"], "url": row["url"], "size": row["size"]}
+            self._total_bytes += row["size"]
+        self._evict()
+        self.flush()
+        logger.info("TTS cache loaded entries=%s bytes=%s", len(self._entries), self._total_bytes)
+
+    def make_key(
+        self, text: str, speaker: Optional[str] = None, model: Optional[str] = None, audio_format: str = "wav"
+    ) -> str:
+        voice = self.tts_service.voice_params(speaker=speaker, model=model)
+        parts = [normalize_text(text), voice["model"] or "", voice["speaker"] or "", voice["language"] or ""]
+        if audio_format != "wav":
+            # WAV keys keep their original shape so entries cached before codecs existed stay valid.
+            parts += [audio_format, AUDIO_BITRATES[audio_format]]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            now = datetime.utcnow().isoformat()
+            pending = self._pending.get(key)
+            if pending is not None and pending[0] == "upsert":
+                self._pending[key] = ("upsert", {**pending[1], "last_used": now})
+            else:
+                self._pending[key] = ("touch", now)
+            result = dict(entry)
+        self._schedule_flush()
+        return result
+
+    def store(self, key: str, filename: str, url: str, size: int):
+        now = datetime.utcnow().isoformat()
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous["size"]
+            self._entries[key] = {"filename": filename, "url": url, "size": size}
+            self._total_bytes += size
+            self._pending[key] = (
+                "upsert",
+                {"filename": filename, "url": url, "size": size, "created_at": now, "last_used": now},
+            )
+            self._evict()
+        self._schedule_flush()
+
+    def forget(self, key: str, filename: str):
+        """Drop an entry whose stored file is gone (unless it has since been re-stored elsewhere)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["filename"] != filename:
+                return
+            del self._entries[key]
+            self._total_bytes -= entry["size"]
+            self._pending[key] = ("delete", None)
+        logger.warning("Dropped TTS cache entry for %s: its upload failed", filename)
+        self._schedule_flush()
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+            key, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry["size"]
+            self._pending[key] = ("delete", None)
+            self.evictions += 1
+
+    def _schedule_flush(self):
+        """Commit pending mirror writes on the "db" executor; inline when there is no event loop."""
+        with self._lock:
+            if self._flush_scheduled or not self._pending:
+                return
+            self._flush_scheduled = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        # Writes queued while this one waits for a worker join the same batch.
+        task = loop.create_task(get_executor("db").run(self.flush))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task: "asyncio.Task"):
+        self._flush_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("TTS cache index flush failed", exc_info=task.exception())
+
+    def flush(self):
+        """Write pending index changes to SQLite in one transaction (blocking)."""
+        # Swapping the batch under the connection lock keeps batches committed in order.
+        with self._conn_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._flush_scheduled = False
+            if not pending:
+                return
+            upserts, touches, deletes = [], [], []
+            for key, (op, value) in pending.items():
+                if op == "upsert":
+                    upserts.append((key, value["filename"], value["url"], value["size"], value["created_at"], value["last_used"]))
+                elif op == "touch":
+                    touches.append((value, key))
+                else:
+                    deletes.append((key,))
+            with self.conn:
+                if upserts:
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO tts_cache (key, filename, url, size, created_at, last_used) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        upserts,
+                    )
+                if touches:
+                    self.conn.executemany("UPDATE tts_cache SET last_used=? WHERE key=?", touches)
+                if deletes:
+                    self.conn.executemany("DELETE FROM tts_cache WHERE key=?", deletes)
+
+    def close(self):
+        """Flush pending index changes and close the SQLite connection."""
+        self.flush()
+        with self._conn_lock:
+            self.conn.close()
+
+    def filenames(self) -> set:
+        """Filenames currently pinned by the cache index."""
+        with self._lock:
+            return {entry["filename"] for entry in self._entries.values()}
+
+    async def synthesize(
+        self,
+        text: str,
+        speaker: Optional[str] = None,
+        model: Optional[str] = None,
+        need_bytes: bool = False,
+        audio_format: Optional[str] = None,
+    ) -> Tuple[str, Optional[bytes]]:
+        """Return (audio_url, audio_bytes) for a reply, synthesizing and storing it only on a miss.
+
+        Audio is encoded as `audio_format` (default AUDIO_OUTPUT_FORMAT). On a hit the bytes are
+        only loaded back from storage when `need_bytes` is set.
+        """
+        audio_format = audio_format or AUDIO_OUTPUT_FORMAT
+        ext = AUDIO_FORMATS[audio_format]["ext"]
+        if not self.enabled:
+            metrics.TTS_CACHE_REQUESTS.inc(result="disabled")
+            audio_bytes = await self._synthesize_encoded(text, speaker, model, audio_format)
+            url = await self.storage_provider.save_file_async(audio_bytes, new_audio_filename(ext=ext))
+            return url, audio_bytes
+
+        key = self.make_key(text, speaker=speaker, model=model, audio_format=audio_format)
+        entry = self.lookup(key)
+        if entry is None and key in self._inflight:
+            # Identical request already being synthesized; share its result.
+            await asyncio.shield(self._inflight[key])
+            entry = self.lookup(key)
+        if entry is not None:
+            self.hits += 1
+            metrics.TTS_CACHE_REQUESTS.inc(result="hit")
+            audio_bytes = await self.storage_provider.read_file_async(entry["filename"]) if need_bytes else None
+            return entry["url"], audio_bytes
+
+        self.misses += 1
+        metrics.TTS_CACHE_REQUESTS.inc(result="miss")
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            audio_bytes = await self._synthesize_encoded(text, speaker, model, audio_format)
+            # Named by a hash of the audio itself: synthesis is not deterministic (XTTS), so a
+            # re-synthesized reply gets a new object instead of overwriting one clients may cache.
+            filename = f"coach_tts_{hashlib.sha256(audio_bytes).hexdigest()[:32]}.{ext}"
+            # With deferred uploads the URL comes back before the object exists; drop the entry
+            # again if the upload never lands, so the cache does not hand out a dead URL.
+            url = await self.storage_provider.save_file_async(
+                audio_bytes, filename, on_failure=lambda _: self.forget(key, filename)
+            )
+            self.store(key, filename, url, len(audio_bytes))
+            return url, audio_bytes
+        finally:
+            self._inflight.pop(key, None)
+            future.set_result(None)
+
+    async def _synthesize_encoded(
+        self, text: str, speaker: Optional[str], model: Optional[str], audio_format: str
+    ) -> bytes:
+        # Label with the configured model the request resolves to, never the raw client value.
+        tts_model = self.tts_service._find_model_info(model).get("model")
+        with metrics.stage("tts", tts_model=tts_model):
+            wav = await self.tts_service.synthesize_bytes(text, speaker=speaker, model=model)
+            if audio_format == "wav":
+                return wav
+            return await get_executor("encode").run(encode_audio, wav, audio_format)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
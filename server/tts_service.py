@@ -1,12 +1,22 @@
-import asyncio
 import logging
+import re
+import threading
+from importlib.metadata import version, PackageNotFoundError
 from pathlib import Path
-from typing import Optional, Dict
-from uuid import uuid4
+from typing import Optional, Dict, Tuple
 
+import torch  # type: ignore
 from TTS.api import TTS  # type: ignore
 
-from .config import OUTPUT_DIR, TTS_MODELS, TTS_DEFAULT_MODEL, DEFAULT_SPEAKER
+from .audio_utils import encode_wav
+from .executors import get_executor
+from .config import (
+    TTS_MODELS,
+    TTS_DEFAULT_MODEL,
+    DEFAULT_SPEAKER,
+    XTTS_LATENTS_DIR,
+    XTTS_SPEAKER_WAV_DIR,
+)
 
 logger = logging.getLogger("speech_coach.tts")
 
@@ -14,7 +24,9 @@ logger = logging.getLogger("speech_coach.tts")
 class TTSService:
     def __init__(self):
         self.models_cache: Dict[str, TTS] = {}
-        self.output_dir = OUTPUT_DIR
+        # model_id -> speaker -> (gpt_cond_latent, speaker_embedding)
+        self.latents_cache: Dict[str, Dict[str, Tuple[torch.Tensor, torch.Tensor]]] = {}
+        self._latents_lock = threading.Lock()
 
     def _find_model_info(self, model_id: Optional[str]):
         target = model_id or TTS_DEFAULT_MODEL.get("model")
@@ -34,36 +46,137 @@ class TTSService:
         logger.info("TTS model loaded model_id=%s", model_id)
         return tts
 
-    def _synthesize_sync(self, text: str, speaker: Optional[str] = None, model: Optional[str] = None) -> Path:
-        """Blocking internal method to run in executor."""
+    @staticmethod
+    def _xtts_model(tts: TTS):
+        """The underlying Xtts model if this is an XTTS checkpoint, else None."""
+        model = getattr(getattr(tts, "synthesizer", None), "tts_model", None)
+        return model if hasattr(model, "get_conditioning_latents") else None
+
+    def _latents_path(self, model_info: dict) -> Path:
+        try:
+            tts_version = version("coqui-tts")
+        except PackageNotFoundError:
+            tts_version = "unknown"
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_info.get("full_model_name") or model_info.get("model"))
+        return XTTS_LATENTS_DIR / f"{name}__{tts_version}.pt"
+
+    def _compute_latents(self, xtts, speaker: str) -> Tuple[torch.Tensor, torch.Tensor]:
+        manager = getattr(xtts, "speaker_manager", None)
+        if manager is not None and speaker in getattr(manager, "speakers", {}):
+            entry = manager.speakers[speaker]
+            return entry["gpt_cond_latent"], entry["speaker_embedding"]
+        reference = XTTS_SPEAKER_WAV_DIR / f"{speaker}.wav"
+        if reference.exists():
+            logger.info("Computing XTTS conditioning latents speaker=%s from %s", speaker, reference)
+            return xtts.get_conditioning_latents(audio_path=[str(reference)])
+        raise ValueError(f"No conditioning source for XTTS speaker '{speaker}'")
+
+    def _ensure_latents(self, model_info: dict, tts: TTS) -> Dict[str, Tuple[torch.Tensor, torch.Tensor]]:
+        """Load or compute conditioning latents for every configured speaker, once per model."""
+        model_id = model_info.get("model")
+        with self._latents_lock:
+            if model_id in self.latents_cache:
+                return self.latents_cache[model_id]
+            xtts = self._xtts_model(tts)
+            path = self._latents_path(model_info)
+            latents: Dict[str, Tuple[torch.Tensor, torch.Tensor]] = {}
+            if path.exists():
+                stored = torch.load(path, map_location="cpu")
+                latents = {name: (v["gpt_cond_latent"], v["speaker_embedding"]) for name, v in stored.items()}
+
+            device = next(xtts.parameters()).device
+            missing = [s for s in model_info.get("available_speaker_ids") or [] if s not in latents]
+            for speaker in missing:
+                try:
+                    latents[speaker] = self._compute_latents(xtts, speaker)
+                except ValueError as e:
+                    logger.warning("%s", e)
+            latents = {name: (g.to(device), e.to(device)) for name, (g, e) in latents.items()}
+            if missing:
+                torch.save(
+                    {
+                        name: {"gpt_cond_latent": g.cpu(), "speaker_embedding": e.cpu()}
+                        for name, (g, e) in latents.items()
+                    },
+                    path,
+                )
+                logger.info("Persisted XTTS latents speakers=%s -> %s", len(latents), path)
+            self.latents_cache[model_id] = latents
+            return latents
+
+    def warm_speakers(self, model: Optional[str] = None) -> int:
+        """Load the model and its speaker latents ahead of the first request. Returns speaker count."""
         model_info = self._find_model_info(model)
         tts = self._ensure_tts(model_info)
-        file_path = self.output_dir / f"coach_tts_{uuid4().hex}.wav"
+        if self._xtts_model(tts) is None:
+            return 0
+        return len(self._ensure_latents(model_info, tts))
 
+    def _build_kwargs(self, model_info: dict, text: str, speaker: Optional[str]) -> dict:
         available_speakers = model_info.get("available_speaker_ids")
         language = model_info.get("language")
 
-        kwargs = {"text": text, "file_path": str(file_path)}
+        kwargs = {"text": text}
 
         if available_speakers:
             voice = speaker or DEFAULT_SPEAKER or available_speakers[0]
             kwargs["speaker"] = voice
         if language:
             kwargs["language"] = language
+        return kwargs
+
+    def voice_params(self, speaker: Optional[str] = None, model: Optional[str] = None) -> Dict[str, Optional[str]]:
+        """The effective model/speaker/language a synthesis request resolves to."""
+        model_info = self._find_model_info(model)
+        kwargs = self._build_kwargs(model_info, "", speaker)
+        return {
+            "model": model_info.get("full_model_name") or model_info.get("model"),
+            "speaker": kwargs.get("speaker"),
+            "language": kwargs.get("language"),
+        }
+
+    def _synthesize_bytes_sync(self, text: str, speaker: Optional[str] = None, model: Optional[str] = None) -> bytes:
+        """Blocking internal method returning the encoded WAV without touching disk."""
+        model_info = self._find_model_info(model)
+        tts = self._ensure_tts(model_info)
+        kwargs = self._build_kwargs(model_info, text, speaker)
 
         logger.info(
-            "Synthesizing TTS model=%s len=%s speaker=%s lang=%s -> %s",
+            "Synthesizing TTS model=%s len=%s speaker=%s lang=%s -> memory",
             model_info.get("model"),
             len(text),
             kwargs.get("speaker"),
             kwargs.get("language"),
-            file_path,
         )
-        tts.tts_to_file(**kwargs)
-        return file_path
+        xtts = self._xtts_model(tts)
+        if xtts is not None and kwargs.get("speaker"):
+            latents = self._ensure_latents(model_info, tts).get(kwargs["speaker"])
+            if latents is not None:
+                # Skip per-call speaker lookup and the synthesizer wrapper; condition directly on cached latents.
+                gpt_cond_latent, speaker_embedding = latents
+                with torch.inference_mode():
+                    out = xtts.inference(
+                        text,
+                        kwargs.get("language") or "en",
+                        gpt_cond_latent,
+                        speaker_embedding,
+                        enable_text_splitting=True,
+                    )
+                wav = out["wav"]
+                if isinstance(wav, torch.Tensor):
+                    wav = wav.cpu().numpy()
+                return encode_wav(wav, tts.synthesizer.output_sample_rate)
+
+        wav = tts.tts(**kwargs)
+        return encode_wav(wav, tts.synthesizer.output_sample_rate)
 
-    async def synthesize(self, text: str, speaker: Optional[str] = None, model: Optional[str] = None) -> Path:
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self._synthesize_sync, text, speaker, model)
+    def _warmup_sync(self, model: Optional[str] = None):
+        """Load the model and speaker latents, then synthesize a short phrase."""
+        self.warm_speakers(model)
+        self._synthesize_bytes_sync("Hello.", model=model)
 
+    async def warmup(self, model: Optional[str] = None):
+        await get_executor("tts").run(self._warmup_sync, model)
 
+    async def synthesize_bytes(self, text: str, speaker: Optional[str] = None, model: Optional[str] = None) -> bytes:
+        return await get_executor("tts").run(self._synthesize_bytes_sync, text, speaker, model)
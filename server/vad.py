@@ -0,0 +1,119 @@
+import logging
+from collections import deque
+from typing import List, Optional
+
+import numpy as np
+
+from .audio_utils import pcm16_to_float32, resample, WHISPER_SAMPLE_RATE
+from .config import (
+    VAD_ENERGY_THRESHOLD,
+    VAD_FRAME_MS,
+    VAD_SILENCE_MS,
+    VAD_MIN_SPEECH_MS,
+    VAD_MAX_UTTERANCE_MS,
+    VAD_PREROLL_MS,
+)
+
+logger = logging.getLogger("speech_coach.vad")
+
+
+class UtteranceSegmenter:
+    """Energy-based endpointing over a stream of 16-bit mono PCM frames.
+
+    Audio is fed in arbitrary-sized byte chunks, analysed in fixed VAD frames and
+    resampled to Whisper's 16 kHz. `feed` returns the complete utterance once the
+    speaker has been silent for `silence_ms` (or the utterance hits `max_utterance_ms`).
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = WHISPER_SAMPLE_RATE,
+        threshold: float = VAD_ENERGY_THRESHOLD,
+        frame_ms: int = VAD_FRAME_MS,
+        silence_ms: int = VAD_SILENCE_MS,
+        min_speech_ms: int = VAD_MIN_SPEECH_MS,
+        max_utterance_ms: int = VAD_MAX_UTTERANCE_MS,
+        preroll_ms: int = VAD_PREROLL_MS,
+    ):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.frame_ms = frame_ms
+        self.frame_bytes = int(sample_rate * frame_ms / 1000) * 2
+        self.silence_frames = max(1, silence_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.max_frames = max(1, max_utterance_ms // frame_ms)
+        self._preroll: deque = deque(maxlen=max(0, preroll_ms // frame_ms))
+        self._pending = b""
+        self.reset()
+
+    def reset(self):
+        self._frames: List[np.ndarray] = []
+        self._speech_frames = 0
+        self._trailing_silence = 0
+        self.in_speech = False
+
+    @property
+    def speech_ms(self) -> int:
+        return len(self._frames) * self.frame_ms
+
+    def current_audio(self) -> np.ndarray:
+        """Audio of the utterance in progress, at 16 kHz."""
+        if not self._frames:
+            return np.zeros(0, dtype=np.float32)
+        return resample(np.concatenate(self._frames), self.sample_rate)
+
+    def _accept_frame(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        rms = float(np.sqrt(np.mean(frame * frame))) if frame.size else 0.0
+        is_speech = rms >= self.threshold
+
+        if not self.in_speech:
+            if not is_speech:
+                self._preroll.append(frame)
+                return None
+            self.in_speech = True
+            self._frames = list(self._preroll)
+            self._preroll.clear()
+
+        self._frames.append(frame)
+        if is_speech:
+            self._speech_frames += 1
+            self._trailing_silence = 0
+        else:
+            self._trailing_silence += 1
+
+        if self._trailing_silence >= self.silence_frames:
+            return self._endpoint()
+        if len(self._frames) >= self.max_frames:
+            logger.info("Utterance hit max length (%s ms); forcing endpoint", self.speech_ms)
+            return self._endpoint()
+        return None
+
+    def _endpoint(self) -> Optional[np.ndarray]:
+        if self._speech_frames < self.min_speech_frames:
+            # Too short to be speech (clicks, breaths); drop it.
+            self.reset()
+            return None
+        audio = self.current_audio()
+        self.reset()
+        return audio
+
+    def flush(self) -> Optional[np.ndarray]:
+        """Force an endpoint, e.g. when the client signals the end of an utterance."""
+        self._pending = b""
+        if not self.in_speech:
+            return None
+        return self._endpoint()
+
+    def feed(self, data: bytes) -> Optional[np.ndarray]:
+        """Feed raw PCM bytes; returns a finished 16 kHz float32 utterance or None."""
+        buf = self._pending + data
+        usable = len(buf) - len(buf) % self.frame_bytes
+        self._pending = buf[usable:]
+        for offset in range(0, usable, self.frame_bytes):
+            frame = pcm16_to_float32(buf[offset : offset + self.frame_bytes])
+            utterance = self._accept_frame(frame)
+            if utterance is not None:
+                # Keep whatever follows the endpoint for the next call.
+                self._pending = buf[offset + self.frame_bytes :]
+                return utterance
+        return None
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from .config import (
+    TTS_MODELS,
+    TTS_DEFAULT_MODEL,
+    WARMUP_ENABLED,
+    WARMUP_ALL_TTS_MODELS,
+    WARMUP_COMPONENTS,
+    WARMUP_RETRY_INITIAL_S,
+    WARMUP_RETRY_MAX_S,
+    LLM_AUTOTUNE,
+)
+from .ollama_service import OllamaService
+from .stt_service import WhisperService
+from .tts_service import TTSService
+
+logger = logging.getLogger("speech_coach.warmup")
+
+
+class WarmupState:
+    """Tracks per-component warmup status and timings for the readiness endpoint."""
+
+    def __init__(self):
+        self.components: Dict[str, Dict[str, Any]] = {}
+        self.started_at = time.time()
+        self.finished = False
+
+    def start(self, name: str):
+        attempts = self.components.get(name, {}).get("attempts", 0) + 1
+        self.components[name] = {"status": "loading", "duration_ms": None, "error": None, "attempts": attempts}
+
+    def finish(self, name: str, duration_s: float, error: Exception = None):
+        self.components[name].update(
+            status="failed" if error else "ready",
+            duration_ms=round(duration_s * 1000, 1),
+            error=str(error) if error else None,
+        )
+
+    @property
+    def ready(self) -> bool:
+        return self.finished and all(c["status"] == "ready" for c in self.components.values())
+
+    def report(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "finished": self.finished, "components": self.components}
+
+
+async def run_warmup(
+    state: WarmupState,
+    whisper_service: WhisperService,
+    tts_service: TTSService,
+    ollama_service: OllamaService,
+):
+    """Preload models and run a dummy inference per stage; components warm concurrently.
+
+    `state.finished` is set once every component has been tried; failed ones keep being retried
+    with capped exponential backoff so readiness recovers from transient errors without a restart.
+    """
+    state.started_at = time.time()
+    if not WARMUP_ENABLED:
+        logger.info("Warmup disabled")
+        state.finished = True
+        return
+
+    jobs: List[Tuple[str, Callable[[], Awaitable[Any]]]] = []
+    if "stt" in WARMUP_COMPONENTS:
+        jobs.append(("stt", whisper_service.warmup))
+    if "tts" in WARMUP_COMPONENTS:
+        tts_models = TTS_MODELS if WARMUP_ALL_TTS_MODELS else [TTS_DEFAULT_MODEL]
+        for m in tts_models:
+            model_id = m.get("model")
+            jobs.append((f"tts:{model_id}", lambda model_id=model_id: tts_service.warmup(model_id)))
+    if "llm" in WARMUP_COMPONENTS:
+        if LLM_AUTOTUNE:
+            # The default model is only known once the (cached) benchmark has run.
+            async def autotune_and_warm():
+                await ollama_service.autotune()
+                await ollama_service.warmup()
+
+            jobs.append(("llm:autotune", autotune_and_warm))
+        else:
+            jobs.append((f"llm:{ollama_service.default_model}", ollama_service.warmup))
+
+    async def run(name: str, job: Callable[[], Awaitable[Any]]) -> bool:
+        state.start(name)
+        started = time.perf_counter()
+        try:
+            await job()
+        except Exception as e:
+            logger.exception("Warmup failed component=%s", name)
+            state.finish(name, time.perf_counter() - started, e)
+            return False
+        state.finish(name, time.perf_counter() - started)
+        logger.info("Warmup done component=%s in %.0f ms", name, state.components[name]["duration_ms"])
+        return True
+
+    async def retry(name: str, job: Callable[[], Awaitable[Any]]):
+        delay = WARMUP_RETRY_INITIAL_S
+        while True:
+            logger.info("Retrying warmup component=%s in %.0f s", name, delay)
+            await asyncio.sleep(delay)
+            if await run(name, job):
+                return
+            delay = min(delay * 2, WARMUP_RETRY_MAX_S)
+
+    results = await asyncio.gather(*(run(name, job) for name, job in jobs))
+    state.finished = True
+    logger.info("Warmup finished in %.1f s ready=%s", time.time() - state.started_at, state.ready)
+    failed = [(name, job) for (name, job), ok in zip(jobs, results) if not ok]
+    if failed:
+        await asyncio.gather(*(retry(name, job) for name, job in failed))
+        logger.info("Warmup recovered after retries; ready=%s", state.ready)
@@ -0,0 +1,68 @@
+"""WAV decoding and resampling.
+
+Run from the repository root: python -m pytest tests
+"""
+
+import io
+import wave
+
+import numpy as np
+
+from server.audio_utils import WHISPER_SAMPLE_RATE, decode_audio, decode_wav, encode_wav, resample
+
+
+def wav_bytes(frames: bytes, channels: int = 1, sample_width: int = 2, rate: int = 16000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(sample_width)
+        writer.setframerate(rate)
+        writer.writeframes(frames)
+    return buffer.getvalue()
+
+
+def test_decode_wav_round_trip():
+    audio = np.linspace(-1, 1, WHISPER_SAMPLE_RATE, dtype=np.float32)
+    decoded = decode_wav(encode_wav(audio, WHISPER_SAMPLE_RATE))
+    assert decoded.dtype == np.float32 and decoded.size == audio.size
+    assert np.abs(decoded - audio).max() < 1e-3
+
+
+def test_decode_wav_downmixes_and_resamples():
+    stereo = np.zeros((48000, 2), dtype="<i2")
+    stereo[:, 0] = 16384
+    decoded = decode_wav(wav_bytes(stereo.tobytes(), channels=2, rate=48000))
+    assert decoded.size == WHISPER_SAMPLE_RATE
+    assert abs(float(np.median(decoded)) - 0.25) < 0.01
+
+
+def test_decode_wav_rejects_non_wav():
+    assert decode_wav(b"OggS\x00 not a wav") is None
+
+
+def test_truncated_wav_with_partial_sample_returns_none():
+    # The header promises more data than the file holds and the cut splits a 16-bit sample.
+    data = wav_bytes(np.arange(100, dtype="<i2").tobytes())[:-1]
+    assert decode_wav(data) is None
+
+
+def test_truncated_wav_with_partial_frame_returns_none():
+    # Whole samples, but an odd number of them cannot form stereo frames.
+    data = wav_bytes(np.arange(100, dtype="<i2").tobytes(), channels=2)[:-2]
+    assert decode_wav(data) is None
+
+
+def test_decode_audio_does_not_raise_on_truncated_wav():
+    data = wav_bytes(np.arange(100, dtype="<i2").tobytes(), channels=2)[:-2]
+    decode_audio(data)
+
+
+def test_resample_downsampling_suppresses_aliases():
+    rate = 48000
+    t = np.arange(rate) / rate
+    # 12 kHz is above the 8 kHz Nyquist frequency of 16 kHz audio and would fold back to 4 kHz.
+    alias = resample(np.sin(2 * np.pi * 12000 * t).astype(np.float32), rate)
+    speech = resample(np.sin(2 * np.pi * 1000 * t).astype(np.float32), rate)
+    assert alias.size == speech.size == WHISPER_SAMPLE_RATE
+    assert np.sqrt(np.mean(alias[500:-500] ** 2)) < 0.05
+    assert np.sqrt(np.mean(speech[500:-500] ** 2)) > 0.6
@@ -0,0 +1,181 @@
+"""Database layer: keyset pagination, session_stats triggers, migrations, write-behind and bulk delete.
+
+Run from the repository root: python -m pytest tests
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from server.db import MIGRATIONS, Database
+
+T0 = datetime(2025, 3, 1, 12, 0, 0, 123456)
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(db_path=tmp_path / "app.db", write_behind=False)
+    yield database
+    database.close()
+
+
+def insert_message(db: Database, session_id: str, created_at: datetime, text: str = "hi"):
+    """Insert a message with an explicit timestamp (add_message always stamps the current time)."""
+    with db._write() as cur:
+        cur.execute(
+            "INSERT INTO messages (session_id, sender, text, created_at) VALUES (?, 'user', ?, ?)",
+            (session_id, text, created_at.isoformat()),
+        )
+
+
+def insert_session(db: Database, session_id: str, created_at: datetime):
+    with db._write() as cur:
+        cur.execute(
+            "INSERT INTO sessions (id, mode, created_at) VALUES (?, 'call', ?)", (session_id, created_at.isoformat())
+        )
+
+
+def ids(rows) -> list:
+    return [row["id"] for row in rows]
+
+
+def stats(db: Database, session_id: str) -> dict:
+    return next(s for s in db.get_all_sessions() if s["id"] == session_id)
+
+
+@pytest.mark.parametrize("gap_s", [1, 59, 90, 3599, 7200.75])
+def test_duration_matches_exact_gap(db, gap_s):
+    db.add_session("s", mode="call")
+    insert_message(db, "s", T0)
+    insert_message(db, "s", T0 + timedelta(seconds=gap_s))
+    assert stats(db, "s")["duration_seconds"] == int(gap_s)
+
+
+def test_duration_exact_for_every_whole_second_gap(db):
+    db.add_session("s", mode="call")
+    insert_message(db, "s", T0)
+    # Recomputed by the triggers for each gap: insert, then drop, the later message.
+    for gap in range(1, 3600):
+        insert_message(db, "s", T0 + timedelta(seconds=gap), text=f"m{gap}")
+        assert stats(db, "s")["duration_seconds"] == gap
+        with db._write() as cur:
+            cur.execute("DELETE FROM messages WHERE text=?", (f"m{gap}",))
+
+
+def test_delete_trigger_recomputes_stats(db):
+    db.add_session("s", mode="call")
+    insert_message(db, "s", T0)
+    insert_message(db, "s", T0 + timedelta(seconds=30), text="middle")
+    insert_message(db, "s", T0 + timedelta(seconds=90), text="last")
+    assert stats(db, "s")["message_count"] == 3
+    with db._write() as cur:
+        cur.execute("DELETE FROM messages WHERE text='last'")
+    row = stats(db, "s")
+    assert (row["message_count"], row["duration_seconds"]) == (2, 30)
+
+
+def test_migration_repairs_existing_durations(tmp_path):
+    path = tmp_path / "app.db"
+    database = Database(db_path=path, write_behind=False)
+    database.add_session("s", mode="call")
+    insert_message(database, "s", T0)
+    insert_message(database, "s", T0 + timedelta(seconds=90))
+    with database._write() as cur:
+        # State left behind by the old, truncating triggers.
+        cur.execute("UPDATE session_stats SET duration_seconds=89")
+        cur.execute(f"PRAGMA user_version={len(MIGRATIONS) - 1}")
+    database.close()
+
+    reopened = Database(db_path=path, write_behind=False)
+    try:
+        assert stats(reopened, "s")["duration_seconds"] == 90
+    finally:
+        reopened.close()
+
+
+def test_sessions_page_walks_newest_first_including_created_at_ties(db):
+    # s1 and s2 share a timestamp, so the id breaks the tie.
+    for sid, offset in [("s0", 0), ("s1", 10), ("s2", 10), ("s3", 20), ("s4", 30)]:
+        insert_session(db, sid, T0 + timedelta(seconds=offset))
+
+    first = db.get_sessions_page(limit=2)
+    assert ids(first) == ["s4", "s3"]
+    second = db.get_sessions_page(limit=2, before=(first[-1]["created_at"], first[-1]["id"]))
+    assert ids(second) == ["s2", "s1"]
+    third = db.get_sessions_page(limit=2, before=(second[-1]["created_at"], second[-1]["id"]))
+    assert ids(third) == ["s0"]
+
+    # Paging back towards newer sessions keeps the newest-first order.
+    back = db.get_sessions_page(limit=2, after=(third[0]["created_at"], third[0]["id"]))
+    assert ids(back) == ["s2", "s1"]
+    assert ids(db.get_sessions_page(limit=10)) == ids(db.get_all_sessions())
+
+
+def test_messages_page_is_chronological(db):
+    db.add_session("s", mode="call")
+    for i in range(5):
+        db.add_message("s", "user", f"m{i}")
+    db.add_session("other", mode="call")
+    db.add_message("other", "user", "elsewhere")
+
+    def texts(rows):
+        return [row["text"] for row in rows]
+
+    latest = db.get_messages_page("s", limit=2)
+    assert texts(latest) == ["m3", "m4"]
+    older = db.get_messages_page("s", limit=2, before=latest[0]["id"])
+    assert texts(older) == ["m1", "m2"]
+    newer = db.get_messages_page("s", limit=2, after=older[0]["id"])
+    assert texts(newer) == ["m2", "m3"]
+    assert texts(db.get_messages_page("s", limit=10, before=older[0]["id"])) == ["m0"]
+
+
+def test_write_behind_reads_see_queued_writes(tmp_path):
+    database = Database(db_path=tmp_path / "app.db", write_behind=True)
+    try:
+        database.add_session("s", mode="call")
+        assert database.session_exists("s")
+        for i in range(10):
+            database.add_message("s", "user", f"m{i}")
+        assert [m["text"] for m in database.get_messages("s")] == [f"m{i}" for i in range(10)]
+        assert stats(database, "s")["message_count"] == 10
+        assert database.write_behind_stats()["rows"] == 11
+    finally:
+        database.close()
+
+
+def test_write_behind_close_commits_queued_writes(tmp_path):
+    path = tmp_path / "app.db"
+    database = Database(db_path=path, write_behind=True)
+    database.add_session("s", mode="call")
+    database.add_message("s", "user", "last words")
+    database.close()
+
+    reopened = Database(db_path=path, write_behind=False)
+    try:
+        assert reopened.write_behind_stats() is None
+        assert [m["text"] for m in reopened.get_messages("s")] == ["last words"]
+    finally:
+        reopened.close()
+
+
+def test_delete_sessions_removes_rows_and_stats(db):
+    for sid in ["a", "b", "c"]:
+        db.add_session(sid, mode="call")
+        db.add_message(sid, "user", "hi")
+        db.add_message(sid, "coach", "hello")
+    db.save_session_summary("a", "greeting", covered_count=2)
+
+    assert db.delete_sessions([]) == 0
+    assert db.delete_sessions(["a", "b", "missing"]) == 2
+    assert ids(db.get_all_sessions()) == ["c"]
+    assert db.get_messages("a") == [] and db.get_session_summary("a") is None
+    assert db.get_chat_history("a") == []
+    with db._read() as cur:
+        assert cur.execute("SELECT COUNT(*) FROM session_stats WHERE session_id IN ('a', 'b')").fetchone()[0] == 0
+    assert stats(db, "c")["message_count"] == 2
+
+    assert db.delete_sessions(None) == 1
+    assert db.get_all_sessions() == []
+    with db._read() as cur:
+        assert cur.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 0
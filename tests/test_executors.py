@@ -0,0 +1,46 @@
+"""Stage executors: failure and cancellation accounting.
+
+Run from the repository root: python -m pytest tests
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from server.executors import StageExecutor
+
+
+def test_failed_jobs_are_counted():
+    executor = StageExecutor("test", 1)
+
+    def boom():
+        raise ValueError("bad input")
+
+    async def run():
+        with pytest.raises(ValueError):
+            await executor.run(boom)
+        assert await executor.run(lambda: 42) == 42
+
+    asyncio.run(run())
+    stats = executor.stats()
+    assert (stats["completed"], stats["failed"], stats["cancelled"]) == (2, 1, 0)
+    executor.shutdown()
+
+
+def test_cancelled_jobs_are_not_failures():
+    executor = StageExecutor("test", 1)
+    release = threading.Event()
+
+    async def run():
+        task = asyncio.create_task(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        release.set()
+
+    asyncio.run(run())
+    stats = executor.stats()
+    assert (stats["failed"], stats["cancelled"]) == (0, 1)
+    executor.shutdown()
@@ -0,0 +1,150 @@
+"""Routing and failover across Ollama endpoints, against in-process stand-in Ollama servers.
+
+Run from the repository root: python -m pytest tests
+"""
+
+import asyncio
+import json
+from typing import Dict
+
+import httpx
+import pytest
+from ollama import AsyncClient  # type: ignore
+
+from server.ollama_service import OllamaService
+from server.stub_backends import STUB_REPLY, stub_ollama_transport
+
+HOST_A = "http://ollama-a:11434"
+HOST_B = "http://ollama-b:11434"
+
+
+def refused_transport() -> httpx.MockTransport:
+    """An endpoint whose daemon is down: every request fails to connect."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("connection refused", request=request)
+
+    return httpx.MockTransport(handler)
+
+
+def broken_stream_transport(tokens_before_failure: int) -> httpx.MockTransport:
+    """A healthy endpoint whose chat stream drops the connection after a few tokens."""
+    healthy = stub_ollama_transport(tokens_per_s=0)
+
+    async def stream(request: httpx.Request, model: str):
+        for i in range(tokens_before_failure):
+            message = {"role": "assistant", "content": f"partial{i} "}
+            yield (json.dumps({"model": model, "message": message, "done": False}) + "\n").encode()
+        raise httpx.ReadError("connection reset", request=request)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/chat":
+            model = json.loads(request.content)["model"]
+            return httpx.Response(200, content=stream(request, model))
+        return await healthy.handle_async_request(request)
+
+    return httpx.MockTransport(handler)
+
+
+def make_service(transports: Dict[str, httpx.MockTransport]) -> OllamaService:
+    service = OllamaService(
+        hosts=list(transports), client_factory=lambda host: AsyncClient(host=host, transport=transports[host])
+    )
+    asyncio.run(service.router.refresh_all())
+    return service
+
+
+def collect(service: OllamaService) -> str:
+    async def run():
+        return "".join([token async for token in service.chat_stream([{"role": "user", "content": "Hi"}])])
+
+    return asyncio.run(run())
+
+
+def endpoint(service: OllamaService, host: str):
+    return next(e for e in service.router.endpoints if e.host == host)
+
+
+def test_pick_prefers_least_loaded_endpoint():
+    service = make_service({HOST_A: stub_ollama_transport(), HOST_B: stub_ollama_transport()})
+    model = service.default_model
+    a, b = endpoint(service, HOST_A), endpoint(service, HOST_B)
+    a.inflight = 2
+    assert service.router.pick(model) is b
+    b.inflight = 3
+    assert service.router.pick(model) is a
+    a.inflight = b.inflight = 0
+    a.latency_ms, b.latency_ms = 50.0, 10.0
+    assert service.router.pick(model) is b
+
+
+def test_pick_prefers_endpoint_with_model_resident():
+    service = make_service({HOST_A: stub_ollama_transport(), HOST_B: stub_ollama_transport()})
+    model = service.default_model
+    a, b = endpoint(service, HOST_A), endpoint(service, HOST_B)
+    a.resident.discard(model)
+    b.inflight = 1
+    assert service.router.pick(model) is b
+
+
+def test_track_counts_inflight_and_marks_unhealthy_on_connection_error():
+    service = make_service({HOST_A: stub_ollama_transport(), HOST_B: stub_ollama_transport()})
+    a = endpoint(service, HOST_A)
+
+    async def run():
+        async with service.router.track(a, service.default_model):
+            assert a.inflight == 1
+        assert a.healthy and a.requests == 1 and a.latency_ms is not None
+        with pytest.raises(ConnectionError):
+            async with service.router.track(a, service.default_model):
+                raise ConnectionError("refused")
+
+    asyncio.run(run())
+    assert a.inflight == 0
+    assert not a.healthy and a.failures == 1
+    assert service.router.pick(service.default_model) is endpoint(service, HOST_B)
+
+
+def test_candidates_yield_each_endpoint_once():
+    service = make_service({HOST_A: stub_ollama_transport(), HOST_B: stub_ollama_transport()})
+
+    async def run():
+        hosts = []
+        with pytest.raises(RuntimeError):
+            async for candidate, _ in service._candidates(service.default_model):
+                hosts.append(candidate.host)
+        return hosts
+
+    assert sorted(asyncio.run(run())) == [HOST_A, HOST_B]
+
+
+def test_chat_stream_fails_over_before_first_token():
+    service = make_service({HOST_A: stub_ollama_transport(), HOST_B: stub_ollama_transport()})
+    # A goes down after the last health check while still looking like the better endpoint.
+    endpoint(service, HOST_A).client = AsyncClient(host=HOST_A, transport=refused_transport())
+    endpoint(service, HOST_B).latency_ms = 100.0
+
+    assert collect(service).split() == STUB_REPLY.split()
+    assert not endpoint(service, HOST_A).healthy
+    assert endpoint(service, HOST_B).requests == 1
+
+
+def test_chat_stream_does_not_fail_over_after_first_token():
+    service = make_service({HOST_A: broken_stream_transport(tokens_before_failure=2), HOST_B: stub_ollama_transport()})
+    endpoint(service, HOST_B).latency_ms = 100.0
+
+    with pytest.raises(RuntimeError, match="broke off"):
+        collect(service)
+    assert not endpoint(service, HOST_A).healthy
+    assert endpoint(service, HOST_B).requests == 0
+
+
+def test_chat_fails_over_on_connection_error():
+    service = make_service({HOST_A: stub_ollama_transport(), HOST_B: stub_ollama_transport()})
+    endpoint(service, HOST_A).client = AsyncClient(host=HOST_A, transport=refused_transport())
+    endpoint(service, HOST_B).latency_ms = 100.0
+
+    reply = asyncio.run(service.chat([{"role": "user", "content": "Hi"}]))
+    assert reply == STUB_REPLY
+    assert not endpoint(service, HOST_A).healthy
+    assert endpoint(service, HOST_B).requests == 1
@@ -0,0 +1,51 @@
+"""Splitting streamed LLM tokens into sentences for TTS.
+
+Needs the STT/TTS service dependencies (torch, whisper, coqui-tts), which server.connection_manager
+imports. Run from the repository root: python -m pytest tests
+"""
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("whisper")
+pytest.importorskip("TTS")
+
+from server.connection_manager import SentenceChunker  # noqa: E402
+
+
+def feed_tokens(chunker: SentenceChunker, tokens) -> list:
+    sentences = []
+    for token in tokens:
+        sentences.extend(chunker.feed(token))
+    return sentences
+
+
+def test_releases_sentences_as_tokens_arrive():
+    chunker = SentenceChunker(min_chars=5)
+    assert chunker.feed("Hello there") == []
+    assert chunker.feed(". How are") == ["Hello there."]
+    # A terminator is only a boundary once whitespace follows it.
+    assert chunker.feed(" you?") == []
+    assert chunker.feed(" Fine") == ["How are you?"]
+    assert chunker.flush() == "Fine"
+    assert chunker.flush() is None
+
+
+def test_merges_sentences_shorter_than_min_chars():
+    chunker = SentenceChunker(min_chars=20)
+    sentences = feed_tokens(chunker, ["Yes. ", "Ok. ", "That is a longer sentence. ", "End"])
+    assert sentences == ["Yes. Ok. That is a longer sentence."]
+    assert chunker.flush() == "End"
+
+
+def test_keeps_closing_quotes_and_splits_on_newlines():
+    chunker = SentenceChunker(min_chars=1)
+    sentences = feed_tokens(chunker, ['He said "', "stop", '!" Then', " left\n\n", "- item"])
+    assert sentences == ['He said "stop!"', "Then left"]
+    assert chunker.flush() == "- item"
+
+
+def test_does_not_split_on_decimal_points():
+    chunker = SentenceChunker(min_chars=1)
+    assert feed_tokens(chunker, ["It costs 3.50 ", "today"]) == []
+    assert chunker.flush() == "It costs 3.50 today"
@@ -0,0 +1,99 @@
+"""Storage providers: the sharded local layout and deferred S3 uploads.
+
+Run from the repository root: python -m pytest tests
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from server.storage import LocalStorageProvider, S3StorageProvider, boto3
+
+requires_boto3 = pytest.mark.skipif(boto3 is None, reason="boto3 not installed")
+
+
+def test_local_files_are_sharded_behind_flat_urls(tmp_path):
+    provider = LocalStorageProvider(tmp_path)
+    names = [f"coach_tts_{i}.wav" for i in range(20)]
+    for name in names:
+        assert provider.save_file(name.encode(), name) == f"/output/{name}"
+
+    for name in names:
+        path = provider.path_for(name)
+        assert path.relative_to(tmp_path).parts[:2] == provider._shard_dir(name).relative_to(tmp_path).parts
+        assert len(path.parent.name) == len(path.parent.parent.name) == 2
+        assert provider.read_file(name) == name.encode()
+    # Not every file lands in the same shard.
+    assert len({provider._shard_dir(name) for name in names}) > 1
+    assert not list(tmp_path.glob("*.wav"))
+
+
+def test_local_reads_and_deletes_files_from_the_flat_layout(tmp_path):
+    (tmp_path / "coach_tts_old.wav").write_bytes(b"old")
+    provider = LocalStorageProvider(tmp_path)
+    provider.save_file(b"new", "coach_tts_new.wav")
+
+    assert provider.path_for("coach_tts_old.wav") == tmp_path / "coach_tts_old.wav"
+    assert provider.read_file("coach_tts_old.wav") == b"old"
+    assert sorted(f.name for f in provider.iter_files("coach_tts_")) == ["coach_tts_new.wav", "coach_tts_old.wav"]
+
+    assert provider.delete_files(["coach_tts_old.wav", "coach_tts_new.wav", "coach_tts_missing.wav"]) == 2
+    assert list(provider.iter_files()) == []
+
+
+def test_local_iter_files_skips_in_progress_writes_and_other_prefixes(tmp_path):
+    provider = LocalStorageProvider(tmp_path)
+    provider.save_file(b"audio", "coach_tts_a.wav")
+    provider.save_file(b"upload", "user_rec_a.webm")
+    shard_dir = provider._shard_dir("coach_tts_b.wav")
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    (shard_dir / ".coach_tts_b.wav.tmp").write_bytes(b"partial")
+
+    stored = list(provider.iter_files("coach_tts_"))
+    assert [(f.name, f.size) for f in stored] == [("coach_tts_a.wav", 5)]
+    assert stored[0].modified == os.stat(provider.path_for("coach_tts_a.wav")).st_mtime
+
+
+def make_s3(**kwargs) -> S3StorageProvider:
+    # Creating the client makes no request; uploads are replaced per test.
+    return S3StorageProvider("bucket", "us-east-1", "key-id", "secret", background_uploads=True, **kwargs)
+
+
+@requires_boto3
+def test_background_upload_failure_calls_on_failure():
+    provider = make_s3(upload_retries=0)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("S3 unavailable")
+
+    provider.s3_client.upload_fileobj = fail
+    failed = []
+
+    async def run():
+        url = await provider.save_file_async(b"audio", "coach_tts_a.wav", on_failure=failed.append)
+        # Served from memory until the upload finishes.
+        assert provider.read_file("coach_tts_a.wav") == b"audio"
+        await provider.drain()
+        return url
+
+    url = asyncio.run(run())
+    assert url.endswith("/coach_tts_a.wav")
+    assert failed == ["coach_tts_a.wav"]
+    assert "coach_tts_a.wav" not in provider._pending_uploads
+
+
+@requires_boto3
+def test_background_upload_success_does_not_call_on_failure():
+    provider = make_s3(upload_retries=0)
+    uploaded = []
+    provider.s3_client.upload_fileobj = lambda body, bucket, key, **kwargs: uploaded.append((key, body.read()))
+    failed = []
+
+    async def run():
+        await provider.save_file_async(b"audio", "coach_tts_b.wav", on_failure=failed.append)
+        await provider.drain()
+
+    asyncio.run(run())
+    assert uploaded == [("coach_tts_b.wav", b"audio")]
+    assert failed == []
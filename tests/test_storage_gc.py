@@ -0,0 +1,108 @@
+"""Storage GC: collecting generated audio that nothing references.
+
+Needs the TTS service dependencies (torch, coqui-tts), which server.storage_gc imports through the
+TTS cache. Run from the repository root: python -m pytest tests
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Set
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("TTS")
+
+from server.db import Database  # noqa: E402
+from server.storage import LocalStorageProvider  # noqa: E402
+from server.storage_gc import StorageGC  # noqa: E402
+
+
+class PinnedFiles:
+    """Stands in for the TTS cache: only its pinned filenames matter to GC."""
+
+    def __init__(self, names: Set[str] = frozenset()):
+        self.names = set(names)
+
+    def filenames(self) -> set:
+        return set(self.names)
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(db_path=tmp_path / "app.db", write_behind=False)
+    database.add_session("s", mode="call")
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorageProvider(tmp_path / "output")
+
+
+def save(storage: LocalStorageProvider, filename: str, age_s: float = 3600) -> str:
+    url = storage.save_file(b"audio", filename)
+    then = time.time() - age_s
+    os.utime(storage.path_for(filename), (then, then))
+    return url
+
+
+def stored(storage: LocalStorageProvider) -> Set[str]:
+    return {f.name for f in storage.iter_files()}
+
+
+def test_collect_deletes_only_old_unreferenced_files(db, storage):
+    db.add_message("s", "coach", "hello", save(storage, "coach_tts_message.wav"))
+    save(storage, "coach_tts_cached.wav")
+    save(storage, "coach_tts_orphan.wav")
+    save(storage, "coach_tts_fresh.wav", age_s=1)
+    save(storage, "user_rec_upload.webm")
+    gc = StorageGC(db, storage, PinnedFiles({"coach_tts_cached.wav"}), grace_s=60, retention_days=0)
+
+    report = gc.collect()
+
+    assert (report["scanned"], report["deleted"]) == (4, 1)
+    assert stored(storage) == {
+        "coach_tts_message.wav", "coach_tts_cached.wav", "coach_tts_fresh.wav", "user_rec_upload.webm"
+    }
+
+
+def test_collect_deletes_in_batches(db, storage):
+    for i in range(5):
+        save(storage, f"coach_tts_{i}.wav")
+    gc = StorageGC(db, storage, PinnedFiles(), grace_s=60, retention_days=0, batch_size=2)
+
+    assert gc.collect()["deleted"] == 5
+    assert stored(storage) == set()
+
+
+def test_retention_expires_old_references_first(db, storage):
+    old_url = save(storage, "coach_tts_old.wav")
+    with db._write() as cur:
+        cur.execute(
+            "INSERT INTO messages (session_id, sender, text, audio_path, created_at) VALUES ('s', 'coach', 'hi', ?, ?)",
+            (old_url, (datetime.utcnow() - timedelta(days=40)).isoformat()),
+        )
+    db.add_message("s", "coach", "recent", save(storage, "coach_tts_recent.wav"))
+    gc = StorageGC(db, storage, PinnedFiles(), grace_s=60, retention_days=30)
+
+    report = gc.collect()
+
+    assert (report["expired_references"], report["deleted"]) == (1, 1)
+    assert stored(storage) == {"coach_tts_recent.wav"}
+    assert [m["audio_path"] for m in db.get_messages("s")] == [None, "/output/coach_tts_recent.wav"]
+
+
+def test_run_once_accumulates_stats(db, storage):
+    save(storage, "coach_tts_orphan.wav")
+    gc = StorageGC(db, storage, PinnedFiles(), grace_s=60, retention_days=0)
+
+    asyncio.run(gc.run_once())
+    asyncio.run(gc.run_once())
+
+    stats = gc.stats()
+    assert (stats["runs"], stats["deleted_total"]) == (2, 1)
+    assert stats["last_run"]["deleted"] == 0
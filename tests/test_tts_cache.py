@@ -0,0 +1,128 @@
+"""TTS cache: keying, in-flight dedup, persistence and dropping entries whose upload failed.
+
+Needs the TTS service dependencies (torch, coqui-tts); the models themselves are replaced by
+the stand-ins from server.stub_backends. Run from the repository root: python -m pytest tests
+"""
+
+import asyncio
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("TTS")
+
+from server.storage import StorageProvider, StoredFile  # noqa: E402
+from server.stub_backends import install_stub_backends  # noqa: E402
+from server.tts_cache import TTSCache  # noqa: E402
+from server.tts_service import TTSService  # noqa: E402
+
+
+class MemoryStorage(StorageProvider):
+    """In-memory provider; with `defer_failures` it behaves like a background upload that never lands."""
+
+    def __init__(self, defer_failures: bool = False):
+        self.files: Dict[str, bytes] = {}
+        self.saves = 0
+        self.defer_failures = defer_failures
+        self.failure_callbacks: List[Callable[[], None]] = []
+
+    def save_file(self, data, filename: str) -> str:
+        self.saves += 1
+        self.files[filename] = bytes(data)
+        return self.get_url(filename)
+
+    async def save_file_async(self, data, filename: str, on_failure: Optional[Callable[[str], None]] = None) -> str:
+        if self.defer_failures:
+            self.saves += 1
+            self.failure_callbacks.append(lambda: on_failure(filename))
+            return self.get_url(filename)
+        return self.save_file(data, filename)
+
+    def get_url(self, filename: str) -> str:
+        return f"/output/{filename}"
+
+    def read_file(self, filename: str) -> bytes:
+        return self.files[filename]
+
+    def delete_file(self, filename: str) -> None:
+        self.files.pop(filename, None)
+
+    def iter_files(self, prefix: str = "") -> Iterator[StoredFile]:
+        return iter([StoredFile(name, len(data), 0.0) for name, data in self.files.items() if name.startswith(prefix)])
+
+
+def make_cache(tmp_path, storage: StorageProvider, **kwargs) -> TTSCache:
+    tts_service = TTSService()
+    install_stub_backends(type("Whisper", (), {})(), tts_service)
+    return TTSCache(tts_service, storage, db_path=tmp_path / "tts_cache.db", enabled=True, **kwargs)
+
+
+def test_key_ignores_whitespace_and_separates_codecs(tmp_path):
+    cache = make_cache(tmp_path, MemoryStorage())
+    key = cache.make_key("Hello   there.\n")
+    assert key == cache.make_key("Hello there.")
+    assert key != cache.make_key("Hello there!")
+    assert key != cache.make_key("Hello there.", audio_format="mp3")
+
+
+def test_repeated_and_concurrent_requests_synthesize_once(tmp_path):
+    storage = MemoryStorage()
+    cache = make_cache(tmp_path, storage)
+
+    async def run():
+        first = await asyncio.gather(*(cache.synthesize("Same reply.", audio_format="wav") for _ in range(3)))
+        again = await cache.synthesize("Same reply.", audio_format="wav")
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert {url for url, _ in first} == {again[0]}
+    assert storage.saves == 1
+    assert cache.misses == 1 and cache.hits == 3
+
+
+def test_entry_dropped_when_deferred_upload_fails(tmp_path):
+    storage = MemoryStorage(defer_failures=True)
+    cache = make_cache(tmp_path, storage)
+
+    async def run():
+        await cache.synthesize("Lost upload.", audio_format="wav")
+        assert cache.stats()["entries"] == 1
+        for fail in storage.failure_callbacks:
+            fail()
+        await cache.synthesize("Lost upload.", audio_format="wav")
+
+    asyncio.run(run())
+    assert cache.misses == 2 and cache.hits == 0
+    assert storage.saves == 2
+
+
+def test_resynthesis_after_eviction_does_not_overwrite_stored_audio(tmp_path):
+    storage = MemoryStorage()
+    cache = make_cache(tmp_path, storage, max_entries=1)
+    rng = np.random.default_rng(0)
+    for tts in cache.tts_service.models_cache.values():
+        # Non-deterministic output, like XTTS sampling.
+        tts.tts = lambda text, **kwargs: rng.standard_normal(2205).astype(np.float32)
+
+    async def run():
+        first, _ = await cache.synthesize("Say it again.", audio_format="wav")
+        await cache.synthesize("Something else.", audio_format="wav")  # evicts the first entry
+        second, _ = await cache.synthesize("Say it again.", audio_format="wav")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first != second
+    assert {storage.filename_from_url(first), storage.filename_from_url(second)} <= set(storage.files)
+
+
+def test_index_survives_restart(tmp_path):
+    storage = MemoryStorage()
+    cache = make_cache(tmp_path, storage)
+    url, _ = asyncio.run(cache.synthesize("Persisted.", audio_format="wav"))
+    cache.close()
+
+    reopened = make_cache(tmp_path, storage)
+    assert reopened.lookup(reopened.make_key("Persisted.", audio_format="wav"))["url"] == url
+    reopened.close()
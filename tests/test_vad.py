@@ -0,0 +1,82 @@
+"""Energy-based endpointing of streamed PCM.
+
+Run from the repository root: python -m pytest tests
+"""
+
+import numpy as np
+
+from server.vad import UtteranceSegmenter
+
+RATE = 16000
+
+
+def tone(ms: int, rate: int = RATE) -> np.ndarray:
+    t = np.arange(int(rate * ms / 1000)) / rate
+    return 0.5 * np.sin(2 * np.pi * 220 * t)
+
+
+def silence(ms: int, rate: int = RATE) -> np.ndarray:
+    return np.zeros(int(rate * ms / 1000))
+
+
+def pcm(*parts: np.ndarray) -> bytes:
+    return (np.concatenate(parts) * 32767).astype("<i2").tobytes()
+
+
+def segmenter(**kwargs) -> UtteranceSegmenter:
+    options = dict(
+        sample_rate=RATE, threshold=0.01, frame_ms=30, silence_ms=300, min_speech_ms=90, max_utterance_ms=3000,
+        preroll_ms=90,
+    )
+    options.update(kwargs)
+    return UtteranceSegmenter(**options)
+
+
+def feed_in_chunks(seg: UtteranceSegmenter, data: bytes, chunk: int):
+    utterances = []
+    for offset in range(0, len(data), chunk):
+        utterance = seg.feed(data[offset : offset + chunk])
+        if utterance is not None:
+            utterances.append(utterance)
+    return utterances
+
+
+def test_endpoints_after_trailing_silence():
+    seg = segmenter()
+    # Odd chunk sizes split frames and even samples across feed calls.
+    utterances = feed_in_chunks(seg, pcm(silence(300), tone(600), silence(600)), chunk=1001)
+    assert len(utterances) == 1
+    # Pre-roll + speech + the silence that triggered the endpoint.
+    assert len(utterances[0]) == int(RATE * (90 + 600 + 300) / 1000)
+    assert not seg.in_speech
+
+
+def test_splits_two_utterances_and_keeps_audio_after_the_endpoint():
+    seg = segmenter()
+    data = pcm(tone(300), silence(300), tone(450), silence(300))
+    first = seg.feed(data)
+    assert first is not None and len(first) == int(RATE * 0.6)
+    second = seg.feed(b"")
+    assert second is not None and len(second) == int(RATE * 0.75)
+
+
+def test_drops_clicks_shorter_than_min_speech():
+    seg = segmenter()
+    assert feed_in_chunks(seg, pcm(tone(30), silence(600)), chunk=960) == []
+    assert not seg.in_speech
+
+
+def test_forces_endpoint_at_max_length():
+    seg = segmenter(max_utterance_ms=600)
+    utterances = feed_in_chunks(seg, pcm(tone(1500)), chunk=960)
+    assert [len(u) for u in utterances] == [int(RATE * 0.6)] * 2
+
+
+def test_flush_returns_utterance_in_progress_and_resamples():
+    seg = segmenter(sample_rate=48000)
+    assert seg.feed(pcm(tone(300, rate=48000))) is None
+    assert seg.in_speech
+    utterance = seg.flush()
+    assert utterance is not None and utterance.dtype == np.float32
+    assert len(utterance) == int(RATE * 0.3)
+    assert seg.flush() is None
@@ -1,10 +1,13 @@
 // API Request/Response Types
 
+export type AudioFormat = "wav" | "opus" | "mp3"
+
 export interface SessionCreateRequest {
     mode: "call" | "chat"
     topic?: string
     language?: string
     model?: string
+    audio_format?: AudioFormat
 }
 
 export interface SessionCreateResponse {
@@ -17,6 +20,7 @@ export interface TextMessageRequest {
     model?: string | null
     speaker?: string | null
     tts_model?: string | null
+    audio_format?: AudioFormat | null
 }
 
 export interface ProcessAudioResponse {
@@ -105,6 +109,29 @@ export interface WebSocketAudioUrlMessage {
     url: string
 }
 
+export interface WebSocketPartialTranscriptMessage {
+    type: "partial_transcript"
+    text: string
+}
+
+export interface WebSocketTextDeltaMessage {
+    type: "text_delta"
+    text: string
+}
+
+export interface WebSocketAudioChunkMessage {
+    type: "audio_chunk"
+    index: number
+    url: string
+    text: string
+}
+
+export interface WebSocketAudioCompleteMessage {
+    type: "audio_complete"
+    url: string | null
+    chunks: number
+}
+
 export interface WebSocketErrorMessage {
     type: "error"
     message: string
@@ -115,6 +142,10 @@ export type WebSocketMessage =
     | WebSocketStatusMessage
     | WebSocketTextResponseMessage
     | WebSocketAudioUrlMessage
+    | WebSocketPartialTranscriptMessage
+    | WebSocketTextDeltaMessage
+    | WebSocketAudioChunkMessage
+    | WebSocketAudioCompleteMessage
     | WebSocketErrorMessage
 
 // Audio Recording Types